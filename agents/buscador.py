@@ -17,12 +17,12 @@ except ImportError:
 
 # ==================== AGENTE BUSCADOR AUTOMÁTICO ====================
 
-def crear_agente_buscador_automatico(gemini_api_key: str = None) -> Agent:
+def crear_agente_buscador_automatico(gemini_api_key: str = None, limitador=None) -> Agent:
     """
     Crea agente buscador que usa automáticamente las @tools según su criterio (ReAct)
     """
     try:
-        llm = crear_llm_crewai(gemini_api_key=gemini_api_key)
+        llm = crear_llm_crewai(gemini_api_key=gemini_api_key, limitador=limitador)
         
         agent = Agent(
             role="Investigador Digital Especializado",
@@ -57,11 +57,23 @@ def crear_agente_buscador_automatico(gemini_api_key: str = None) -> Agent:
         raise RuntimeError(f"Error creando agente buscador automático: {e}")
 
 
-def crear_tarea_investigacion_automatica(seccion: str, topic: str, agent: Agent) -> Task:
+def crear_tarea_investigacion_automatica(seccion: str, topic: str, agent: Agent, resultados_previos: str = "") -> Task:
     """
-    Crea tarea que confía en el agente para decidir cómo buscar automáticamente
+    Crea tarea que confía en el agente para decidir cómo buscar automáticamente.
+    Si se pasan resultados_previos (búsqueda ya hecha en el prefetch), se incluyen en la
+    descripción para que el agente no repita esa búsqueda.
+    La tarea no recibe como contexto las salidas de tareas anteriores: en un Crew secuencial,
+    sin context explícito, CrewAI le pasaría todas, y el prompt crecería con cada sección.
     """
     try:
+        bloque_previos = ""
+        if resultados_previos:
+            bloque_previos = f"""
+            RESULTADOS DE BÚSQUEDA YA DISPONIBLES (no repitas esta búsqueda, úsalos como punto de partida
+            y usa buscar_web solo para completar lo que falte):
+            {resultados_previos}
+            """
+
         task = Task(
             description=f"""
             Investigar sobre: "{seccion}" relacionado con {topic}.
@@ -69,14 +81,15 @@ def crear_tarea_investigacion_automatica(seccion: str, topic: str, agent: Agent)
             OBJETIVO:
             Buscar información técnica, estadísticas y ejemplos sobre "{seccion}".
             Investiga a fondo y recopila datos relevantes sobre este tema usando tu herramienta buscar_web para buscar en Internet.
-            """,
+            {bloque_previos}""",
             expected_output=f"""
             Hechos y datos útiles sobre "{seccion}".
             
             Aproximadamente 50-150 palabras: SOLO PUNTOS CLAVE
             Traduce la investigación que recuperes al idioma español si es necesario.
             """,
-            agent=agent
+            agent=agent,
+            context=[]
         )
         
         return task
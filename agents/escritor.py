@@ -16,12 +16,14 @@ except ImportError:
 
 # ==================== AGENTE ESCRITOR ====================
 
-def crear_agente_escritor(gemini_api_key: str = None) -> Agent:
+def crear_agente_escritor(gemini_api_key: str = None, limitador=None) -> Agent:
     """
-    Crea y devuelve el agente especializado en redacción técnica
+    Crea y devuelve el agente especializado en redacción técnica.
+    En el flujo, cada tarea de redacción sustituye su herramienta append_to_markdown por la
+    de su sección (crear_herramienta_seccion).
     """
     try:
-        llm = crear_llm_crewai(gemini_api_key=gemini_api_key)
+        llm = crear_llm_crewai(gemini_api_key=gemini_api_key, limitador=limitador)
         
         # Importar la tool de append
         sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -58,11 +60,24 @@ def crear_agente_escritor(gemini_api_key: str = None) -> Agent:
     except Exception as e:
         raise RuntimeError(f"Error creando agente escritor: {e}")
 
-def crear_tarea_redaccion_archivo(agent: Agent, seccion: str, topic: str):
+def crear_tarea_redaccion_archivo(agent: Agent, seccion: str, topic: str, herramienta=None,
+                                  titulos_previos: list[str] = None):
     """
-    Crea una tarea de redacción que escribe SOLO la nueva sección para ser añadida al archivo
+    Crea una tarea de redacción que escribe SOLO la nueva sección para ser añadida al archivo.
+    Si se indica herramienta (p. ej. crear_herramienta_seccion), la tarea la usa en lugar de
+    la append_to_markdown del agente.
+    titulos_previos son los títulos de las secciones inmediatamente anteriores: se incluyen como
+    índice breve para no repetir su contenido, en lugar del texto de esas secciones.
     """
     try:
+        bloque_previos = ""
+        if titulos_previos:
+            indice = "\n".join(f"            - {titulo}" for titulo in titulos_previos)
+            bloque_previos = f"""
+            Secciones anteriores del documento (no repitas lo que ya cubren):
+{indice}
+            """
+
         task = Task(
             description=f"""
             TAREA: Redactar la sección "{seccion}" sobre {topic} y guardarla en el archivo.
@@ -75,7 +90,7 @@ def crear_tarea_redaccion_archivo(agent: Agent, seccion: str, topic: str):
             [Contenido detallado sobre el tema]
             
             Guarda el contenido usando la herramienta append_to_markdown cuando hayas terminado y estés seguro de que es contenido válido.
-            """,
+            {bloque_previos}""",
             expected_output=f"""
             Una sección bien redactada sobre "{seccion}" con:
             - Contenido técnico detallado en español
@@ -83,7 +98,8 @@ def crear_tarea_redaccion_archivo(agent: Agent, seccion: str, topic: str):
             - Formato markdown correcto
             - Confirmación de que el contenido ha sido añadido exitosamente
             """,
-            agent=agent
+            agent=agent,
+            tools=[herramienta] if herramienta else []
         )
         
         return task
@@ -2,8 +2,11 @@
 # proyecto_crewai/agents/estructurador.py
 
 import os
+import re
 import sys
+import json
 from crewai import Agent, Task
+from pydantic import BaseModel, Field, AliasChoices, ValidationError, field_validator, model_validator
 
 # Añadir el directorio padre al path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -14,14 +17,182 @@ except ImportError:
     print("[ERROR] No se pudo importar llm_provider")
     sys.exit(1)
 
+# ==================== ESQUEMA DEL DOCUMENTO ====================
+
+MAX_SECCIONES = 60
+MAX_LONGITUD_TITULO = 150
+
+# Numeración al principio de un título: "1. ", "2) ", "3: ", "Sección 4: ", "Sección IV: " o "IV. ".
+# Sin la palabra "Sección", un romano solo cuenta si es válido (I-XXXIX, hasta 4 letras), va
+# seguido de "." o ")" y el título empieza después por mayúscula: "CLI: herramientas" y
+# "C. elegans como modelo" son títulos, no numeraciones.
+_ROMANO = r"(?=[IVX]{1,4}\b)X{0,3}(?:IX|IV|V?I{0,3})"
+_PATRON_NUMERACION = re.compile(
+    rf"^(?:(?:[Ss]ecci[oó]n\s+)?\d+[.):-]|[Ss]ecci[oó]n\s+{_ROMANO}[.):-]"
+    rf"|{_ROMANO}[.)](?=\s+[^\sa-záéíóúüñ]))\s+"
+)
+
+
+class SeccionEsquema(BaseModel):
+    """Una sección del documento y, opcionalmente, búsquedas web sugeridas para investigarla."""
+
+    titulo: str = Field(validation_alias=AliasChoices("titulo", "title", "nombre"),
+                        min_length=1, max_length=MAX_LONGITUD_TITULO)
+    busquedas: list[str] = Field(default_factory=list,
+                                 validation_alias=AliasChoices("busquedas", "search_hints", "queries"))
+
+    @model_validator(mode="before")
+    @classmethod
+    def _desde_texto(cls, valor):
+        # Una sección dada como texto suelto equivale a {"titulo": texto}
+        return {"titulo": valor} if isinstance(valor, str) else valor
+
+    @field_validator("titulo", mode="before")
+    @classmethod
+    def _limpiar_titulo(cls, titulo):
+        titulo = str(titulo).strip().lstrip("#").strip("*_ ")
+        titulo = _PATRON_NUMERACION.sub("", titulo)
+        return titulo.strip("*_ ").rstrip(":").strip("*_ ")
+
+    @field_validator("busquedas", mode="before")
+    @classmethod
+    def _limpiar_busquedas(cls, busquedas):
+        if isinstance(busquedas, str):
+            busquedas = [busquedas]
+        return [str(b).strip() for b in busquedas or [] if str(b).strip()][:3]
+
+
+class EsquemaDocumento(BaseModel):
+    """Esquema validado que produce el estructurador: título general y secciones en orden."""
+
+    titulo: str = Field(default="", validation_alias=AliasChoices("titulo", "title"))
+    secciones: list[SeccionEsquema] = Field(validation_alias=AliasChoices("secciones", "sections"),
+                                            min_length=1, max_length=MAX_SECCIONES)
+
+    @field_validator("secciones", mode="after")
+    @classmethod
+    def _filtrar_secciones(cls, secciones):
+        # Referencias las añade el escritor en cada sección; los títulos repetidos se descartan
+        vistos, filtradas = set(), []
+        for seccion in secciones:
+            clave = seccion.titulo.lower()
+            if clave.startswith("referencias") or clave in vistos:
+                continue
+            vistos.add(clave)
+            filtradas.append(seccion)
+        if not filtradas:
+            raise ValueError("el esquema no tiene secciones válidas")
+        return filtradas
+
+    def titulos(self) -> list[str]:
+        return [seccion.titulo for seccion in self.secciones]
+
+    def a_markdown(self) -> str:
+        """El esquema como índice Markdown (# título y ## N. sección)."""
+        lineas = [f"# {self.titulo}", ""] if self.titulo else []
+        for i, seccion in enumerate(self.secciones, start=1):
+            lineas.extend([f"## {i}. {seccion.titulo}", ""])
+        return "\n".join(lineas)
+
+
+# Formato que se pide al LLM (también en la corrección)
+_EJEMPLO_ESQUEMA = json.dumps({
+    "titulo": "Título general del documento",
+    "secciones": [
+        {"titulo": "Introducción", "busquedas": ["consulta de búsqueda web concreta"]},
+        {"titulo": "Título específico relevante", "busquedas": []},
+        {"titulo": "Conclusiones", "busquedas": []},
+    ],
+}, ensure_ascii=False)
+
+
+def _extraer_json(texto: str):
+    """Objeto JSON de la respuesta (con o sin bloque ```json), tolerando comas finales."""
+    inicio, fin = texto.find("{"), texto.rfind("}")
+    if inicio == -1 or fin <= inicio:
+        return None
+    fragmento = re.sub(r",\s*([}\]])", r"\1", texto[inicio:fin + 1])
+    try:
+        return json.loads(fragmento)
+    except json.JSONDecodeError:
+        return None
+
+
+def _esquema_desde_markdown(texto: str, topic: str) -> dict:
+    """
+    Reparación local: títulos '## ' como hacía el flujo antes y, si no hay, encabezados '#'
+    (sin contar el título general) o una lista numerada.
+    """
+    lineas = [linea.strip() for linea in texto.splitlines()]
+    titulos = [linea[3:] for linea in lineas if linea.startswith("## ")]
+    if not titulos:
+        titulos = [linea.lstrip("#") for linea in lineas if linea.startswith("#")][1:]
+    if not titulos:
+        titulos = [linea for linea in lineas if _PATRON_NUMERACION.match(linea)]
+    # Líneas demasiado largas son párrafos, no títulos
+    titulos = [titulo for titulo in titulos if titulo.strip() and len(titulo) <= MAX_LONGITUD_TITULO]
+    return {"titulo": topic, "secciones": titulos}
+
+
+def interpretar_esquema(texto: str, topic: str) -> EsquemaDocumento:
+    """
+    Valida la respuesta del estructurador contra EsquemaDocumento. Si no es JSON válido,
+    intenta reconstruir el esquema a partir de los títulos Markdown. Lanza ValueError
+    (ValidationError lo es) si ninguna de las dos lecturas da un esquema válido.
+    """
+    datos = _extraer_json(texto)
+    if isinstance(datos, dict):
+        try:
+            esquema = EsquemaDocumento.model_validate(datos)
+            if not esquema.titulo:
+                esquema.titulo = topic
+            return esquema
+        except ValidationError as e:
+            error_json = e
+    else:
+        error_json = None
+    try:
+        return EsquemaDocumento.model_validate(_esquema_desde_markdown(texto, topic))
+    except ValidationError:
+        if error_json is not None:
+            raise error_json
+        raise
+
+
+def obtener_esquema(texto: str, topic: str, llm=None) -> EsquemaDocumento:
+    """
+    Esquema validado de la respuesta del estructurador. Si no se puede interpretar, hace una
+    sola llamada barata al LLM con la respuesta y el error de validación para que la corrija,
+    en lugar de repetir toda la tarea.
+    """
+    try:
+        return interpretar_esquema(texto, topic)
+    except ValueError as e:
+        if llm is None:
+            raise
+        print(f"[WARNING] Esquema del documento no válido, se pide una corrección: {str(e)[:200]}")
+        error = e
+
+    mensajes = [
+        {"role": "system", "content": "Corriges respuestas para que cumplan un esquema JSON. Responde solo con el JSON."},
+        {"role": "user", "content": (
+            f"Esta respuesta debía ser el esquema de un documento sobre '{topic}':\n\n{texto[:6000]}\n\n"
+            f"Error de validación: {str(error)[:1000]}\n\n"
+            f"Devuelve solo un objeto JSON con este formato:\n{_EJEMPLO_ESQUEMA}"
+        )},
+    ]
+    respuesta = llm.call(mensajes)
+    return interpretar_esquema(str(respuesta), topic)
+
+
 # ==================== AGENTE ESTRUCTURADOR ====================
 
-def crear_agente_estructurador(gemini_api_key: str = None) -> Agent:
+def crear_agente_estructurador(gemini_api_key: str = None, limitador=None) -> Agent:
     """
     Crea y devuelve el agente especializado en estructurar documentos
     """
     try:
-        llm = crear_llm_crewai(gemini_api_key=gemini_api_key)
+        llm = crear_llm_crewai(gemini_api_key=gemini_api_key, limitador=limitador)
         
         agent = Agent(
             role="Arquitecto de Documentos Técnicos",
@@ -58,25 +229,16 @@ def crear_tarea_estructurar(topic: str, agent: Agent) -> Task:
             - Los títulos deben seguir una secuencia lógica (desde introducción hasta conclusión)
             - Cada título debe ser descriptivo y específico al tema
             - Los títulos deben estar en español
-            - Usa formato markdown con dos almohadillas (##) para cada título principal
+            - Para cada título puedes sugerir 1-2 consultas de búsqueda web concretas
+            - Responde solo con un objeto JSON, sin texto adicional
             """,
             expected_output=f"""
-            Una lista de 8-12 títulos principales en formato markdown para un documento sobre {topic}:
-            
-            # {topic}
-            
-            ## 1. Introducción
-            
-            ## 2. [Título específico relevante]
-            
-            ## 3. [Título específico relevante]
-            
-            ...
+            Un objeto JSON con el título general y 8-12 secciones para un documento sobre {topic}:
             
-            ## [8-12]. Conclusiones
+            {_EJEMPLO_ESQUEMA}
             
-            Los títulos deben ser descriptivos, específicos al tema, y estar en un orden lógico.
-            No incluir subtítulos ni descripciones adicionales.
+            Los títulos deben ser descriptivos, específicos al tema, y estar en un orden lógico,
+            sin numeración. No incluir subtítulos ni descripciones adicionales.
             """,
             agent=agent
         )
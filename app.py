@@ -1,7 +1,11 @@
 import streamlit as st
 import os
+import base64
+import time
 import random
-from flows.documento_flow import DocumentoFlowCompleto, DocumentoState
+from utils.jobs import (
+    obtener_gestor_trabajos, ESTADO_EN_COLA, ESTADO_EN_EJECUCION, ESTADO_COMPLETADO, ESTADOS_ACTIVOS
+)
 
 st.set_page_config(page_title="Generador de PDF CrewAI", layout="centered")
 st.title("📄 Generador de PDF CrewAI")
@@ -58,17 +62,16 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --------------------------------------------------------
-# Paso 1: Inicializar flags en session_state
+# Paso 1: Trabajos de esta sesión
 # --------------------------------------------------------
-#   - 'generando' indica si ya lanzamos el flujo de generación
-#   - 'pdf_ok' para saber si existe PDF listo para descarga
-#   - 'error_generacion' para guardar cualquier mensaje de error
-if "generando" not in st.session_state:
-    st.session_state["generando"] = False
-if "pdf_ok" not in st.session_state:
-    st.session_state["pdf_ok"] = False
-if "error_generacion" not in st.session_state:
-    st.session_state["error_generacion"] = ""
+#   La generación se ejecuta en segundo plano (utils/jobs.py). La sesión solo guarda los
+#   ids de sus trabajos, también en la URL para poder reconectar tras recargar la página.
+#   El id (aleatorio) es lo que da acceso a un trabajo: no se listan los de otras sesiones.
+gestor = obtener_gestor_trabajos()
+
+if "trabajos" not in st.session_state:
+    ids_url = st.query_params.get("trabajos", "")
+    st.session_state["trabajos"] = [t for t in ids_url.split(",") if t]
 
 # --------------------------------------------------------
 # Paso 2: Mostrar formulario para configuración y tópico
@@ -92,6 +95,34 @@ with st.form(key="form_pdf"):
         key="max_rpm",
         help="Máximo de requests por minuto. Para API gratuita de Gemini se recomienda máximo 10."
     )
+
+    # Campo para el número de secciones procesadas a la vez
+    max_secciones_paralelo = st.number_input(
+        "Secciones en paralelo",
+        min_value=1,
+        max_value=8,
+        value=st.session_state.get("max_secciones_paralelo", 1),
+        key="max_secciones_paralelo",
+        help="Número de secciones que se investigan y redactan a la vez. El límite de max_rpm se respeta igualmente."
+    )
+
+    # Backend de generación del PDF
+    backends_pdf = {"alta_calidad": "Alta calidad", "borrador": "Borrador (rápido, para revisar el texto)"}
+    backend_pdf = st.selectbox(
+        "Calidad del PDF",
+        options=list(backends_pdf),
+        format_func=backends_pdf.get,
+        key="backend_pdf",
+        help="El borrador usa un estilo simple, sin imagen de portada ni resaltado de código, por lo que WeasyPrint tiene menos trabajo al maquetarlo."
+    )
+
+    # El documento se puede seguir en la vista previa HTML; el PDF es el último paso
+    generar_pdf = st.checkbox(
+        "Generar también el PDF",
+        value=st.session_state.get("generar_pdf", True),
+        key="generar_pdf",
+        help="Sin PDF, el resultado es la vista previa HTML, que se actualiza con cada sección terminada."
+    )
     
     topic = st.text_input(
         "Tópico del documento",
@@ -101,85 +132,112 @@ with st.form(key="form_pdf"):
     submit = st.form_submit_button("Generar PDF", use_container_width=True)
 
 # --------------------------------------------------------
-# Paso 4: Cuando se envía el formulario, lanzamos la generación
+# Paso 3: Cuando se envía el formulario, encolamos el trabajo
 # --------------------------------------------------------
-if submit and not st.session_state["generando"]:
-    # Bloqueamos nuevos envíos
-    st.session_state["generando"] = True
-    # Reseteamos indicadores
-    st.session_state["pdf_ok"] = False
-    st.session_state["error_generacion"] = ""
-    # A continuación, la recarga natural del formulario trae los valores
-    # con session_state["modelo_llm"] y session_state["topic_input"] actualizados.
+if submit:
+    trabajo_id = gestor.enviar(
+        topic=st.session_state["topic_input"],
+        gemini_api_key=st.session_state["gemini_api_key"],
+        max_rpm=st.session_state["max_rpm"],
+        max_secciones_paralelo=st.session_state["max_secciones_paralelo"],
+        backend_pdf=st.session_state["backend_pdf"],
+        generar_pdf=st.session_state["generar_pdf"],
+    )
+    st.session_state["trabajos"].insert(0, trabajo_id)
+    st.query_params["trabajos"] = ",".join(st.session_state["trabajos"])
 
 # --------------------------------------------------------
-# Paso 5: Si estamos en modo “generando”, mostramos spinner + info
+# Paso 4: Panel de trabajos (se refresca solo mientras haya trabajos activos)
 # --------------------------------------------------------
-if st.session_state["generando"]:
-    st.markdown("""
-        <div style='background-color:#ffe066; padding:1em; border-radius:8px; text-align:center; font-size:1.15em; font-weight:bold; color:#b8860b;'>
-        🚦 No toques nada, la IA está concentrada 🚦
-        </div>
-    """, unsafe_allow_html=True)
-
-    frases = [
-        "Puede tardar hasta 10 minutos...",
-        "Ten paciencia, se está cocinando la magia...",
-        "¡No cierres la ventana! El conocimiento está en el horno...",
-        "Generando tu PDF, esto puede demorar un poco...",
-        "La inteligencia artificial está trabajando para ti...",
-        "¡Momento de un café! Pronto tendrás tu documento...",
-        "Preparando resultados increíbles, espera un momento..."
-    ]
-    mensaje = random.choice(frases)
-    with st.spinner(mensaje):
-        # ----------------------------------------------------------------------------------
-        # - Obtenemos los parámetros finales desde session_state (ya actualizados)
-        # - Ejecutamos el flujo de generación de PDF
-        # ----------------------------------------------------------------------------------
-        gemini_api_key_actual = st.session_state["gemini_api_key"]
-        max_rpm_actual = st.session_state["max_rpm"]
-        topic_actual = st.session_state["topic_input"]
-        output_dir = "output"
-        os.makedirs(output_dir, exist_ok=True)
-
-        try:
-            flow = DocumentoFlowCompleto(
-                state=DocumentoState(topic=topic_actual, gemini_api_key=gemini_api_key_actual, max_rpm=max_rpm_actual)
+frases = [
+    "Puede tardar hasta 10 minutos...",
+    "Ten paciencia, se está cocinando la magia...",
+    "¡No cierres la ventana! El conocimiento está en el horno...",
+    "Generando tu PDF, esto puede demorar un poco...",
+    "La inteligencia artificial está trabajando para ti...",
+    "¡Momento de un café! Pronto tendrás tu documento...",
+    "Preparando resultados increíbles, espera un momento..."
+]
+
+
+def mostrar_vista_previa(trabajo: dict, expandida: bool):
+    """Muestra la vista previa HTML del trabajo (se reescribe con cada sección terminada)."""
+    ruta = trabajo.get("vista_previa")
+    if not ruta or not os.path.exists(ruta):
+        return None
+    with open(ruta, "r", encoding="utf-8") as f:
+        html = f.read()
+    with st.expander("👁️ Vista previa", expanded=expandida):
+        # El HTML sale del LLM: como data: URL el iframe tiene un origen opaco y no accede a la app
+        st.iframe(f"data:text/html;base64,{base64.b64encode(html.encode('utf-8')).decode('ascii')}", height=600)
+    return html
+
+
+def mostrar_trabajo(trabajo: dict):
+    """Pinta el estado de un trabajo, su vista previa y, si terminó bien, el botón de descarga."""
+    estado = trabajo.get("estado")
+    titulo = f"**{trabajo.get('topic', '')}** · `{trabajo['id']}`"
+
+    if estado == ESTADO_EN_COLA:
+        st.info(f"⏳ {titulo}: en cola")
+    elif estado == ESTADO_EN_EJECUCION:
+        minutos = (time.time() - (trabajo.get("iniciado") or time.time())) / 60
+        st.markdown(f"""
+            <div style='background-color:#ffe066; padding:1em; border-radius:8px; text-align:center; font-size:1.05em; font-weight:bold; color:#b8860b;'>
+            🚦 {titulo} — generando ({minutos:.1f} min). {random.choice(frases)}
+            </div>
+        """, unsafe_allow_html=True)
+        mostrar_vista_previa(trabajo, expandida=True)
+    elif estado == ESTADO_COMPLETADO and trabajo.get("pdf") and os.path.exists(trabajo["pdf"]):
+        st.success(f"✅ PDF generado exitosamente: {trabajo['pdf']}")
+        with open(trabajo["pdf"], "rb") as f:
+            st.download_button(
+                "📥 Descargar PDF",
+                f,
+                file_name=os.path.basename(trabajo["pdf"]),
+                use_container_width=True,
+                type="primary",
+                key=f"descarga_{trabajo['id']}"
             )
-            flow.kickoff(inputs={"topic": topic_actual, "gemini_api_key": gemini_api_key_actual, "max_rpm": max_rpm_actual})
-            # Si no arroja excepción, asumimos que el PDF se creó
-            st.session_state["pdf_ok"] = True
-        except Exception as e:
-            st.session_state["error_generacion"] = f"Error ejecutando el flujo: {e}"
-            st.session_state["pdf_ok"] = False
-
-    # Terminó el “spinner”: desbloqueamos la UI
-    st.session_state["generando"] = False
-
-    # Si hubo error, lo mostramos y detenemos
-    if st.session_state["error_generacion"]:
-        st.error(st.session_state["error_generacion"])
-    # Si todo fue bien, indicamos que el PDF está listo
-    elif st.session_state["pdf_ok"]:
-        topic_clean = topic_actual.replace(" ", "_").replace("/", "_").replace("\\", "_")
-        pdf_path = os.path.join(output_dir, f"{topic_clean}.pdf")
-        if os.path.exists(pdf_path):
-            st.success(f"✅ PDF generado exitosamente: {pdf_path}")
-            with open(pdf_path, "rb") as f:
-                st.download_button(
-                    "📥 Descargar PDF",
-                    f,
-                    file_name=f"{topic_clean}.pdf",
-                    use_container_width=True,
-                    type="primary"
-                )
-        else:
-            st.error("❌ No se encontró el PDF generado después de la ejecución.")
+        mostrar_vista_previa(trabajo, expandida=False)
+    elif estado == ESTADO_COMPLETADO and not trabajo.get("generar_pdf", True):
+        st.success(f"✅ {titulo}: documento terminado (sin PDF)")
+        html = mostrar_vista_previa(trabajo, expandida=True)
+        if html:
+            st.download_button(
+                "📥 Descargar HTML",
+                html,
+                file_name=f"{trabajo['id']}.html",
+                mime="text/html",
+                use_container_width=True,
+                key=f"descarga_html_{trabajo['id']}"
+            )
+    elif estado == ESTADO_COMPLETADO:
+        st.error(f"❌ {titulo}: no se encontró el PDF generado después de la ejecución.")
     else:
-        # Si no hay PDF y tampoco error explícito, mensaje genérico
-        st.error("❌ Ocurrió un problema desconocido al generar el PDF.")
+        st.error(f"❌ {titulo}: {trabajo.get('error') or 'Ocurrió un problema desconocido al generar el PDF.'}")
+
+    if estado == ESTADO_COMPLETADO and trabajo.get("secciones_fallidas"):
+        st.warning("⚠️ Estas secciones fallaron también al reintentarlas y pueden estar incompletas: "
+                   + ", ".join(trabajo["secciones_fallidas"]))
+
+
+trabajos_sesion = [gestor.estado(t) for t in st.session_state["trabajos"]]
+hay_activos = any(t.get("estado") in ESTADOS_ACTIVOS for t in trabajos_sesion)
+
+
+@st.fragment(run_every=3 if hay_activos else None)
+def panel_trabajos():
+    trabajos = [gestor.estado(t) for t in st.session_state["trabajos"]]
+    for trabajo in trabajos:
+        if trabajo:
+            mostrar_trabajo(trabajo)
+    # Si el último trabajo activo acaba de terminar, recargar la página para dejar de sondear
+    if hay_activos and not any(t.get("estado") in ESTADOS_ACTIVOS for t in trabajos):
+        st.rerun()
+
 
+panel_trabajos()
 
 # --------------------------------------------------------
 # Aviso si se ejecuta con python en lugar de streamlit
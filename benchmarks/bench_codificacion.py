@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# proyecto_crewai/benchmarks/bench_codificacion.py
+
+"""
+Benchmark de la corrección de mojibake (utils/fix_encoding.py).
+
+Compara, sobre ficheros Markdown de varios MB con y sin mojibake:
+- "versión anterior": el archivo entero decodificado de golpe, un str.replace por cada
+  secuencia (27 copias del texto) y las tres expresiones regulares de limpieza.
+- "fix_markdown_encoding": lectura por fragmentos y una sola expresión regular con todas
+  las secuencias.
+- "reparar_texto": solo la corrección, como se aplica al guardar cada sección.
+
+Comprueba además que el resultado es el texto original limpio, que ReparadorCodificacion
+da lo mismo que reparar_texto al partir el texto en fragmentos de tamaño aleatorio y que
+los caracteres bien codificados 'â', 'Â' y '�' no se tocan.
+
+Uso:
+    python benchmarks/bench_codificacion.py --mb 5 --repeticiones 5
+"""
+
+import os
+import re
+import sys
+import time
+import codecs
+import random
+import shutil
+import argparse
+import tempfile
+import statistics
+
+RAIZ_PROYECTO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ_PROYECTO)
+
+from utils.fix_encoding import ReparadorCodificacion, fix_markdown_encoding, reparar_texto
+
+# Tabla de la versión anterior, aplicada con un str.replace por entrada
+REEMPLAZOS_ANTERIORES = {
+    'Ã¡': 'á', 'Ã©': 'é', 'Ã\xad': 'í', 'Ã³': 'ó', 'Ãº': 'ú',
+    'Ã±': 'ñ', 'Ã\x81': 'Á', 'Ã‰': 'É', 'Ã\x8d': 'Í', 'Ã“': 'Ó',
+    'Ãš': 'Ú', 'Ã‘': 'Ñ', 'Ã¼': 'ü', 'Ã§': 'ç',
+    'â€™': '’', 'â€œ': '“', 'â€\x9d': '”', 'â€“': '–', 'â€”': '—',
+    'â€˜': '‘', 'â€¢': '•', 'â€¦': '…', 'â€': '"', 'â': '"',
+    'Âº': 'º', 'Â': '', '�': ''
+}
+
+# Texto bien codificado con los caracteres sueltos que la tabla anterior borraba o cambiaba
+TEXTO_CORRECTO = "El château de São Paulo, Câmara, Â y el carácter � se conservan."
+
+
+def _limpiar(content: str) -> str:
+    content = re.sub(r'<!--.*?-->\s*', '', content, flags=re.DOTALL)
+    content = re.sub(r'[”"}]+\s*$', '', content, flags=re.MULTILINE)
+    content = re.sub(r'\n{3,}', '\n\n', content)
+    return content.strip() + '\n'
+
+
+def _fix_markdown_encoding_anterior(file_path: str):
+    """Réplica de la versión anterior de fix_markdown_encoding."""
+    with open(file_path, 'rb') as f:
+        content = f.read().decode('latin-1')
+    for wrong, correct in REEMPLAZOS_ANTERIORES.items():
+        content = content.replace(wrong, correct)
+    content = _limpiar(content)
+    os.replace(file_path, f"{file_path}.backup")
+    with codecs.open(file_path, 'w', encoding='utf-8-sig') as f:
+        f.write(content)
+
+
+def _markdown_ejemplo(megas: float, con_mojibake: bool) -> tuple[str, bytes]:
+    """
+    Texto original y su fichero en UTF-8. Con mojibake, una sección de cada diez se codifica
+    dos veces (UTF-8 leído como cp1252 y vuelto a guardar en UTF-8).
+    """
+    parrafo = ("La optimización de la canalización «extremo a extremo» reduce la latencia — "
+               "según el análisis, el diseño ‘óptimo’ depende del tamaño… ¿Cuánto? Año 2024.\n\n")
+    textos, bloques = [], []
+    total = 0
+    i = 0
+    while total < megas * 1024 * 1024:
+        texto = f"## {i}. Sección {i}\n\n{parrafo * 8}<!-- nota {i} -->\n\n\n\n"
+        datos = texto.encode("utf-8")
+        if con_mojibake and i % 10 == 0:
+            datos = datos.decode("cp1252").encode("utf-8")
+        textos.append(texto)
+        bloques.append(datos)
+        total += len(datos)
+        i += 1
+    return "".join(textos), b"".join(bloques)
+
+
+def _medir(nombre: str, funcion, repeticiones: int) -> float:
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    media = statistics.mean(tiempos)
+    print(f"   {nombre}: {media * 1000:.1f} ms (mínimo {min(tiempos) * 1000:.1f} ms)")
+    return media
+
+
+def _comprobar_fragmentos(texto: str, esperado: str, intentos: int = 20) -> bool:
+    """ReparadorCodificacion con cortes aleatorios debe dar lo mismo que reparar_texto."""
+    azar = random.Random(0)
+    for _ in range(intentos):
+        reparador = ReparadorCodificacion()
+        partes, posicion = [], 0
+        while posicion < len(texto):
+            tamano = azar.randint(1, 4096)
+            partes.append(reparador.procesar(texto[posicion:posicion + tamano]))
+            posicion += tamano
+        partes.append(reparador.finalizar())
+        if "".join(partes) != esperado:
+            return False
+    return True
+
+
+def _comprobar_texto_correcto() -> bool:
+    """El texto bien codificado no cambia; el mismo texto mal decodificado se recupera entero."""
+    mal_decodificado = TEXTO_CORRECTO.encode("utf-8").decode("cp1252", errors="ignore")
+    intacto = reparar_texto(TEXTO_CORRECTO) == TEXTO_CORRECTO
+    reparado = reparar_texto(mal_decodificado) == TEXTO_CORRECTO
+    print(f"Texto correcto intacto: {intacto} | texto mal decodificado reparado: {reparado}")
+    return intacto and reparado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la corrección de mojibake")
+    parser.add_argument("--mb", type=float, default=5, help="Tamaño de los ficheros de prueba")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix="bench_codificacion_")
+    correcto = _comprobar_texto_correcto()
+    try:
+        for con_mojibake in (False, True):
+            original, datos = _markdown_ejemplo(args.mb, con_mojibake)
+            etiqueta = "con mojibake" if con_mojibake else "sin mojibake"
+            print(f"\nFichero {etiqueta}: {len(datos) / 1024 / 1024:.1f} MB")
+
+            rutas = {}
+            for nombre in ("anterior", "nueva"):
+                rutas[nombre] = os.path.join(directorio, f"{nombre}.md")
+
+            def preparar_y(funcion, ruta):
+                def ejecutar():
+                    with open(ruta, "wb") as f:
+                        f.write(datos)
+                    funcion(ruta)
+                return ejecutar
+
+            # La escritura del fichero de entrada se mide en ambos casos por igual
+            anterior = _medir("Versión anterior     ",
+                              preparar_y(_fix_markdown_encoding_anterior, rutas["anterior"]),
+                              args.repeticiones)
+            nueva = _medir("fix_markdown_encoding",
+                           preparar_y(fix_markdown_encoding, rutas["nueva"]),
+                           args.repeticiones)
+            texto = datos.decode("utf-8")
+            _medir("reparar_texto        ", lambda: reparar_texto(texto), args.repeticiones)
+            print(f"   fix_markdown_encoding {anterior / nueva:.1f}x más rápido que la versión anterior")
+
+            esperado = _limpiar(original)
+            resultados = {}
+            for nombre, ruta in rutas.items():
+                with open(ruta, encoding="utf-8-sig") as f:
+                    resultados[nombre] = f.read() == esperado
+            fragmentos = _comprobar_fragmentos(texto[:512 * 1024], reparar_texto(texto[:512 * 1024]))
+            print(f"   Texto original recuperado: anterior {resultados['anterior']} | "
+                  f"nueva {resultados['nueva']} | fragmentos aleatorios idénticos: {fragmentos}")
+            correcto = correcto and resultados["nueva"] and fragmentos
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+    return correcto
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# proyecto_crewai/benchmarks/bench_flujo.py
+
+"""
+Benchmark extremo a extremo de DocumentoFlowCompleto sin APIs reales.
+
+Arranca los servidores falsos de Serper y del LLM, apunta el flujo a ellos mediante
+SERPER_BASE_URL / LLM_MODEL / LLM_BASE_URL y ejecuta el flujo completo en un directorio
+temporal. Mide el tiempo de cada paso del flujo, las llamadas al LLM, las peticiones HTTP a
+Serper y el pico de memoria (RSS), y guarda el resultado en JSON para comparar commits.
+Incluye el informe de métricas del propio flujo (utils/metrics.py) con el desglose por etapa
+y sección, para contrastarlo con lo que cuentan los servidores falsos.
+
+Uso:
+    python benchmarks/bench_flujo.py --secciones 10 --paralelo 3
+    python benchmarks/bench_flujo.py --comparar benchmarks/resultados/anterior.json
+"""
+
+import os
+import re
+import sys
+import glob
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import subprocess
+import threading
+from datetime import datetime
+
+RAIZ_PROYECTO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ_PROYECTO)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from servidores_falsos import ServidorSerperFalso, ServidorLLMFalso
+from utils.metrics import formatear_informe, formatear_prompts
+
+DIRECTORIO_RESULTADOS = os.path.join(RAIZ_PROYECTO, "benchmarks", "resultados")
+
+
+def _commit_actual() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ_PROYECTO, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except Exception:
+        return "desconocido"
+
+
+def _pico_rss_mb() -> float:
+    """Pico de memoria residente del proceso (ru_maxrss está en KB en Linux y en bytes en macOS)."""
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024, 1)
+
+
+class _CronometroEtapas:
+    """Mide la duración de cada método del flujo con los eventos de CrewAI."""
+
+    def __init__(self):
+        self.inicios = {}
+        self.etapas = {}
+        self._lock = threading.Lock()
+
+    def registrar(self):
+        try:
+            from crewai.events import (
+                crewai_event_bus, MethodExecutionStartedEvent, MethodExecutionFinishedEvent
+            )
+        except ImportError:
+            from crewai.utilities.events import (  # versiones anteriores de CrewAI
+                crewai_event_bus, MethodExecutionStartedEvent, MethodExecutionFinishedEvent
+            )
+
+        @crewai_event_bus.on(MethodExecutionStartedEvent)
+        def _inicio(source, event):
+            with self._lock:
+                self.inicios[event.method_name] = time.perf_counter()
+
+        @crewai_event_bus.on(MethodExecutionFinishedEvent)
+        def _fin(source, event):
+            with self._lock:
+                inicio = self.inicios.pop(event.method_name, None)
+                if inicio is not None:
+                    self.etapas[event.method_name] = round(time.perf_counter() - inicio, 3)
+
+
+class _ObservadorVistaPrevia:
+    """Anota cuándo aparece la primera sección redactada en la vista previa HTML."""
+
+    _PATRON = re.compile(r"(\d+)/\d+ secciones redactadas")
+
+    def __init__(self, inicio: float):
+        self.inicio = inicio
+        self.primera_seccion_s = None
+        self._parar = threading.Event()
+        self._hilo = threading.Thread(target=self._observar, daemon=True)
+
+    def _observar(self):
+        while not self._parar.wait(0.05):
+            for ruta in glob.glob(os.path.join("output", "previews", "*.html")):
+                try:
+                    with open(ruta, "r", encoding="utf-8") as f:
+                        estado = self._PATRON.search(f.read())
+                except OSError:
+                    continue
+                if estado and int(estado.group(1)) >= 1:
+                    self.primera_seccion_s = round(time.perf_counter() - self.inicio, 3)
+                    return
+
+    def iniciar(self):
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self._parar.set()
+        self._hilo.join()
+
+
+def ejecutar_benchmark(args) -> dict:
+    serper = ServidorSerperFalso(latencia_s=args.latencia_serper, latencia_imagen_s=args.latencia_imagen).iniciar()
+    llm = ServidorLLMFalso(
+        secciones=args.secciones, latencia_s=args.latencia_llm, tokens_por_segundo=args.tokens_por_segundo,
+        formato_estructura=args.estructura
+    ).iniciar()
+
+    os.environ.update({
+        "SERPER_API_KEY": "falsa",
+        "SERPER_BASE_URL": serper.url,
+        "GEMINI_API_KEY": "falsa",
+        "LLM_MODEL": "openai/fake-llm",
+        "LLM_BASE_URL": f"{llm.url}/v1",
+        "LLM_MAX_RPM": str(args.max_rpm),
+    })
+    if not args.con_caches:
+        os.environ["SERPER_CACHE_BYPASS"] = "1"
+        os.environ["LLM_CACHE_MODE"] = "desactivado"
+
+    # Ejecutar en un directorio temporal para no tocar temp/, output/ ni cache/ del proyecto
+    directorio_original = os.getcwd()
+    directorio_ejecucion = tempfile.mkdtemp(prefix="bench_flujo_")
+    os.chdir(directorio_ejecucion)
+    try:
+        from flows.documento_flow import DocumentoFlowCompleto
+
+        cronometro = _CronometroEtapas()
+        cronometro.registrar()
+
+        inicio = time.perf_counter()
+        observador = _ObservadorVistaPrevia(inicio).iniciar()
+        inputs = {
+            "topic": args.tema, "max_rpm": args.max_rpm,
+            "max_secciones_paralelo": args.paralelo, "backend_pdf": args.backend,
+            "generar_pdf": not args.sin_pdf,
+        }
+        flow = DocumentoFlowCompleto()
+        flow.kickoff(inputs=inputs)
+        total = time.perf_counter() - inicio
+        observador.detener()
+        pdf_generado = bool(flow.state.pdf_final and os.path.exists(flow.state.pdf_final))
+        secciones_detectadas = flow.state.total_secciones
+        metricas = {}
+        if flow.state.informe_metricas and os.path.exists(flow.state.informe_metricas):
+            with open(flow.state.informe_metricas, "r", encoding="utf-8") as f:
+                metricas = json.load(f)
+    finally:
+        os.chdir(directorio_original)
+        shutil.rmtree(directorio_ejecucion, ignore_errors=True)
+        serper.detener()
+        llm.detener()
+
+    return {
+        "commit": _commit_actual(),
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "parametros": vars(args),
+        "total_s": round(total, 3),
+        "primera_seccion_s": observador.primera_seccion_s,
+        "etapas_s": cronometro.etapas,
+        "llm": llm.metricas(),
+        "http": dict(serper.contadores),
+        "pdf_generado": pdf_generado,
+        "secciones_detectadas": secciones_detectadas,
+        "rss_pico_mb": _pico_rss_mb(),
+        "metricas_flujo": metricas,
+    }
+
+
+def comparar(actual: dict, anterior: dict):
+    """Imprime la diferencia de tiempos entre dos resultados."""
+    print(f"\nComparación con {anterior.get('commit')} ({anterior.get('fecha')}):")
+    filas = [
+        ("total", anterior.get("total_s"), actual.get("total_s")),
+        ("primera_seccion", anterior.get("primera_seccion_s"), actual.get("primera_seccion_s")),
+    ]
+    for etapa, segundos in actual.get("etapas_s", {}).items():
+        filas.append((etapa, anterior.get("etapas_s", {}).get(etapa), segundos))
+    filas.append(("rss_pico_mb", anterior.get("rss_pico_mb"), actual.get("rss_pico_mb")))
+    for nombre, antes, ahora in filas:
+        if antes and ahora:
+            print(f"   • {nombre}: {antes} -> {ahora} ({(ahora - antes) / antes:+.1%})")
+        else:
+            print(f"   • {nombre}: {ahora}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline de DocumentoFlowCompleto")
+    parser.add_argument("--tema", default="Benchmark de rendimiento")
+    parser.add_argument("--secciones", type=int, default=10)
+    parser.add_argument("--paralelo", type=int, default=1, help="max_secciones_paralelo")
+    parser.add_argument("--max-rpm", type=int, default=600)
+    parser.add_argument("--backend", default="alta_calidad", help="backend_pdf: alta_calidad o borrador")
+    parser.add_argument("--sin-pdf", action="store_true", help="Terminar en la vista previa HTML")
+    parser.add_argument("--estructura", default="json", choices=ServidorLLMFalso.FORMATOS_ESTRUCTURA,
+                        help="Formato de la respuesta del estructurador en el LLM falso")
+    parser.add_argument("--latencia-llm", type=float, default=0.5)
+    parser.add_argument("--tokens-por-segundo", type=float, default=200.0)
+    parser.add_argument("--latencia-serper", type=float, default=0.3)
+    parser.add_argument("--latencia-imagen", type=float, default=0.5)
+    parser.add_argument("--con-caches", action="store_true", help="No desactivar las cachés de búsqueda y LLM")
+    parser.add_argument("--salida", default="", help="Fichero JSON de resultados")
+    parser.add_argument("--comparar", default="", help="JSON de un resultado anterior")
+    args = parser.parse_args()
+
+    resultado = ejecutar_benchmark(args)
+
+    salida = args.salida or os.path.join(
+        DIRECTORIO_RESULTADOS, f"{datetime.now():%Y%m%d_%H%M%S}_{resultado['commit']}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+
+    print("\n" + "=" * 60)
+    print(f"BENCHMARK ({resultado['commit']}): {resultado['total_s']} s en total")
+    print(f"Primera sección en la vista previa: {resultado['primera_seccion_s']} s")
+    for etapa, segundos in resultado["etapas_s"].items():
+        print(f"   • {etapa}: {segundos} s")
+    print(f"Secciones detectadas: {resultado['secciones_detectadas']}/{args.secciones} "
+          f"(estructura {args.estructura})")
+    print(f"Llamadas al LLM: {resultado['llm']['llamadas']}")
+    print(f"Peticiones HTTP: {resultado['http']}")
+    if resultado["metricas_flujo"]:
+        print("Métricas del flujo por etapa:")
+        for linea in formatear_informe(resultado["metricas_flujo"]):
+            print(f"   • {linea}")
+        print("Tokens de entrada por llamada según la sección:")
+        for linea in formatear_prompts(resultado["metricas_flujo"]):
+            print(f"   • {linea}")
+    print(f"PDF generado: {resultado['pdf_generado']} | Pico RSS: {resultado['rss_pico_mb']} MB")
+    print(f"Resultado guardado en: {salida}")
+
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            comparar(resultado, json.load(f))
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
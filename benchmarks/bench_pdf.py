@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# proyecto_crewai/benchmarks/bench_pdf.py
+
+"""
+Benchmark del renderizado de PDF con WeasyPrint.
+
+Compara, para N documentos seguidos:
+- "sin reutilizar": como antes, cada PDF crea su FontConfiguration y vuelve a parsear
+  la hoja de estilos.
+- "RenderizadorPDF": hoja de estilos compilada y FontConfiguration compartidas.
+
+Además compara los backends de generación completos (alta_calidad frente a borrador) y
+comprueba el desglose de tamaño (tools/pdf_optimizacion.py) sobre los PDF de WeasyPrint:
+las categorías deben sumar el total y las fuentes incrustadas no pueden salir a cero.
+
+También comprueba que el renderizado completo y el incremental dan el mismo número de
+páginas y la misma numeración en el pie sobre un documento pequeño.
+
+Por último mide el tamaño del PDF con portada de cada preset, con el renderizado completo
+y con el incremental (tools/pdf_incremental.py): en ambos, "compacto" tiene que dejar las
+imágenes más pequeñas que "maxima_calidad".
+
+Uso:
+    python benchmarks/bench_pdf.py --documentos 10 --secciones 8
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+
+RAIZ_PROYECTO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ_PROYECTO)
+
+from tools.pdf_render import (
+    ESTILOS_PDF, RenderizadorPDF, BACKENDS_PDF, obtener_backend_pdf, obtener_renderizador,
+    _dividir_secciones, _html_documento, _html_portada,
+)
+from tools.pdf_incremental import CompiladorIncremental
+from tools.pdf_optimizacion import PRESETS_PDF, desglose_pdf, formatear_desglose
+
+
+def _markdown_ejemplo(secciones: int) -> str:
+    partes = ["# Documento de benchmark\n"]
+    parrafo = " ".join(["Texto técnico de ejemplo con **negrita** y `código`."] * 20)
+    for i in range(1, secciones + 1):
+        partes.append(
+            f"## {i}. Sección {i}\n\n{parrafo}\n\n- Punto uno\n- Punto dos\n\n"
+            "| Columna A | Columna B |\n|-----------|-----------|\n| 1 | 2 |\n"
+        )
+    return "\n".join(partes)
+
+
+def _html(cuerpo: str) -> str:
+    return f'<!DOCTYPE html><html lang="es"><head><meta charset="UTF-8"></head><body>{cuerpo}</body></html>'
+
+
+def _sin_reutilizar(html_content: str, ruta: str) -> float:
+    """Render como lo hacía _generar_pdf_base antes: fuentes y CSS se preparan de nuevo. Devuelve el setup."""
+    inicio = time.perf_counter()
+    from weasyprint import HTML, CSS
+    from weasyprint.text.fonts import FontConfiguration
+    font_config = FontConfiguration()
+    hoja_estilos = CSS(string=ESTILOS_PDF, font_config=font_config)
+    html = _html(html_content)
+    setup = time.perf_counter() - inicio
+    HTML(string=html).write_pdf(ruta, stylesheets=[hoja_estilos], font_config=font_config)
+    return setup
+
+
+def _con_renderizador(renderizador: RenderizadorPDF, html_content: str, ruta: str) -> float:
+    inicio = time.perf_counter()
+    html = _html(html_content)
+    setup = time.perf_counter() - inicio
+    renderizador.escribir_pdf(html, ruta)
+    return setup
+
+
+def _con_backend(backend, markdown_content: str, ruta: str) -> float:
+    """Generación completa (markdown → PDF) con un backend; el setup no se mide por separado."""
+    backend.generar(markdown_content, None, ruta, os.path.dirname(ruta))
+    return 0.0
+
+
+def _imagen_portada(directorio: str) -> str:
+    """Foto sintética (degradado con ruido) bastante mayor que el tamaño al que se imprime."""
+    from PIL import Image
+    ancho, alto = 2400, 1800
+    imagen = Image.radial_gradient("L").resize((ancho, alto)).convert("RGB")
+    ruido = Image.effect_noise((ancho, alto), 60).convert("RGB")
+    ruta = os.path.join(directorio, "portada_original.jpg")
+    Image.blend(imagen, ruido, 0.5).save(ruta, "JPEG", quality=95)
+    return ruta
+
+
+def _compilar_incremental(markdown_content: str, imagen: str, ruta: str, preset: str = None):
+    """El mismo documento maquetado sección a sección y unido con la portada, como en el flujo."""
+    partes = _dividir_secciones(markdown_content)
+    compilador = CompiladorIncremental(partes[0], len(partes) - 1, preset=preset)
+    for idx, seccion in enumerate(partes[1:]):
+        compilador.enviar_seccion(idx, seccion)
+    return compilador, compilador.finalizar(markdown_content, imagen, ruta, os.path.dirname(ruta))
+
+
+def _pdf_incremental(markdown_content: str, imagen: str, ruta: str, preset: str) -> str:
+    return _compilar_incremental(markdown_content, imagen, ruta, preset)[1]
+
+
+def _texto_caja(caja) -> str:
+    if hasattr(caja, "text"):
+        return caja.text
+    return "".join(_texto_caja(hija) for hija in getattr(caja, "children", []))
+
+
+def _pies_de_pagina(documentos: list) -> list[str]:
+    """Texto del pie (@bottom-center, el número) de cada página, tal como lo maquetó WeasyPrint."""
+    return [
+        "".join(_texto_caja(caja) for caja in pagina._page_box.children
+                if getattr(caja, "at_keyword", "") == "@bottom-center")
+        for documento in documentos for pagina in documento.pages
+    ]
+
+
+def _comparar_paginacion(directorio: str) -> bool:
+    """Mismas páginas y misma numeración con el renderizado completo y con el incremental."""
+    parrafo = " ".join(["Texto técnico de ejemplo con **negrita** y `código`."] * 20)
+    markdown_content = "# Documento de paginación\n\n" + "".join(
+        f"## Sección {i}\n\n" + f"{parrafo}\n\n" * (1 if i % 2 else 12) for i in range(1, 5)
+    )
+    renderizador = obtener_renderizador()
+    completo = renderizador.renderizar(_html_documento(
+        f"{_html_portada(markdown_content)}\n{renderizador.markdown_a_html(markdown_content)}"
+    ))
+    compilador, pdf_path = _compilar_incremental(
+        markdown_content, None, os.path.join(directorio, "paginacion_incremental.pdf")
+    )
+    if not pdf_path:
+        print("\n[ERROR] El renderizado incremental no generó el PDF de paginación")
+        return False
+    pies_completo = _pies_de_pagina([completo])
+    pies_incremental = _pies_de_pagina([compilador.portada] + compilador.fragmentos)
+    print(f"\nPaginación: completo {len(completo.pages)} páginas {pies_completo} | "
+          f"incremental {len(pies_incremental)} páginas {pies_incremental}")
+    if pies_completo != pies_incremental:
+        print("   [ERROR] El renderizado incremental no da las mismas páginas que el completo")
+        return False
+    return True
+
+
+def _comparar_presets(directorio: str, markdown_content: str) -> bool:
+    """Tamaño total y de imágenes por preset, con el renderizado completo y con el incremental."""
+    imagen = _imagen_portada(directorio)
+    backend = obtener_backend_pdf("alta_calidad")
+    correcto = True
+    print(f"\nTamaño por preset (portada de {os.path.getsize(imagen) / 1024:.0f} KB):")
+    for modo in ("completo", "incremental"):
+        imagenes = {}
+        for preset in PRESETS_PDF:
+            ruta = os.path.join(directorio, f"preset_{modo}_{preset}.pdf")
+            if modo == "completo":
+                pdf_path = backend.generar(markdown_content, imagen, ruta, directorio, preset)
+            else:
+                pdf_path = _pdf_incremental(markdown_content, imagen, ruta, preset)
+            if not pdf_path:
+                print(f"   [ERROR] No se generó el PDF {modo} con el preset {preset}")
+                correcto = False
+                continue
+            desglose = desglose_pdf(pdf_path)
+            imagenes[preset] = desglose["imagenes"]
+            print(f"   {modo:<11} {preset:<14}: {desglose['total'] / 1024:7.1f} KB "
+                  f"(imágenes {desglose['imagenes'] / 1024:.1f} KB)")
+        if imagenes.get("compacto", 0) >= imagenes.get("maxima_calidad", 0):
+            print(f"   [ERROR] Con el renderizado {modo}, 'compacto' no reduce las imágenes")
+            correcto = False
+    return correcto
+
+
+def _medir(nombre: str, funcion, documentos: int):
+    totales, setups = [], []
+    for i in range(documentos):
+        inicio = time.perf_counter()
+        setups.append(funcion(i))
+        totales.append(time.perf_counter() - inicio)
+    print(f"{nombre}: total medio {statistics.mean(totales) * 1000:.1f} ms | "
+          f"setup medio {statistics.mean(setups) * 1000:.1f} ms | "
+          f"primer PDF {totales[0] * 1000:.1f} ms")
+    return totales, setups
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de RenderizadorPDF")
+    parser.add_argument("--documentos", type=int, default=10)
+    parser.add_argument("--secciones", type=int, default=8)
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix="bench_pdf_")
+    inicio = time.perf_counter()
+    renderizador = RenderizadorPDF()
+    creacion = time.perf_counter() - inicio
+    html_content = renderizador.markdown_a_html(_markdown_ejemplo(args.secciones))
+    print(f"Creación de RenderizadorPDF (una vez por proceso): {creacion * 1000:.1f} ms\n")
+
+    _, setups_antes = _medir(
+        "Sin reutilizar  ",
+        lambda i: _sin_reutilizar(html_content, os.path.join(directorio, f"antes_{i}.pdf")),
+        args.documentos,
+    )
+    _, setups_ahora = _medir(
+        "RenderizadorPDF ",
+        lambda i: _con_renderizador(renderizador, html_content, os.path.join(directorio, f"ahora_{i}.pdf")),
+        args.documentos,
+    )
+    ahorro = statistics.mean(setups_antes) - statistics.mean(setups_ahora)
+    print(f"\nAhorro de preparación por PDF: {ahorro * 1000:.1f} ms\n")
+
+    markdown_content = _markdown_ejemplo(args.secciones)
+    medias = {}
+    for nombre in BACKENDS_PDF:
+        backend = obtener_backend_pdf(nombre)
+        totales, _ = _medir(
+            f"Backend {nombre:<12}",
+            lambda i: _con_backend(backend, markdown_content, os.path.join(directorio, f"{nombre}_{i}.pdf")),
+            args.documentos,
+        )
+        medias[nombre] = statistics.mean(totales)
+    print(f"\nBorrador {medias['alta_calidad'] / medias['borrador']:.1f}x más rápido que alta calidad")
+
+    desglose_correcto = True
+    for nombre in BACKENDS_PDF:
+        desglose = desglose_pdf(os.path.join(directorio, f"{nombre}_0.pdf"))
+        print(f"\nDesglose del PDF ({nombre}, {desglose['total'] / 1024:.1f} KB):")
+        for linea in formatear_desglose(desglose):
+            print(f"   • {linea}")
+        suma = sum(desglose[categoria] for categoria in ("fuentes", "imagenes", "contenido", "estructura"))
+        if suma != desglose["total"] or desglose["fuentes"] == 0 or desglose["contenido"] == 0:
+            print("   [ERROR] El desglose no cuadra con el PDF generado")
+            desglose_correcto = False
+
+    paginacion_correcta = _comparar_paginacion(directorio)
+    presets_correctos = _comparar_presets(directorio, markdown_content)
+    return desglose_correcto and paginacion_correcta and presets_correctos
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# proyecto_crewai/benchmarks/servidores_falsos.py
+
+"""
+Servidores HTTP locales que sustituyen a Serper y al LLM en los benchmarks.
+
+- ServidorSerperFalso: POST /search (consulta única o array en lote), POST /images y
+  GET /imagen.png con una imagen generada al vuelo.
+- ServidorLLMFalso: POST /v1/chat/completions compatible con OpenAI. Reconoce al agente por
+  su prompt (estructurador, buscador o escritor) y responde lo que el flujo espera, tanto en
+  formato ReAct (Action / Final Answer) como con tool_calls nativas. El esquema del
+  estructurador puede devolverse como JSON, como títulos Markdown o como texto inválido
+  (para probar la corrección del esquema).
+
+Ambos tienen latencia configurable y cuentan las peticiones que reciben.
+"""
+
+import re
+import json
+import time
+import zlib
+import struct
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _png_solido(ancho: int, alto: int, color=(52, 152, 219)) -> bytes:
+    """PNG RGB de un solo color generado con la biblioteca estándar."""
+    def _chunk(tipo: bytes, datos: bytes) -> bytes:
+        return struct.pack(">I", len(datos)) + tipo + datos + struct.pack(">I", zlib.crc32(tipo + datos))
+    fila = b"\x00" + bytes(color) * ancho
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + _chunk(b"IHDR", struct.pack(">IIBBBBB", ancho, alto, 8, 2, 0, 0, 0))
+        + _chunk(b"IDAT", zlib.compress(fila * alto, 6))
+        + _chunk(b"IEND", b"")
+    )
+
+
+class _ServidorBase:
+    """Arranca un ThreadingHTTPServer en un puerto libre y cuenta peticiones por ruta."""
+
+    def __init__(self):
+        self.contadores = defaultdict(int)
+        self._lock = threading.Lock()
+        servidor = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def _cuerpo_json(self):
+                longitud = int(self.headers.get("Content-Length", "0") or 0)
+                return json.loads(self.rfile.read(longitud) or b"null")
+
+            def _responder(self, codigo: int, cuerpo: bytes, tipo: str = "application/json"):
+                self.send_response(codigo)
+                self.send_header("Content-Type", tipo)
+                self.send_header("Content-Length", str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def do_GET(self):
+                servidor._contar(self.path)
+                servidor.manejar(self, "GET", None)
+
+            def do_POST(self):
+                servidor._contar(self.path)
+                servidor.manejar(self, "POST", self._cuerpo_json())
+
+            def log_message(self, *args):
+                pass
+
+        self._http = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._http.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._http.server_address[1]}"
+
+    def _contar(self, ruta: str):
+        with self._lock:
+            self.contadores[ruta.split("?")[0]] += 1
+
+    def manejar(self, handler, metodo: str, cuerpo):
+        raise NotImplementedError
+
+    def iniciar(self):
+        threading.Thread(target=self._http.serve_forever, daemon=True).start()
+        return self
+
+    def detener(self):
+        self._http.shutdown()
+        self._http.server_close()
+
+
+# ==================== SERPER ====================
+
+class ServidorSerperFalso(_ServidorBase):
+    """Stand-in de google.serper.dev."""
+
+    def __init__(self, latencia_s: float = 0.3, latencia_imagen_s: float = 0.5,
+                 tamano_imagen: tuple = (1600, 1200)):
+        super().__init__()
+        self.latencia_s = latencia_s
+        self.latencia_imagen_s = latencia_imagen_s
+        self._imagen = _png_solido(*tamano_imagen)
+
+    @staticmethod
+    def _resultado(query: str) -> dict:
+        return {
+            "searchParameters": {"q": query},
+            "organic": [
+                {
+                    "title": f"{query} - resultado {i}",
+                    "link": f"https://ejemplo.org/{i}",
+                    "snippet": f"Datos técnicos, cifras y ejemplos sobre {query} (fuente {i}).",
+                }
+                for i in range(1, 6)
+            ],
+        }
+
+    def manejar(self, handler, metodo, cuerpo):
+        ruta = handler.path.split("?")[0]
+        if ruta == "/search":
+            time.sleep(self.latencia_s)
+            if isinstance(cuerpo, list):
+                respuesta = [self._resultado(c.get("q", "")) for c in cuerpo]
+            else:
+                respuesta = self._resultado((cuerpo or {}).get("q", ""))
+            handler._responder(200, json.dumps(respuesta).encode("utf-8"))
+        elif ruta == "/images":
+            time.sleep(self.latencia_s)
+            respuesta = {"images": [{"imageUrl": f"{self.url}/imagen.png"}]}
+            handler._responder(200, json.dumps(respuesta).encode("utf-8"))
+        elif ruta == "/imagen.png":
+            time.sleep(self.latencia_imagen_s)
+            handler._responder(200, self._imagen, "image/png")
+        else:
+            handler._responder(404, b"{}")
+
+
+# ==================== LLM ====================
+
+PALABRAS_SECCION = 450
+
+
+class ServidorLLMFalso(_ServidorBase):
+    """Stand-in de un endpoint /v1/chat/completions compatible con OpenAI."""
+
+    FORMATOS_ESTRUCTURA = ("json", "markdown", "invalida")
+
+    def __init__(self, secciones: int = 10, latencia_s: float = 0.5, tokens_por_segundo: float = 200.0,
+                 formato_estructura: str = "json"):
+        super().__init__()
+        self.secciones = secciones
+        self.formato_estructura = formato_estructura
+        self.latencia_s = latencia_s
+        self.tokens_por_segundo = tokens_por_segundo
+        self.llamadas = defaultdict(int)
+        self.tokens_entrada = defaultdict(int)
+        self.tokens_salida = defaultdict(int)
+
+    @staticmethod
+    def _tokens(texto: str) -> int:
+        return max(1, len(texto) // 4)
+
+    @staticmethod
+    def _texto_mensajes(mensajes: list) -> str:
+        partes = []
+        for mensaje in mensajes or []:
+            contenido = mensaje.get("content") or ""
+            if isinstance(contenido, list):
+                contenido = " ".join(str(p.get("text", "")) for p in contenido if isinstance(p, dict))
+            partes.append(str(contenido))
+        return "\n".join(partes)
+
+    def _estructura(self, texto: str, formato: str) -> str:
+        tema = re.search(r"documento (?:técnico )?sobre:? '?([^'\n]+)", texto)
+        tema = tema.group(1).strip() if tema else "Documento"
+        if formato == "markdown":
+            titulos = "\n\n".join(f"## {i}. Apartado {i} de {tema}" for i in range(1, self.secciones + 1))
+            return f"# {tema}\n\n{titulos}"
+        if formato == "invalida":
+            return f"Claro, este sería un buen documento sobre {tema}, con varias partes bien organizadas."
+        return json.dumps({
+            "titulo": tema,
+            "secciones": [
+                {"titulo": f"Apartado {i} de {tema}", "busquedas": [f"apartado {i} {tema}"]}
+                for i in range(1, self.secciones + 1)
+            ],
+        }, ensure_ascii=False)
+
+    @staticmethod
+    def _seccion(texto: str, patron: str) -> str:
+        encontrado = re.search(patron, texto)
+        return encontrado.group(1) if encontrado else "Sección"
+
+    def _respuesta(self, cuerpo: dict):
+        """Devuelve (agente, contenido, tool_call o None)."""
+        mensajes = cuerpo.get("messages", [])
+        texto = self._texto_mensajes(mensajes)
+        nativo = bool(cuerpo.get("tools"))
+        ya_uso_herramienta = any(m.get("role") == "tool" for m in mensajes) or "Observation:" in texto
+
+        if "Corriges respuestas para que cumplan un esquema JSON" in texto:
+            return "estructurador", self._estructura(texto, "json"), None
+
+        if "Arquitecto de Documentos" in texto:
+            estructura = self._estructura(texto, self.formato_estructura)
+            return "estructurador", f"Thought: Tengo la estructura.\nFinal Answer: {estructura}", None
+
+        if "Investigador Digital" in texto:
+            seccion = self._seccion(texto, r'Investigar sobre: "([^"]+)"')
+            if not ya_uso_herramienta and "RESULTADOS DE BÚSQUEDA YA DISPONIBLES" not in texto:
+                argumentos = {"query": f"{seccion} datos"}
+                if nativo:
+                    return "buscador", "", ("buscar_web", argumentos)
+                return "buscador", (
+                    f"Thought: Necesito buscar.\nAction: buscar_web\nAction Input: {json.dumps(argumentos)}"
+                ), None
+            puntos = "\n".join(f"- Dato clave {i} sobre {seccion}." for i in range(1, 8))
+            return "buscador", f"Thought: Ya tengo datos.\nFinal Answer: {puntos}", None
+
+        if "Redactor Técnico" in texto:
+            seccion = self._seccion(texto, r'Redactar la sección "([^"]+)"')
+            if not ya_uso_herramienta:
+                parrafo = " ".join(["Contenido técnico de ejemplo para la sección."] * (PALABRAS_SECCION // 7))
+                argumentos = {"content": f"## {seccion}\n\n{parrafo}\n"}
+                if nativo:
+                    return "escritor", "", ("append_to_markdown", argumentos)
+                return "escritor", (
+                    "Thought: Guardo la sección.\nAction: append_to_markdown\n"
+                    f"Action Input: {json.dumps(argumentos, ensure_ascii=False)}"
+                ), None
+            return "escritor", "Thought: Hecho.\nFinal Answer: Contenido añadido exitosamente al archivo markdown.", None
+
+        return "otro", "Thought: Respondo.\nFinal Answer: OK", None
+
+    def manejar(self, handler, metodo, cuerpo):
+        if not handler.path.rstrip("/").endswith("/chat/completions"):
+            handler._responder(404, b"{}")
+            return
+
+        agente, contenido, llamada_herramienta = self._respuesta(cuerpo or {})
+        tokens_entrada = self._tokens(self._texto_mensajes((cuerpo or {}).get("messages", [])))
+        tokens_salida = self._tokens(contenido or json.dumps(llamada_herramienta))
+        with self._lock:
+            self.llamadas[agente] += 1
+            self.tokens_entrada[agente] += tokens_entrada
+            self.tokens_salida[agente] += tokens_salida
+        time.sleep(self.latencia_s + tokens_salida / self.tokens_por_segundo)
+
+        mensaje = {"role": "assistant", "content": contenido or None}
+        finish_reason = "stop"
+        if llamada_herramienta:
+            nombre, argumentos = llamada_herramienta
+            mensaje["tool_calls"] = [{
+                "id": f"call_{int(time.time() * 1000)}",
+                "type": "function",
+                "function": {"name": nombre, "arguments": json.dumps(argumentos, ensure_ascii=False)},
+            }]
+            finish_reason = "tool_calls"
+
+        respuesta = {
+            "id": "chatcmpl-falso",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": (cuerpo or {}).get("model", "fake-llm"),
+            "choices": [{"index": 0, "message": mensaje, "finish_reason": finish_reason}],
+            "usage": {
+                "prompt_tokens": tokens_entrada,
+                "completion_tokens": tokens_salida,
+                "total_tokens": tokens_entrada + tokens_salida,
+            },
+        }
+        handler._responder(200, json.dumps(respuesta, ensure_ascii=False).encode("utf-8"))
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {
+                "llamadas": dict(self.llamadas),
+                "llamadas_total": sum(self.llamadas.values()),
+                "tokens_entrada": dict(self.tokens_entrada),
+                "tokens_salida": dict(self.tokens_salida),
+            }
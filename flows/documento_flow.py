@@ -3,19 +3,38 @@
 
 import os
 import sys
+import time
 import shutil
+import threading
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
 from crewai.flow.flow import Flow, start, listen
 from crewai import Crew, Process
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 try:
-    from agents.estructurador import crear_agente_estructurador, crear_tarea_estructurar
+    from agents.estructurador import crear_agente_estructurador, crear_tarea_estructurar, obtener_esquema
     from agents.buscador import crear_agente_buscador_automatico, crear_tarea_investigacion_automatica
     from agents.escritor import crear_agente_escritor, crear_tarea_redaccion_archivo
-    from tools.search_tools import _buscar_imagen_base
-    from tools.pdf_tool import _generar_pdf_base
+    from tools.search_tools import _buscar_imagen_base, _buscar_web_lote_base
+    from tools.pdf_workers import obtener_servicio_pdf
+    from tools.pdf_incremental import CompiladorIncremental
+    from tools.file_tools import (
+        AlmacenSecciones, crear_herramienta_seccion
+    )
+    from tools.pdf_optimizacion import preset_por_defecto, desglose_pdf, formatear_desglose
+    from tools.pdf_render import (
+        clave_pdf, pdf_desde_cache, guardar_pdf_en_cache, ruta_vista_previa, escribir_vista_previa
+    )
+    from utils.pdf_cache import obtener_cache_pdf, cache_pdf_desactivada
+    from utils.metrics import MetricasEjecucion, formatear_informe, formatear_prompts
+    from utils.rate_limiter import LimitadorPeticiones
+    from utils.search_cache import obtener_cache_busquedas, cache_desactivada
+    from utils.workspace import (
+        nuevo_run_id, crear_espacio_trabajo, liberar_espacio_trabajo, limpiar_espacios_abandonados
+    )
 except ImportError as e:
     print(f"[ERROR] No se pudieron importar las dependencias: {e}")
     sys.exit(1)
@@ -27,12 +46,25 @@ class DocumentoState(BaseModel):
     topic: str = ""
     gemini_api_key: str = ""
     max_rpm: int = 10
-    estructura_completa: str = ""
+    max_secciones_paralelo: int = 1  # 1 = un único Crew secuencial con todas las tareas
+    ventana_titulos_previos: int = 5  # títulos de secciones anteriores que ve cada escritor (0 = ninguno)
+    pdf_incremental: bool = True  # maquetar cada sección en cuanto termina, no todo al final
+    backend_pdf: str = "alta_calidad"  # "alta_calidad" o "borrador" (rápido, para revisar el texto)
+    preset_pdf: str = Field(default_factory=preset_por_defecto)  # maxima_calidad, equilibrado o compacto
+    generar_pdf: bool = True  # False: el resultado es solo la vista previa HTML
+    estructura_completa: str = ""  # esquema validado del estructurador, como índice Markdown
     secciones_lista: list[str] = []
+    busquedas_secciones: dict[str, list[str]] = {}  # sección -> búsquedas sugeridas por el estructurador
     total_secciones: int = 0
-    archivo_markdown: str = "temp/temp_markdown.md"
+    resultados_prefetch: dict[str, str] = {}  # sección -> resultados de búsqueda ya obtenidos
+    secciones_fallidas: list[str] = []  # secciones en paralelo que fallaron también al reintentarlas
+    run_id: str = Field(default_factory=nuevo_run_id)
+    directorio_trabajo: str = ""  # temp/<run_id>, se crea al iniciar el flujo
+    archivo_markdown: str = ""
     imagen_portada: str = ""
+    vista_previa: str = ""  # output/previews/<run_id>.html, se actualiza con cada sección
     pdf_final: str = ""
+    informe_metricas: str = ""  # output/metrics/<run_id>.json con tiempos, llamadas, tokens y bytes por etapa
 
 
 # ==================== FLOW COMPLETO ====================
@@ -41,79 +73,146 @@ class DocumentoFlowCompleto(Flow[DocumentoState]):
 
     @start()
     def limpiar_y_crear_estructura_documento(self):
-        """Paso 1: Limpiar carpeta temp, generar estructura y extraer lista de secciones."""
+        """Paso 1: Crear espacio de trabajo, generar estructura y extraer lista de secciones."""
         print(f"INICIANDO FLUJO DE DOCUMENTACIÓN COMPLETO")
         print(f"Tema: {self.state.topic}")
-
-        # 1. Limpiar carpeta temp
-        if os.path.exists("temp"):
-            try:
-                shutil.rmtree("temp")
-                print("Carpeta 'temp' eliminada completamente.")
-            except Exception as e:
-                print(f"Error eliminando carpeta 'temp': {e}")
-
-        # 2. Crear carpeta temp vacía
-        os.makedirs("temp", exist_ok=True)
-        print("Carpeta 'temp' creada limpia.")
-
-        # 3. Invocar agente estructurador para obtener la estructura completa
+        # Tiempos, llamadas al LLM, tokens, reintentos y bytes por etapa y sección
+        self._metricas = MetricasEjecucion(self.state.run_id, self.state.topic)
+
+        # 1. Crear espacio de trabajo aislado para esta ejecución (temp/<run_id>)
+        eliminados = limpiar_espacios_abandonados()
+        if eliminados:
+            print(f"Eliminados {eliminados} espacios de trabajo y vistas previas abandonados.")
+        self.state.directorio_trabajo = crear_espacio_trabajo(self.state.run_id)
+        self.state.archivo_markdown = os.path.join(self.state.directorio_trabajo, "temp_markdown.md")
+        print(f"Espacio de trabajo creado: {self.state.directorio_trabajo}")
+        self.state.vista_previa = ruta_vista_previa(self.state.run_id)
+        self._actualizar_vista_previa(self._preambulo_markdown(), "Generando la estructura del documento...")
+
+        # La portada solo depende del tema: empieza a buscarse ya, en paralelo con el resto
+        self._iniciar_busqueda_portada()
+        # Los procesos de renderizado arrancan mientras trabajan los agentes, salvo que el PDF vaya
+        # a maquetarse por secciones: eso ocurre en este proceso y el pool no se usaría
+        if self.state.generar_pdf and not self._usara_compilador_incremental():
+            self._calentar_pool_pdf()
+
+        # max_rpm es el tope de esta ejecución: todos sus LLM lo comparten y además pasan por el
+        # limitador global del proceso (LLM_MAX_RPM), que otras ejecuciones no pueden cambiar
+        self._limitador = LimitadorPeticiones(self.state.max_rpm)
+
+        # 2. Invocar agente estructurador para obtener la estructura completa
         print("\nPASO 1: ESTRUCTURADOR - Generando esquema del documento")
-        agente_estructurador = crear_agente_estructurador(gemini_api_key=self.state.gemini_api_key)
+        agente_estructurador = crear_agente_estructurador(
+            gemini_api_key=self.state.gemini_api_key, limitador=self._limitador
+        )
         tarea_estructurar = crear_tarea_estructurar(self.state.topic, agente_estructurador)
 
         crew_estruct = Crew(
             agents=[agente_estructurador],
             tasks=[tarea_estructurar],
             process=Process.sequential,
-            verbose=True,
-            max_rpm=self.state.max_rpm
+            verbose=True
         )
-        resultado = crew_estruct.kickoff(inputs={"topic": self.state.topic})
-        self.state.estructura_completa = resultado.raw if hasattr(resultado, "raw") else str(resultado)
-
-        # 4. Extraer todas las cabeceras '## ' (nivel 2) excepto 'Referencias'
-        secciones: list[str] = []
-        for line in self.state.estructura_completa.split("\n"):
-            text = line.strip()
-            if text.startswith("## ") and not text.startswith("### "):
-                título = text[3:].strip()
-                título_min = título.lower()
-                if título and not título_min.startswith("referencias"):
-                    # Filtrar numeración del tipo "1. Introducción"
-                    partes = título.split(".", 1)
-                    if partes[0].strip().isdigit() and len(partes) > 1:
-                        título = partes[1].strip()
-                    secciones.append(título)
-        self.state.secciones_lista = secciones
-        self.state.total_secciones = len(secciones)
+        with self._metricas.etapa("estructurador"):
+            resultado = crew_estruct.kickoff(inputs={"topic": self.state.topic})
+            respuesta = resultado.raw if hasattr(resultado, "raw") else str(resultado)
+
+            # 3. Validar el esquema (JSON, o títulos Markdown como reparación local). Si no es
+            # válido, una sola llamada al LLM lo corrige en lugar de repetir toda la tarea
+            try:
+                esquema = obtener_esquema(respuesta, self.state.topic, llm=agente_estructurador.llm)
+            except Exception as e:
+                print(f"Error: el estructurador no produjo un esquema válido: {e}")
+                esquema = None
+
+        if esquema is not None:
+            self.state.estructura_completa = esquema.a_markdown()
+            self.state.secciones_lista = esquema.titulos()
+            self.state.busquedas_secciones = {
+                seccion.titulo: seccion.busquedas for seccion in esquema.secciones if seccion.busquedas
+            }
+        else:
+            self.state.estructura_completa = respuesta
+            self.state.secciones_lista = []
+        self.state.total_secciones = len(self.state.secciones_lista)
 
         print(f"\nEstructura detectada con {self.state.total_secciones} secciones:")
         for i, s in enumerate(self.state.secciones_lista, start=1):
             print(f"   {i}. {s}")
+            self._metricas.titular_seccion(i - 1, s)
 
-        # 5. Inicializar archivo Markdown con el título principal
+        # 4. Inicializar archivo Markdown con el título principal
         try:
             os.makedirs(os.path.dirname(self.state.archivo_markdown), exist_ok=True)
-            with open(self.state.archivo_markdown, "w", encoding="utf-8") as f:
-                f.write(f"# {self.state.topic}\n\n")
+            with open(self.state.archivo_markdown, "w", encoding="utf-8", newline="") as f:
+                f.write(self._preambulo_markdown())
             print(f"Archivo Markdown iniciado en: {self.state.archivo_markdown}")
         except Exception as e:
             print(f"Error escribiendo el archivo Markdown: {e}")
+        self._actualizar_vista_previa(
+            self._preambulo_markdown(), f"0/{self.state.total_secciones} secciones redactadas"
+        )
 
-        # Pasar al procesamiento de todas las secciones
-        return "procesar_seccion"
+        # Pasar a la búsqueda previa de todas las secciones
+        return "prefetch_busquedas"
+
+    def _preambulo_markdown(self) -> str:
+        """Contenido inicial del Markdown, antes de la primera sección."""
+        return f"# {self.state.topic}\n\n"
+
+    def _query_prefetch(self, seccion: str) -> str:
+        """Consulta de búsqueda usada en el prefetch para una sección (la sugerida, si la hay)."""
+        busquedas = self.state.busquedas_secciones.get(seccion)
+        if busquedas:
+            return busquedas[0]
+        return f"{seccion} {self.state.topic}"
 
     @listen(limpiar_y_crear_estructura_documento)
+    def prefetch_busquedas(self, _):
+        """
+        Paso 1b: Con todos los títulos conocidos, buscar todas las secciones en una sola
+        petición en lote a Serper. Los resultados se pasan a cada tarea de investigación
+        y quedan en la caché para las llamadas a buscar_web con la misma consulta.
+        """
+        print(f"\nPREFETCH: Buscando las {self.state.total_secciones} secciones en una sola petición")
+        try:
+            queries = [self._query_prefetch(seccion) for seccion in self.state.secciones_lista]
+            with self._metricas.etapa("prefetch"):
+                resultados = _buscar_web_lote_base(queries)
+            self.state.resultados_prefetch = {
+                seccion: resultados[query]
+                for seccion, query in zip(self.state.secciones_lista, queries)
+                if query in resultados
+            }
+        except Exception as e:
+            print(f"Error en el prefetch de búsquedas: {e}")
+            self.state.resultados_prefetch = {}
+        return "procesar_seccion"
+
+    @listen(prefetch_busquedas)
     def procesar_seccion(self, _):
         """
-        Paso 2: Crear agentes una vez, generar todas las tareas y ejecutarlas en un solo Crew.
+        Paso 2: Investigar y redactar las secciones. Con max_secciones_paralelo=1 se crean los
+        agentes una vez y todas las tareas se ejecutan en un solo Crew secuencial; con más,
+        cada sección va en su propio Crew (_procesar_secciones_en_paralelo).
         """
+        # Cada escritor escribe solo su sección; el Markdown completo se ensambla al compilar
+        self._almacen = AlmacenSecciones(os.path.join(self.state.directorio_trabajo, "secciones"))
+        self._iniciar_compilador_incremental()
+        self._secciones_terminadas: dict[int, str] = {}
+        self._lock_secciones = threading.Lock()
+        if self.state.max_secciones_paralelo > 1 and self.state.total_secciones > 1:
+            return self._procesar_secciones_en_paralelo()
+
         print(f"\nPASO 2: Preparando el Crew para procesar todas las secciones")
 
         # 1. CREAR AGENTES UNA SOLA VEZ (FUERA DEL BUCLE)
-        agente_buscador = crear_agente_buscador_automatico(gemini_api_key=self.state.gemini_api_key)
-        agente_escritor = crear_agente_escritor(gemini_api_key=self.state.gemini_api_key)
+        agente_buscador = crear_agente_buscador_automatico(
+            gemini_api_key=self.state.gemini_api_key, limitador=self._limitador
+        )
+        agente_escritor = crear_agente_escritor(
+            gemini_api_key=self.state.gemini_api_key, limitador=self._limitador
+        )
 
         # 2. GENERAR UNA LISTA CON TODAS LAS TAREAS
         todas_las_tareas = []
@@ -121,76 +220,304 @@ class DocumentoFlowCompleto(Flow[DocumentoState]):
         for idx, seccion in enumerate(self.state.secciones_lista):
             # Tarea de investigación para la sección actual
             tarea_investigacion = crear_tarea_investigacion_automatica(
-                seccion, self.state.topic, agente_buscador
+                seccion, self.state.topic, agente_buscador,
+                self.state.resultados_prefetch.get(seccion, "")
             )
-            # Tarea de redacción, que depende de la investigación anterior
+            # Tarea de redacción, que depende de la investigación anterior y escribe en su sección
             tarea_redaccion = crear_tarea_redaccion_archivo(
-                agente_escritor, seccion, self.state.topic
+                agente_escritor, seccion, self.state.topic,
+                herramienta=crear_herramienta_seccion(self._almacen, idx, seccion),
+                titulos_previos=self._titulos_previos(idx)
             )
+            # Solo la investigación de su sección: el prompt no crece con el número de secciones
             tarea_redaccion.context = [tarea_investigacion]
+            # Al terminar la redacción, la sección ya está en el almacén y se puede maquetar
+            tarea_redaccion.callback = partial(self._seccion_redactada, idx)
 
             todas_las_tareas.extend([tarea_investigacion, tarea_redaccion])
 
         # 3. CREAR Y EJECUTAR UN ÚNICO CREW CON TODAS LAS TAREAS
         print("\nIniciando el Crew principal con todas las tareas generadas...")
+        # Al terminar cada tarea, las métricas pasan a la siguiente (buscador 1, escritor 1, buscador 2...)
+        secuencia = self._metricas.secuencia(
+            [(etapa, idx) for idx in range(self.state.total_secciones) for etapa in ("buscador", "escritor")]
+        )
         crew_completo = Crew(
             agents=[agente_buscador, agente_escritor],
             tasks=todas_las_tareas,
             process=Process.sequential,
             verbose=True,
-            max_rpm=self.state.max_rpm  
+            task_callback=secuencia.siguiente
         )
 
         # Ejecutamos el Crew una sola vez con la lista completa de tareas
-        resultado_final = crew_completo.kickoff()
+        with secuencia:
+            resultado_final = crew_completo.kickoff()
         
         print("\nTodas las secciones han sido procesadas por el Crew.")
         return "todas_secciones_completadas"
 
-    @listen(procesar_seccion)
-    def buscar_imagen_portada(self, _):
-        """Paso 3: Buscar imagen de portada para el documento completo."""
-        print(f"\nPASO 3: BÚSQUEDA DE IMAGEN - Buscando imagen de portada para '{self.state.topic}'")
-        print(f"Secciones procesadas: {self.state.total_secciones}/{self.state.total_secciones}")
+    def _titulos_previos(self, idx: int) -> list[str]:
+        """Títulos de las secciones anteriores a idx, como mucho ventana_titulos_previos."""
+        ventana = max(0, self.state.ventana_titulos_previos)
+        return self.state.secciones_lista[max(0, idx - ventana):idx] if ventana else []
+
+    def _procesar_una_seccion(self, idx: int, seccion: str):
+        """Ejecuta investigación → redacción de una sección en su propio Crew."""
+        # Un reintento empieza de cero en lugar de añadir a lo que dejó el intento anterior
+        self._almacen.borrar(idx)
+
+        agente_buscador = crear_agente_buscador_automatico(
+            gemini_api_key=self.state.gemini_api_key, limitador=self._limitador
+        )
+        agente_escritor = crear_agente_escritor(
+            gemini_api_key=self.state.gemini_api_key, limitador=self._limitador
+        )
+        tarea_investigacion = crear_tarea_investigacion_automatica(
+            seccion, self.state.topic, agente_buscador,
+            self.state.resultados_prefetch.get(seccion, "")
+        )
+        tarea_redaccion = crear_tarea_redaccion_archivo(
+            agente_escritor, seccion, self.state.topic,
+            herramienta=crear_herramienta_seccion(self._almacen, idx, seccion),
+            titulos_previos=self._titulos_previos(idx)
+        )
+        tarea_redaccion.context = [tarea_investigacion]
+
+        secuencia = self._metricas.secuencia([("buscador", idx), ("escritor", idx)])
+        crew_seccion = Crew(
+            agents=[agente_buscador, agente_escritor],
+            tasks=[tarea_investigacion, tarea_redaccion],
+            process=Process.sequential,
+            verbose=True,
+            task_callback=secuencia.siguiente
+        )
+        with secuencia:
+            crew_seccion.kickoff()
+        print(f"Sección {idx + 1}/{self.state.total_secciones} completada: {seccion}")
 
+        self._seccion_terminada(idx, self._almacen.leer(idx))
+
+    def _procesar_con_reintento(self, idx: int, seccion: str):
+        """_procesar_una_seccion con un reintento si falla; el reintento empieza de cero."""
+        try:
+            self._procesar_una_seccion(idx, seccion)
+        except Exception as e:
+            print(f"Error procesando la sección {idx + 1} '{seccion}', se reintenta: {e}")
+            self._procesar_una_seccion(idx, seccion)
+
+    def _procesar_secciones_en_paralelo(self):
+        """
+        Paso 2 (modo concurrente): cada sección (investigación → redacción) es una unidad
+        independiente que escribe en su propia entrada del almacén. Se ejecutan como mucho
+        max_secciones_paralelo a la vez; el orden de secciones_lista se aplica al ensamblar.
+        """
+        workers = min(self.state.max_secciones_paralelo, self.state.total_secciones)
+        # Todos los Crews de la ejecución comparten self._limitador, así que max_rpm se respeta
+        print(f"\nPASO 2: Procesando {self.state.total_secciones} secciones con {workers} en paralelo "
+              f"(máximo {self.state.max_rpm} rpm en total)")
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="seccion") as executor:
+            futuros = [
+                executor.submit(self._procesar_con_reintento, idx, seccion)
+                for idx, seccion in enumerate(self.state.secciones_lista)
+            ]
+            for idx, futuro in enumerate(futuros):
+                try:
+                    futuro.result()
+                except Exception as e:
+                    seccion = self.state.secciones_lista[idx]
+                    print(f"Error procesando la sección {idx + 1} '{seccion}' tras reintentarla: {e}")
+                    self.state.secciones_fallidas.append(seccion)
+                    # Lo que llegara a escribir se ensamblará igualmente
+                    self._seccion_terminada(idx, self._almacen.leer(idx))
+
+        if self.state.secciones_fallidas:
+            print(f"\nSecciones incompletas tras el reintento: {', '.join(self.state.secciones_fallidas)}")
+        print("\nTodas las secciones han sido procesadas en paralelo.")
+        return "todas_secciones_completadas"
+
+    # ---------- Renderizado incremental del PDF ----------
+
+    def _usara_compilador_incremental(self) -> bool:
+        """True si el PDF se maquetará por secciones. El borrador ya es rápido: se genera al final."""
+        return self.state.generar_pdf and self.state.pdf_incremental and self.state.backend_pdf == "alta_calidad"
+
+    def _calentar_pool_pdf(self):
         try:
-            imagen_path = _buscar_imagen_base(self.state.topic)
-            if imagen_path and "descargada:" in imagen_path:
-                filename = imagen_path.split(":", 1)[-1].strip()
+            obtener_servicio_pdf().calentar()
+        except Exception as e:
+            print(f"No se pudo arrancar el pool de PDF: {e}")
+
+    def _iniciar_compilador_incremental(self):
+        """Prepara el maquetado por secciones (si está activado y WeasyPrint está disponible)."""
+        self._compilador = None
+        if not self._usara_compilador_incremental():
+            return
+        try:
+            if not self.state.total_secciones:
+                raise ValueError("el esquema no tiene secciones")
+            self._compilador = CompiladorIncremental(
+                self._preambulo_markdown(), self.state.total_secciones, preset=self.state.preset_pdf
+            )
+        except Exception as e:
+            print(f"Renderizado incremental no disponible, se maquetará al final: {e}")
+            # El PDF completo se generará en el pool, que no se calentó al empezar
+            self._calentar_pool_pdf()
+
+    def _enviar_a_compilador(self, idx: int, contenido: str):
+        compilador = getattr(self, "_compilador", None)
+        if compilador is not None:
+            compilador.enviar_seccion(idx, contenido)
+
+    def _seccion_redactada(self, idx: int, _salida=None):
+        """Callback de la tarea de redacción (modo secuencial): envía la sección recién escrita."""
+        try:
+            contenido = self._almacen.leer(idx)
+        except OSError as e:
+            print(f"No se pudo leer la sección {idx + 1}: {e}")
+            return
+        self._seccion_terminada(idx, contenido)
+
+    def _seccion_terminada(self, idx: int, contenido: str):
+        """Una sección tiene su Markdown definitivo: se maqueta y se actualiza la vista previa."""
+        self._enviar_a_compilador(idx, contenido)
+        with self._lock_secciones:
+            self._secciones_terminadas[idx] = contenido
+            # En paralelo pueden terminar desordenadas: se muestran en el orden del documento
+            markdown_actual = self._preambulo_markdown() + "".join(
+                self._secciones_terminadas[i] for i in sorted(self._secciones_terminadas)
+            )
+            self._actualizar_vista_previa(
+                markdown_actual,
+                f"{len(self._secciones_terminadas)}/{self.state.total_secciones} secciones redactadas",
+            )
+
+    # ---------- Vista previa HTML ----------
+
+    def _actualizar_vista_previa(self, markdown_content: str, estado: str = ""):
+        """Reescribe la vista previa; un fallo aquí no debe interrumpir el flujo."""
+        if not self.state.vista_previa:
+            return
+        try:
+            escribir_vista_previa(markdown_content, self.state.vista_previa, estado)
+        except Exception as e:
+            print(f"No se pudo actualizar la vista previa: {e}")
+
+    def _buscar_imagen_portada(self) -> str:
+        """Búsqueda de imagen de portada (se ejecuta en segundo plano desde el inicio del flujo)."""
+        print(f"\nBÚSQUEDA DE IMAGEN (segundo plano) - Buscando imagen de portada para '{self.state.topic}'")
+
+        try:
+            with self._metricas.etapa("portada"):
+                imagen_path = _buscar_imagen_base(self.state.topic, self.state.directorio_trabajo)
+            if imagen_path and "descargada" in imagen_path:
+                filename = imagen_path.split(" en ", 1)[-1].strip()
                 if os.path.exists(filename):
-                    self.state.imagen_portada = filename
                     print(f"Imagen de portada descargada: {filename}")
-                else:
-                    print(f"No se encontró la imagen descargada: {filename}")
-                    self.state.imagen_portada = ""
+                    return filename
+                print(f"No se encontró la imagen descargada: {filename}")
             else:
                 print(f"No fue posible descargar imagen para: {self.state.topic}")
-                self.state.imagen_portada = ""
         except Exception as e:
             print(f"Error buscando imagen de portada: {e}")
-            self.state.imagen_portada = ""
-
-        return "imagen_buscada"
+        return ""
+
+    def _iniciar_busqueda_portada(self):
+        """Lanza la búsqueda de portada en paralelo: solo depende del tema."""
+        self._ejecutor_portada = ThreadPoolExecutor(max_workers=1, thread_name_prefix="portada")
+        self._futuro_portada = self._ejecutor_portada.submit(self._buscar_imagen_portada)
+
+    def _esperar_imagen_portada(self) -> str:
+        """Espera a que termine la búsqueda de portada lanzada al inicio y devuelve la ruta."""
+        futuro = getattr(self, "_futuro_portada", None)
+        if futuro is None:
+            return ""
+        try:
+            return futuro.result()
+        except Exception as e:
+            print(f"Error esperando la imagen de portada: {e}")
+            return ""
+        finally:
+            self._ejecutor_portada.shutdown(wait=False)
 
-    @listen(buscar_imagen_portada)
+    @listen(procesar_seccion)
     def compilar_documento_final(self, _):
-        """Paso 4: Compilar el Markdown completo en un PDF, incluyendo la portada."""
-        print(f"\nPASO 4: COMPILACIÓN FINAL - Generando PDF")
+        """Paso 3: Compilar el Markdown completo en un PDF, incluyendo la portada."""
+        with self._metricas.etapa("compilacion"):
+            return self._compilar_documento_final()
+
+    def _compilar_documento_final(self) -> str:
+        """Espera la portada, ensambla las secciones y genera (o recupera de la caché) el PDF."""
+        print(f"\nPASO 3: COMPILACIÓN FINAL - Generando PDF")
+
+        # La portada se buscó en paralelo con la estructura y las secciones
+        self.state.imagen_portada = self._esperar_imagen_portada()
+
+        # Ensamblar el Markdown completo en el orden de secciones_lista
+        almacen = getattr(self, "_almacen", None)
+        if almacen is not None:
+            try:
+                for seccion in almacen.ensamblar(
+                    self.state.archivo_markdown, self._preambulo_markdown(), self.state.secciones_lista
+                ):
+                    print(f"La sección '{seccion}' no produjo contenido.")
+            except Exception as e:
+                print(f"Error ensamblando las secciones: {e}")
 
         if not os.path.exists(self.state.archivo_markdown):
             print(f"Error: El archivo Markdown no existe: {self.state.archivo_markdown}")
+            if getattr(self, "_compilador", None) is not None:
+                self._compilador.cancelar()
             return "error_compilacion"
 
         try:
             with open(self.state.archivo_markdown, "r", encoding="utf-8") as f:
                 contenido_markdown = f.read()
+            self._actualizar_vista_previa(contenido_markdown)
+
+            if not self.state.generar_pdf:
+                print(f"PDF no solicitado; el documento está en la vista previa: {self.state.vista_previa}")
+                return "documento_completado"
+
+            ruta_pdf = os.path.join(self.state.directorio_trabajo, "final_documento.pdf")
+            compilador = getattr(self, "_compilador", None)
 
-            print("Generando PDF a partir del Markdown...")
-            pdf_path = _generar_pdf_base(
-                contenido_markdown,
-                self.state.imagen_portada,
-                "temp/final_documento.pdf"
+            # Un documento idéntico (mismo Markdown, portada, estilos, opciones y maquetación) ya
+            # generado. Si la unión incremental se descarta, el PDF completo consulta su propia clave
+            clave = clave_pdf(
+                contenido_markdown, self.state.imagen_portada, self.state.directorio_trabajo,
+                self.state.backend_pdf, self.state.preset_pdf, incremental=compilador is not None
             )
+            pdf_path = pdf_desde_cache(clave, ruta_pdf)
+            if pdf_path and compilador is not None:
+                compilador.cancelar()
+
+            if not pdf_path and compilador is not None:
+                # Las secciones ya están maquetadas: solo falta la portada y unir las páginas
+                print("Uniendo las secciones ya maquetadas...")
+                inicio = time.perf_counter()
+                pdf_path = compilador.finalizar(
+                    contenido_markdown, self.state.imagen_portada, ruta_pdf, self.state.directorio_trabajo
+                )
+                if pdf_path:
+                    guardar_pdf_en_cache(
+                        clave, pdf_path, compilador.segundos_renderizando + time.perf_counter() - inicio
+                    )
+                else:
+                    print("Renderizado incremental descartado, se genera el PDF completo.")
+
+            if not pdf_path:
+                print("Generando PDF a partir del Markdown...")
+                pdf_path = obtener_servicio_pdf().generar_pdf(
+                    contenido_markdown,
+                    self.state.imagen_portada,
+                    ruta_pdf,
+                    self.state.directorio_trabajo,
+                    backend=self.state.backend_pdf,
+                    preset=self.state.preset_pdf,
+                    consultar_cache=compilador is not None
+                )
 
             if pdf_path and os.path.exists(pdf_path):
                 self.state.pdf_final = pdf_path
@@ -207,12 +534,13 @@ class DocumentoFlowCompleto(Flow[DocumentoState]):
 
     @listen(compilar_documento_final)
     def mover_pdf_y_mostrar_estadisticas_finales(self, _):
-        """Paso 5: Mover el PDF a 'output/' y mostrar estadísticas del flujo."""
-        print(f"\nPASO 5: ORGANIZACIÓN FINAL - Moviendo PDF a carpeta 'output'")
+        """Paso 4: Mover el PDF a 'output/' y mostrar estadísticas del flujo."""
+        print(f"\nPASO 4: ORGANIZACIÓN FINAL - Moviendo PDF a carpeta 'output'")
 
         os.makedirs("output", exist_ok=True)
         topic_clean = self.state.topic.replace(" ", "_").replace("/", "_").replace("\\", "_")
-        destino = f"output/{topic_clean}.pdf"
+        # Con run_id: dos ejecuciones del mismo tema no se pisan el PDF
+        destino = f"output/{topic_clean}_{self.state.run_id}.pdf"
 
         if self.state.pdf_final and os.path.exists(self.state.pdf_final):
             try:
@@ -228,20 +556,78 @@ class DocumentoFlowCompleto(Flow[DocumentoState]):
         print(f"Tema del documento: {self.state.topic}")
         print(f"Total de secciones procesadas: {self.state.total_secciones}")
 
-        if os.path.exists(self.state.archivo_markdown):
-            with open(self.state.archivo_markdown, "r", encoding="utf-8") as f:
-                contenido = f.read()
-            palabras = len(contenido.split())
-            lineas = len(contenido.split("\n"))
+        if getattr(self, "_almacen", None) is not None:
+            # Contadores que mantiene el almacén con cada sección escrita (sin releer el documento)
+            stats_documento = self._almacen.estadisticas()
             print("Estadísticas del documento:")
-            print(f"   • Palabras: {palabras}")
-            print(f"   • Líneas: {lineas}")
+            print(f"   • Palabras: {stats_documento['palabras']}")
+            print(f"   • Líneas: {stats_documento['lineas']}")
+            print(f"   • Secciones: {stats_documento['secciones']}")
 
         if self.state.pdf_final and os.path.exists(self.state.pdf_final):
             size_bytes = os.path.getsize(self.state.pdf_final)
             size_mb = size_bytes / (1024 * 1024)
             print(f"PDF final: {self.state.pdf_final}")
-            print(f"   • Tamaño: {size_bytes} bytes ({size_mb:.2f} MB)")
+            print(f"   • Tamaño: {size_bytes} bytes ({size_mb:.2f} MB), preset '{self.state.preset_pdf}'")
+            try:
+                for linea in formatear_desglose(desglose_pdf(self.state.pdf_final)):
+                    print(f"   • {linea}")
+            except Exception as e:
+                print(f"   • No se pudo analizar el tamaño del PDF: {e}")
+
+        if not cache_desactivada():
+            try:
+                stats_cache = obtener_cache_busquedas().estadisticas()
+                print("Caché de búsquedas:")
+                print(f"   • Aciertos: {stats_cache['aciertos']} | Fallos: {stats_cache['fallos']} "
+                      f"(tasa {stats_cache['tasa_aciertos']:.0%}, {stats_cache['entradas']} entradas)")
+            except Exception as e:
+                print(f"No se pudieron leer las estadísticas de la caché de búsquedas: {e}")
+
+        if not cache_pdf_desactivada():
+            try:
+                stats_pdf = obtener_cache_pdf().estadisticas()
+                print(f"Caché de PDFs: {stats_pdf['aciertos']} aciertos, {stats_pdf['fallos']} fallos "
+                      f"(tasa {stats_pdf['tasa_aciertos']:.0%}, {stats_pdf['segundos_ahorrados']:.1f}s ahorrados, "
+                      f"{stats_pdf['entradas']} PDFs)")
+            except Exception as e:
+                print(f"No se pudieron leer las estadísticas de la caché de PDFs: {e}")
+
+        try:
+            from utils.llm_cache import obtener_cache_llm, modo_cache_llm, MODO_DESACTIVADO
+            if modo_cache_llm() != MODO_DESACTIVADO:
+                stats_llm = obtener_cache_llm().estadisticas()
+                print(f"Caché del LLM ({modo_cache_llm()}): {stats_llm['aciertos']} aciertos, "
+                      f"{stats_llm['fallos']} fallos, {stats_llm['entradas']} entradas")
+        except Exception as e:
+            print(f"No se pudieron leer las estadísticas de la caché del LLM: {e}")
+
+        try:
+            from utils.http_client import obtener_cliente_http
+            for host, stats_http in obtener_cliente_http().metricas().items():
+                print(f"HTTP {host}: {stats_http['peticiones']} peticiones, "
+                      f"p50 {stats_http['p50_ms']} ms, p95 {stats_http['p95_ms']} ms, "
+                      f"{stats_http['reintentos']} reintentos")
+        except Exception as e:
+            print(f"No se pudieron leer las métricas HTTP: {e}")
+
+        try:
+            rutas_metricas = self._metricas.guardar()
+            self.state.informe_metricas = rutas_metricas["json"]
+            informe = self._metricas.informe()
+            print("Métricas por etapa:")
+            for linea in formatear_informe(informe):
+                print(f"   • {linea}")
+            print("Tamaño de los prompts por sección:")
+            for linea in formatear_prompts(informe):
+                print(f"   • {linea}")
+            print(f"   • Informe: {rutas_metricas['json']} | Prometheus: {rutas_metricas['prometheus']}")
+        except Exception as e:
+            print(f"No se pudieron guardar las métricas de la ejecución: {e}")
+
+        # Liberar el espacio de trabajo de esta ejecución
+        if liberar_espacio_trabajo(self.state.directorio_trabajo):
+            print(f"Espacio de trabajo eliminado: {self.state.directorio_trabajo}")
 
         print("=" * 60)
         return None  # Final del flujo
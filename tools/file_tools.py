@@ -2,10 +2,407 @@
 # -*- coding: utf-8 -*-
 
 import os
-import codecs
+import json
+import time
+import shutil
+import threading
 from pathlib import Path
+from contextlib import contextmanager
 from crewai.tools import tool
 
+from utils.fix_encoding import reparar_texto
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# ==================== CONTADORES ====================
+
+def _contar_fragmento(texto: str, termina_en_espacio: bool = True, termina_en_salto: bool = True) -> dict:
+    """
+    Lo que aporta texto al añadirse al final de un documento que terminaba (o no) en espacio y
+    en salto de línea: palabras, líneas, secciones ('## ') y cómo termina ahora el documento.
+    """
+    if not texto:
+        return {"palabras": 0, "lineas": 0, "secciones": 0,
+                "termina_en_espacio": termina_en_espacio, "termina_en_salto": termina_en_salto}
+    palabras = len(texto.split())
+    # Si el documento no acababa en espacio, la primera palabra continúa la última
+    if palabras and not termina_en_espacio and not texto[0].isspace():
+        palabras -= 1
+    lineas = len(texto.splitlines())
+    # Si no acababa en salto de línea, la primera línea continúa la última
+    if lineas and not termina_en_salto:
+        lineas -= 1
+    return {
+        "palabras": palabras,
+        "lineas": lineas,
+        "secciones": sum(1 for linea in texto.split("\n") if linea.startswith("## ")),
+        "termina_en_espacio": texto[-1].isspace(),
+        "termina_en_salto": texto[-1] in "\r\n",
+    }
+
+
+# ==================== DOCUMENTO MARKDOWN ====================
+
+class DocumentoMarkdown:
+    """
+    Fichero Markdown al que solo se añade contenido, con un único descriptor abierto y
+    contadores de palabras, líneas y secciones ('## ') que se actualizan con cada fragmento.
+    Así añadir una sección no obliga a releer el documento entero para dar estadísticas.
+
+    Los contadores se guardan en un índice junto al fichero (<fichero>.indice.json) con el
+    tamaño en bytes al que corresponden; si el fichero cambia por fuera (p. ej. el flujo
+    escribe el título), se recuentan una vez leyéndolo entero.
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = str(file_path)
+        self.ruta_indice = f"{self.file_path}.indice.json"
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.file_path) or ".", exist_ok=True)
+        # Binario: se escriben bytes UTF-8 tal cual (sin traducir saltos de línea) y se sabe el tamaño exacto
+        self._fichero = open(self.file_path, "ab")
+        self._cargar_indice()
+
+    # ---------- Contadores ----------
+
+    def _cargar_indice(self):
+        tamano = os.fstat(self._fichero.fileno()).st_size
+        try:
+            with open(self.ruta_indice, "r", encoding="utf-8") as f:
+                indice = json.load(f)
+            if indice.get("bytes") == tamano:
+                self.bytes = tamano
+                self.palabras = indice["palabras"]
+                self.lineas = indice["lineas"]
+                self.secciones = indice["secciones"]
+                self._termina_en_espacio = indice["termina_en_espacio"]
+                self._termina_en_salto = indice["termina_en_salto"]
+                return
+        except (OSError, ValueError, KeyError):
+            pass
+        self._recontar()
+
+    def _recontar(self):
+        """Recalcula los contadores leyendo el fichero completo (solo si cambió por fuera)."""
+        self.bytes = self.palabras = self.lineas = self.secciones = 0
+        self._termina_en_espacio = self._termina_en_salto = True
+        with open(self.file_path, "rb") as f:
+            texto = f.read().decode("utf-8", errors="replace")
+        self._contar(texto)
+        self.bytes = os.fstat(self._fichero.fileno()).st_size
+
+    def _contar(self, texto: str):
+        """Suma a los contadores lo que aporta texto al añadirse al final del documento."""
+        aporte = _contar_fragmento(texto, self._termina_en_espacio, self._termina_en_salto)
+        self.palabras += aporte["palabras"]
+        self.lineas += aporte["lineas"]
+        self.secciones += aporte["secciones"]
+        self._termina_en_espacio = aporte["termina_en_espacio"]
+        self._termina_en_salto = aporte["termina_en_salto"]
+
+    def _guardar_indice(self):
+        temporal = f"{self.ruta_indice}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump({
+                "bytes": self.bytes,
+                "palabras": self.palabras,
+                "lineas": self.lineas,
+                "secciones": self.secciones,
+                "termina_en_espacio": self._termina_en_espacio,
+                "termina_en_salto": self._termina_en_salto,
+            }, f)
+        os.replace(temporal, self.ruta_indice)
+
+    # ---------- API ----------
+
+    def anadir(self, contenido: str, salto_final: bool = True) -> dict:
+        """
+        Añade contenido al final (más un salto de línea), con el mojibake ya corregido, y
+        devuelve las estadísticas del fragmento.
+        """
+        texto = reparar_texto(str(contenido)) + ("\n" if salto_final else "")
+        datos = texto.encode("utf-8")
+        with self._lock:
+            if os.fstat(self._fichero.fileno()).st_size != self.bytes:
+                self._recontar()
+            self._fichero.write(datos)
+            # Volcar ya: el flujo y el maquetado incremental leen el fichero tras cada sección
+            self._fichero.flush()
+            self.bytes += len(datos)
+            self._contar(texto)
+            self._guardar_indice()
+        return {
+            "palabras": len(str(contenido).split()),
+            "lineas": len(str(contenido).splitlines()),
+        }
+
+    def estadisticas(self) -> dict:
+        """Totales del documento: palabras, líneas, secciones y bytes."""
+        with self._lock:
+            if os.fstat(self._fichero.fileno()).st_size != self.bytes:
+                self._recontar()
+            return {
+                "palabras": self.palabras,
+                "lineas": self.lineas,
+                "secciones": self.secciones,
+                "bytes": self.bytes,
+            }
+
+    def cerrar(self):
+        with self._lock:
+            if not self._fichero.closed:
+                self._fichero.close()
+
+
+# ==================== REGISTRO DE DOCUMENTOS ABIERTOS ====================
+
+_documentos: dict[str, DocumentoMarkdown] = {}
+_lock_documentos = threading.Lock()
+
+
+def obtener_documento(file_path: str) -> DocumentoMarkdown:
+    """Devuelve el DocumentoMarkdown del fichero (el mismo descriptor para todas las llamadas)."""
+    clave = os.path.abspath(file_path)
+    with _lock_documentos:
+        documento = _documentos.get(clave)
+        if documento is None or documento._fichero.closed:
+            documento = _documentos[clave] = DocumentoMarkdown(clave)
+        return documento
+
+
+def cerrar_documentos(ruta: str = None):
+    """Cierra los documentos abiertos: el fichero ruta, los que haya dentro del directorio ruta o todos."""
+    ruta = os.path.abspath(ruta) if ruta else ""
+    with _lock_documentos:
+        for clave in [c for c in _documentos if not ruta or c == ruta or c.startswith(os.path.join(ruta, ""))]:
+            _documentos.pop(clave).cerrar()
+
+
+# ==================== ALMACÉN DE SECCIONES ====================
+
+@contextmanager
+def _bloqueo_fichero(ruta_bloqueo: str):
+    """Bloqueo exclusivo entre procesos sobre un fichero .lock."""
+    with open(ruta_bloqueo, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _escribir_atomico(ruta: str, texto: str):
+    temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporal, "w", encoding="utf-8", newline="") as f:
+        f.write(texto)
+    os.replace(temporal, ruta)
+
+
+class AlmacenSecciones:
+    """
+    Secciones del documento guardadas por separado, cada una identificada por su índice y su
+    título: <idx>.md con el Markdown y <idx>.json con el título y sus estadísticas.
+
+    Todo se hace bajo un bloqueo por sección (entre hilos y entre procesos), así que varias
+    secciones se pueden redactar a la vez. escribir() reemplaza el fichero de la sección de
+    forma atómica (reintentar una sección la sobrescribe en lugar de duplicarla); anadir()
+    escribe solo el fragmento nuevo al final y actualiza los contadores del .json, que guarda
+    el tamaño al que corresponden: si no cuadra (p. ej. se cortó una escritura), la sección se
+    recuenta una vez. El documento completo se ensambla una sola vez, en el orden de
+    secciones_lista, con ensamblar().
+    """
+
+    def __init__(self, directorio: str):
+        self.directorio = directorio
+        os.makedirs(directorio, exist_ok=True)
+        self._lock = threading.Lock()
+        self._locks_seccion: dict[int, threading.Lock] = {}
+        # Metadatos en memoria: los totales no obligan a leer todas las secciones
+        self._metadatos: dict[int, dict] = {}
+        for nombre in os.listdir(directorio):
+            if nombre.endswith(".json"):
+                try:
+                    with open(os.path.join(directorio, nombre), "r", encoding="utf-8") as f:
+                        metadatos = json.load(f)
+                    self._metadatos[metadatos["idx"]] = metadatos
+                except (OSError, ValueError, KeyError):
+                    pass
+
+    def ruta_seccion(self, idx: int) -> str:
+        return os.path.join(self.directorio, f"{idx:03d}.md")
+
+    def _ruta_metadatos(self, idx: int) -> str:
+        return os.path.join(self.directorio, f"{idx:03d}.json")
+
+    @contextmanager
+    def _bloquear(self, idx: int):
+        with self._lock:
+            lock = self._locks_seccion.setdefault(idx, threading.Lock())
+        with lock, _bloqueo_fichero(os.path.join(self.directorio, f"{idx:03d}.lock")):
+            yield
+
+    def _metadatos_de(self, idx: int, titulo: str, contenido: str) -> dict:
+        aporte = _contar_fragmento(contenido)
+        return {
+            "idx": idx,
+            "titulo": titulo,
+            "palabras": aporte["palabras"],
+            "lineas": aporte["lineas"],
+            "bytes": len(contenido.encode("utf-8")),
+            "termina_en_espacio": aporte["termina_en_espacio"],
+            "termina_en_salto": aporte["termina_en_salto"],
+            "actualizado": time.time(),
+        }
+
+    def _guardar_metadatos(self, metadatos: dict) -> dict:
+        _escribir_atomico(self._ruta_metadatos(metadatos["idx"]), json.dumps(metadatos, ensure_ascii=False))
+        with self._lock:
+            self._metadatos[metadatos["idx"]] = metadatos
+        return metadatos
+
+    def _escribir(self, idx: int, titulo: str, contenido: str) -> dict:
+        _escribir_atomico(self.ruta_seccion(idx), contenido)
+        return self._guardar_metadatos(self._metadatos_de(idx, titulo, contenido))
+
+    def _metadatos_vigentes(self, idx: int, titulo: str) -> dict:
+        """
+        Metadatos en disco de la sección si corresponden a su tamaño actual (otro proceso pudo
+        añadir contenido); si no, se recuentan leyendo la sección una vez.
+        """
+        try:
+            tamano = os.path.getsize(self.ruta_seccion(idx))
+        except FileNotFoundError:
+            return self._metadatos_de(idx, titulo, "")
+        try:
+            with open(self._ruta_metadatos(idx), "r", encoding="utf-8") as f:
+                metadatos = json.load(f)
+            if metadatos.get("bytes") == tamano and "termina_en_salto" in metadatos:
+                return metadatos
+        except (OSError, ValueError):
+            pass
+        return self._metadatos_de(idx, titulo, self._leer(idx))
+
+    def _leer(self, idx: int) -> str:
+        try:
+            with open(self.ruta_seccion(idx), "r", encoding="utf-8", newline="") as f:
+                return f.read()
+        except FileNotFoundError:
+            return ""
+
+    # ---------- API ----------
+
+    # El mojibake se corrige al entrar el contenido, no releyendo el documento al final
+
+    def escribir(self, idx: int, titulo: str, contenido: str) -> dict:
+        """Sustituye el contenido de la sección. Devuelve sus metadatos."""
+        with self._bloquear(idx):
+            return self._escribir(idx, titulo, reparar_texto(str(contenido)))
+
+    def anadir(self, idx: int, titulo: str, contenido: str) -> dict:
+        """
+        Añade contenido (más un salto de línea) al final de la sección, como append_to_markdown.
+        Solo se escribe el fragmento nuevo: el coste no depende de lo que ya tenga la sección.
+        """
+        texto = reparar_texto(str(contenido)) + "\n"
+        datos = texto.encode("utf-8")
+        with self._bloquear(idx):
+            metadatos = self._metadatos_vigentes(idx, titulo)
+            with open(self.ruta_seccion(idx), "ab") as f:
+                f.write(datos)
+            aporte = _contar_fragmento(texto, metadatos["termina_en_espacio"], metadatos["termina_en_salto"])
+            return self._guardar_metadatos({
+                **metadatos,
+                "titulo": titulo,
+                "palabras": metadatos["palabras"] + aporte["palabras"],
+                "lineas": metadatos["lineas"] + aporte["lineas"],
+                "bytes": metadatos["bytes"] + len(datos),
+                "termina_en_espacio": aporte["termina_en_espacio"],
+                "termina_en_salto": aporte["termina_en_salto"],
+                "actualizado": time.time(),
+            })
+
+    def leer(self, idx: int) -> str:
+        """Markdown de la sección ("" si aún no se ha escrito)."""
+        with self._bloquear(idx):
+            return self._leer(idx)
+
+    def titulo(self, idx: int) -> str:
+        with self._lock:
+            return self._metadatos.get(idx, {}).get("titulo", "")
+
+    def borrar(self, idx: int):
+        """Elimina la sección (antes de reintentarla desde cero)."""
+        with self._bloquear(idx):
+            for ruta in (self.ruta_seccion(idx), self._ruta_metadatos(idx)):
+                if os.path.exists(ruta):
+                    os.remove(ruta)
+            with self._lock:
+                self._metadatos.pop(idx, None)
+
+    def estadisticas(self) -> dict:
+        """Totales de las secciones escritas: secciones, palabras, líneas y bytes."""
+        with self._lock:
+            metadatos = list(self._metadatos.values())
+        return {
+            "secciones": len(metadatos),
+            "palabras": sum(m["palabras"] for m in metadatos),
+            "lineas": sum(m["lineas"] for m in metadatos),
+            "bytes": sum(m["bytes"] for m in metadatos),
+        }
+
+    def ensamblar(self, archivo_markdown: str, preambulo: str, titulos: list[str]) -> list[str]:
+        """
+        Escribe archivo_markdown con el preámbulo y las secciones en el orden de titulos (la
+        sección idx debe tener el título titulos[idx]). El fichero se reemplaza de forma atómica.
+        Devuelve los títulos de las secciones que faltan.
+        """
+        faltan = []
+        temporal = f"{archivo_markdown}.{os.getpid()}.tmp"
+        with open(temporal, "w", encoding="utf-8", newline="") as destino:
+            destino.write(preambulo)
+            for idx, titulo in enumerate(titulos):
+                with self._bloquear(idx):
+                    if self.titulo(idx) != titulo or not os.path.exists(self.ruta_seccion(idx)):
+                        faltan.append(titulo)
+                        continue
+                    with open(self.ruta_seccion(idx), "r", encoding="utf-8", newline="") as origen:
+                        shutil.copyfileobj(origen, destino)
+        # Si había un DocumentoMarkdown abierto sobre el fichero, su descriptor quedaría obsoleto
+        cerrar_documentos(archivo_markdown)
+        os.replace(temporal, archivo_markdown)
+        return faltan
+
+
+# ==================== FUNCIÓN BASE (para testing) ====================
+
+def _append_markdown_base(content: str, file_path: str = os.path.join("temp", "temp_markdown.md")) -> str:
+    """Función base para añadir contenido a un fichero markdown (sin decorador @tool)"""
+    # Convertimos exactamente lo que venga a string y lo escribimos al final sin filtrar nada
+    documento = obtener_documento(Path(file_path))
+    nuevas = documento.anadir(str(content))
+    return _mensaje_append(nuevas, documento.estadisticas())
+
+
+def _mensaje_append(nuevas: dict, totales: dict) -> str:
+    return (
+        f"✅ Contenido añadido: {nuevas['palabras']} palabras, {nuevas['lineas']} líneas. "
+        f"Total ahora: {totales['palabras']} palabras, {totales['lineas']} líneas."
+    )
+
+# ==================== HERRAMIENTA PARA AGENTES ====================
+
 @tool("append_to_markdown")
 def append_to_markdown(content: str) -> str:
     """
@@ -20,28 +417,27 @@ def append_to_markdown(content: str) -> str:
     Returns:
         str: Mensaje de confirmación con estadísticas básicas.
     """
-    # Convertimos exactamente lo que venga a string
-    full_content = str(content)
+    return _append_markdown_base(content)
 
-    # Ruta al archivo temp/temp_markdown.md
-    file_path = Path("temp") / "temp_markdown.md"
-    os.makedirs(file_path.parent, exist_ok=True)
 
-    # Escribir el contenido al final del fichero sin filtrar nada
-    with codecs.open(file_path, "a", "utf-8") as f:
-        f.write(full_content)
-        f.write("\n")
+def crear_herramienta_seccion(almacen: AlmacenSecciones, idx: int, titulo: str):
+    """
+    Crea una herramienta append_to_markdown que escribe en la sección idx del almacén.
+    Se asigna a la tarea de redacción de esa sección, así cada escritor solo toca su sección.
+    """
+    @tool("append_to_markdown")
+    def append_to_markdown_seccion(content: str) -> str:
+        """
+        Herramienta para añadir STRINGS EN MARKDOWN (sin filtrar ni parsear) al final del documento.
 
-    # Leer todo el fichero para estadísticas
-    with codecs.open(file_path, "r", "utf-8") as f:
-        texto_completo = f.read()
+        Args:
+            content: Cualquier dato que se reciba. Ha de ser STRING.
 
-    palabras_nuevas = len(full_content.split())
-    lineas_nuevas = len(full_content.splitlines())
-    total_palabras = len(texto_completo.split())
-    total_lineas = len(texto_completo.splitlines())
+        Returns:
+            str: Mensaje de confirmación con estadísticas básicas.
+        """
+        nuevas = {"palabras": len(str(content).split()), "lineas": len(str(content).splitlines())}
+        almacen.anadir(idx, titulo, content)
+        return _mensaje_append(nuevas, almacen.estadisticas())
 
-    return (
-        f"✅ Contenido añadido: {palabras_nuevas} palabras, {lineas_nuevas} líneas. "
-        f"Total ahora: {total_palabras} palabras, {total_lineas} líneas."
-    )
\ No newline at end of file
+    return append_to_markdown_seccion
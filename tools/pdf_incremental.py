@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# proyecto_crewai/tools/pdf_incremental.py
+
+"""
+Renderizado incremental del PDF, sección a sección.
+
+Cada sección se maqueta en su propio fragmento (un Document de WeasyPrint) en cuanto su
+markdown está terminado, en un hilo aparte que se solapa con las llamadas al LLM. Los
+fragmentos se maquetan en orden: así se sabe en qué página empieza cada uno y se fija con
+`@page :first { counter-reset: page N }`, de modo que la numeración es continua. En el paso
+final solo queda maquetar la portada y unir las páginas de todos los fragmentos.
+
+Cada fragmento empieza en una página nueva, igual que cada sección '## ' en el renderizado
+completo (ver ESTILOS_PDF), así que ambos dan las mismas páginas y la misma numeración
+(benchmarks/bench_pdf.py lo comprueba). Si al final el markdown no coincide con lo
+maquetado (o la portada no ocupa una página), finalizar() devuelve "" y el flujo vuelve al
+renderizado completo con _generar_pdf_base.
+"""
+
+import os
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.pdf_render import (
+    obtener_renderizador, _resolver_imagen_portada, _preparar_imagen_portada, _html_portada,
+    _base_url_imagen, _html_documento, _normpath, _preparar_directorio_salida, _verificar_pdf,
+    necesita_documento_completo,
+)
+
+# La portada lleva page-break-after y ocupa siempre una página
+PAGINAS_PORTADA = 1
+
+
+class CompiladorIncremental:
+    """Maqueta las secciones según van terminando y las une con la portada al final."""
+
+    def __init__(self, preambulo: str, total_secciones: int, renderizador=None, preset: str = None):
+        """
+        preambulo: markdown que precede a la primera sección (el título '# ...'); se maqueta
+        junto con ella, igual que en el renderizado completo.
+        preset: opciones de tools/pdf_optimizacion.py. Las de imagen se aplican al maquetar
+        cada fragmento, por eso se fijan aquí y no al unir.
+        """
+        self.preambulo = preambulo
+        self.total_secciones = total_secciones
+        self.preset = preset
+        self._renderizador = renderizador or obtener_renderizador()
+        self._lock = threading.Lock()
+        self._pendientes: dict[int, str] = {}
+        self._siguiente = 0
+        self._pagina_siguiente = PAGINAS_PORTADA + 1
+        self._markdown_maquetado: list[str] = []
+        # Documents de WeasyPrint ya maquetados: los de las secciones, en orden, y la portada
+        self.fragmentos: list = []
+        self.portada = None
+        self._error = None
+        self.segundos_renderizando = 0.0
+        # Un único hilo: los fragmentos se maquetan en orden y WeasyPrint ya va serializado
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf_seccion")
+
+    def enviar_seccion(self, idx: int, markdown_seccion: str):
+        """Registra el markdown definitivo de la sección idx ("" si no produjo contenido)."""
+        with self._lock:
+            self._pendientes[idx] = markdown_seccion
+        self._executor.submit(self._maquetar_pendientes)
+
+    def _maquetar_pendientes(self):
+        """Maqueta, en orden, todas las secciones consecutivas que ya estén disponibles."""
+        while True:
+            with self._lock:
+                if self._error is not None or self._siguiente not in self._pendientes:
+                    return
+                idx = self._siguiente
+                markdown_seccion = self._pendientes.pop(idx)
+
+            markdown_fragmento = (self.preambulo if idx == 0 else "") + markdown_seccion
+            if markdown_fragmento.strip():
+                try:
+                    inicio = time.perf_counter()
+                    # En el documento completo, el preámbulo es la sección 0 y esta la idx + 1
+                    html = self._renderizador.markdown_a_html(markdown_fragmento, 0 if idx == 0 else idx + 1)
+                    documento = self._renderizador.renderizar(
+                        _html_documento(html),
+                        estilos_extra=f"@page :first {{ counter-reset: page {self._pagina_siguiente} }}",
+                        preset=self.preset,
+                    )
+                    self.segundos_renderizando += time.perf_counter() - inicio
+                except Exception as e:
+                    print(f"Error maquetando la sección {idx + 1}, se usará el renderizado completo: {e}")
+                    with self._lock:
+                        self._error = e
+                    return
+                self.fragmentos.append(documento)
+                self._pagina_siguiente += len(documento.pages)
+                print(f"Sección {idx + 1}/{self.total_secciones} maquetada "
+                      f"({len(documento.pages)} páginas, {time.perf_counter() - inicio:.2f}s)")
+
+            self._markdown_maquetado.append(markdown_fragmento)
+            with self._lock:
+                self._siguiente += 1
+
+    def cancelar(self):
+        """Descarta lo pendiente (p. ej. si el flujo falla antes de compilar)."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def finalizar(self, markdown_final: str, imagen_portada: str, output_pdf_path: str,
+                  directorio_trabajo: str = "temp") -> str:
+        """
+        Espera a los fragmentos pendientes, maqueta la portada y escribe el PDF unido
+        con las opciones del preset del compilador (ver tools/pdf_optimizacion.py).
+        Devuelve la ruta del PDF o "" si hay que recurrir al renderizado completo.
+        """
+        self._executor.shutdown(wait=True)
+        if self._error is not None:
+            return ""
+        if self._siguiente < self.total_secciones:
+            print(f"Solo se maquetaron {self._siguiente}/{self.total_secciones} secciones.")
+            return ""
+        if "".join(self._markdown_maquetado) != markdown_final:
+            print("El Markdown final no coincide con las secciones maquetadas.")
+            return ""
+        if necesita_documento_completo(markdown_final):
+            # Los fragmentos se convirtieron por separado: las referencias entre secciones no resuelven
+            print("El Markdown tiene referencias o notas al pie; se convierte el documento entero.")
+            return ""
+        if not self.fragmentos:
+            return ""
+
+        try:
+            inicio = time.perf_counter()
+            imagen_portada = _resolver_imagen_portada(imagen_portada, directorio_trabajo)
+            if imagen_portada:
+                imagen_portada = _preparar_imagen_portada(imagen_portada, directorio_trabajo)
+            portada = self._renderizador.renderizar(
+                _html_documento(_html_portada(markdown_final, imagen_portada)),
+                base_url=_base_url_imagen(imagen_portada),
+                preset=self.preset,
+            )
+            self.portada = portada
+            if len(portada.pages) != PAGINAS_PORTADA:
+                print(f"La portada ocupa {len(portada.pages)} páginas; se usará el renderizado completo.")
+                return ""
+
+            output_pdf_path = _normpath(output_pdf_path)
+            _preparar_directorio_salida(output_pdf_path)
+            print(f"Uniendo portada y {len(self.fragmentos)} fragmentos en: {output_pdf_path}")
+            self._renderizador.escribir_documentos([portada] + self.fragmentos, output_pdf_path, self.preset)
+            print(f"PDF escrito en {time.perf_counter() - inicio:.2f}s "
+                  f"({self.segundos_renderizando:.2f}s de maquetación solapada con las secciones)")
+            return _verificar_pdf(output_pdf_path)
+        except Exception as e:
+            print(f"Error uniendo los fragmentos del PDF: {e}")
+            return ""
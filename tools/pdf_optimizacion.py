@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# proyecto_crewai/tools/pdf_optimizacion.py
+
+"""
+Opciones de salida del PDF y análisis de su tamaño.
+
+PRESETS_PDF agrupa con un nombre las opciones de write_pdf de WeasyPrint que afectan al
+tamaño: optimización de imágenes, calidad JPEG, resolución máxima de imágenes (dpi),
+subconjunto de fuentes (full_fonts=False) y compresión de streams (uncompressed_pdf=False).
+
+desglose_pdf() recorre los objetos del PDF generado (también los de dentro de los object
+streams) y reparte los bytes entre fuentes, imágenes, contenido de las páginas y estructura
+según quién referencia a cada objeto, para saber qué ocupa sitio en el archivo.
+
+Variables de entorno:
+    PDF_PRESET   preset por defecto (equilibrado)
+"""
+
+import os
+import re
+import sys
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# ==================== PRESETS ====================
+
+PRESETS_PDF = {
+    # Opciones por defecto de WeasyPrint: imágenes tal cual, fuentes en subconjunto, streams comprimidos
+    "maxima_calidad": {
+        "optimize_images": False,
+        "full_fonts": False,
+        "uncompressed_pdf": False,
+    },
+    # Imágenes optimizadas sin pérdida visible a tamaño de impresión
+    "equilibrado": {
+        "optimize_images": True,
+        "jpeg_quality": 85,
+        "dpi": 300,
+        "full_fonts": False,
+        "uncompressed_pdf": False,
+    },
+    # Para archivo y descarga: imágenes a resolución de pantalla
+    "compacto": {
+        "optimize_images": True,
+        "jpeg_quality": 70,
+        "dpi": 150,
+        "full_fonts": False,
+        "hinting": False,
+        "uncompressed_pdf": False,
+    },
+}
+
+PRESET_POR_DEFECTO = "equilibrado"
+
+
+def preset_por_defecto() -> str:
+    """Preset configurado en PDF_PRESET (por defecto equilibrado)."""
+    return os.getenv("PDF_PRESET", PRESET_POR_DEFECTO)
+
+
+def opciones_preset(nombre: str = None) -> dict:
+    """Opciones de write_pdf del preset indicado."""
+    nombre = nombre or preset_por_defecto()
+    if nombre not in PRESETS_PDF:
+        print(f"[WARNING] Preset de PDF '{nombre}' desconocido, se usa '{PRESET_POR_DEFECTO}'")
+        nombre = PRESET_POR_DEFECTO
+    return dict(PRESETS_PDF[nombre])
+
+
+# ==================== DESGLOSE DEL TAMAÑO ====================
+
+_PATRON_CABECERA = re.compile(rb"(?<![0-9])(\d+)\s+(\d+)\s+obj\b")
+_PATRON_REFERENCIA = re.compile(rb"(?<![0-9])(\d+)\s+\d+\s+R\b")
+_PATRON_STREAM = re.compile(rb"\bstream\r?\n")
+_PATRON_LONGITUD = re.compile(rb"/Length\s+(\d+)(\s+\d+\s+R\b)?")
+_PATRON_CONTENIDO_PAGINA = re.compile(rb"/Contents\s*(\[[^\]]*\]|\d+\s+\d+\s+R)")
+_PATRON_PAGINA = re.compile(rb"/Type\s*/Page\b")
+_PATRON_FUENTE = re.compile(rb"/Type\s*/Font\b")
+_PATRON_IMAGEN = re.compile(rb"/Subtype\s*/Image\b")
+_PATRON_FORMULARIO = re.compile(rb"/Subtype\s*/Form\b")
+_PATRON_OBJSTM = re.compile(rb"/Type\s*/ObjStm\b")
+_CATEGORIAS = ("fuentes", "imagenes", "contenido", "estructura")
+
+
+class _ObjetoPDF:
+    """Objeto indirecto: diccionario (o valor), stream sin decodificar y bytes que ocupa en el archivo."""
+
+    def __init__(self, numero: int, diccionario: bytes, stream: bytes = b"", tamano: float = 0):
+        self.numero = numero
+        self.diccionario = diccionario
+        self.stream = stream
+        self.tamano = tamano
+
+
+def _leer_objetos(datos: bytes) -> list[_ObjetoPDF]:
+    """
+    Objetos de primer nivel en orden de aparición. Cada stream se salta con su /Length, así
+    que una cabecera "N 0 obj" que aparezca dentro de datos binarios no se confunde con otra.
+    """
+    candidatos = list(_PATRON_CABECERA.finditer(datos))
+    posiciones = {int(c.group(1)): c.end() for c in candidatos}
+
+    def longitud_indirecta(numero: int):
+        inicio = posiciones.get(numero)
+        valor = re.match(rb"\s*(\d+)\s+endobj", datos[inicio:inicio + 64]) if inicio else None
+        return int(valor.group(1)) if valor else None
+
+    objetos, fin_anterior = [], 0
+    for cabecera in candidatos:
+        if cabecera.start() < fin_anterior:
+            continue
+        siguiente = datos.find(b"endobj", cabecera.end())
+        if siguiente < 0:
+            break
+        diccionario, stream = datos[cabecera.end():siguiente], b""
+        inicio_stream = _PATRON_STREAM.search(datos, cabecera.end(), siguiente)
+        if inicio_stream:
+            diccionario = datos[cabecera.end():inicio_stream.start()]
+            longitud = _PATRON_LONGITUD.search(diccionario)
+            if longitud and longitud.group(2):
+                longitud = longitud_indirecta(int(longitud.group(1)))
+            elif longitud:
+                longitud = int(longitud.group(1))
+            if longitud is not None and datos.startswith(b"endstream", _saltar_blancos(datos, inicio_stream.end() + longitud)):
+                fin_stream = inicio_stream.end() + longitud
+            else:
+                fin_stream = datos.find(b"endstream", inicio_stream.end())
+            stream = datos[inicio_stream.end():fin_stream]
+            siguiente = datos.find(b"endobj", fin_stream)
+            if siguiente < 0:
+                break
+        fin_anterior = siguiente + len(b"endobj")
+        objetos.append(_ObjetoPDF(int(cabecera.group(1)), diccionario, stream, fin_anterior - cabecera.start()))
+    return objetos
+
+
+def _saltar_blancos(datos: bytes, posicion: int) -> int:
+    while posicion < len(datos) and datos[posicion] in b" \t\r\n":
+        posicion += 1
+    return posicion
+
+
+def _objetos_comprimidos(objstm: _ObjetoPDF) -> list[_ObjetoPDF]:
+    """
+    Objetos guardados dentro de un /ObjStm. Se comprimen juntos, así que los bytes del
+    object stream se reparten entre ellos según su tamaño descomprimido (estimación).
+    """
+    if re.search(rb"/Filter\s*\[?\s*/(?!FlateDecode\b)", objstm.diccionario):
+        return []
+    try:
+        datos = zlib.decompress(objstm.stream) if b"/FlateDecode" in objstm.diccionario else objstm.stream
+        primero = int(re.search(rb"/First\s+(\d+)", objstm.diccionario).group(1))
+    except (zlib.error, AttributeError):
+        return []
+    cabecera = [int(n) for n in datos[:primero].split()]
+    pares = list(zip(cabecera[0::2], cabecera[1::2]))
+    contenidos = []
+    for i, (numero, desplazamiento) in enumerate(pares):
+        fin = pares[i + 1][1] if i + 1 < len(pares) else len(datos) - primero
+        contenidos.append(_ObjetoPDF(numero, datos[primero + desplazamiento:primero + fin]))
+    total = sum(len(o.diccionario) for o in contenidos) or 1
+    for objeto in contenidos:
+        objeto.tamano = objstm.tamano * len(objeto.diccionario) / total
+    return contenidos
+
+
+def _alcanzables(raices: set, objetos: dict, excluir: set) -> set:
+    """Objetos a los que se llega desde raices siguiendo referencias, sin entrar en excluir."""
+    vistos, pendientes = set(), list(raices)
+    while pendientes:
+        numero = pendientes.pop()
+        if numero in vistos or numero in excluir or numero not in objetos:
+            continue
+        vistos.add(numero)
+        pendientes.extend(int(r.group(1)) for r in _PATRON_REFERENCIA.finditer(objetos[numero].diccionario))
+    return vistos
+
+
+def desglose_pdf(ruta_pdf: str) -> dict:
+    """
+    Bytes del PDF por categoría, clasificando los objetos por quién los referencia:
+    - fuentes: diccionarios /Font y todo lo que cuelga de ellos (descriptores, programas
+      de fuente, mapas ToUnicode, anchos).
+    - imagenes: XObjects /Image y lo que cuelga de ellos (máscaras, perfiles de color).
+    - contenido: streams /Contents de las páginas y XObjects /Form.
+    - estructura: páginas, catálogo, anotaciones, xref, cabeceras y el resto.
+    Los objetos de un /ObjStm se comprimen juntos: su parte se estima por tamaño
+    descomprimido y se devuelve en "estimado" (bytes repartidos de forma aproximada).
+    """
+    with open(ruta_pdf, "rb") as f:
+        datos = f.read()
+
+    objetos, estimado = {}, 0.0
+    for objeto in _leer_objetos(datos):
+        if _PATRON_OBJSTM.search(objeto.diccionario):
+            contenidos = _objetos_comprimidos(objeto)
+            if contenidos:
+                # Con los objetos de dentro ya repartidos, el object stream no suma por sí mismo
+                objetos.update((o.numero, o) for o in contenidos)
+                estimado += objeto.tamano
+                objeto.tamano = 0
+        objetos[objeto.numero] = objeto
+
+    paginas = {n for n, o in objetos.items() if _PATRON_PAGINA.search(o.diccionario)}
+    contenido = {
+        int(r.group(1))
+        for n in paginas
+        for m in _PATRON_CONTENIDO_PAGINA.finditer(objetos[n].diccionario)
+        for r in _PATRON_REFERENCIA.finditer(m.group(1))
+    }
+    contenido |= {n for n, o in objetos.items() if _PATRON_FORMULARIO.search(o.diccionario)}
+    imagenes = _alcanzables(
+        {n for n, o in objetos.items() if _PATRON_IMAGEN.search(o.diccionario)}, objetos, paginas
+    )
+    fuentes = _alcanzables(
+        {n for n, o in objetos.items() if _PATRON_FUENTE.search(o.diccionario)}, objetos, paginas | imagenes
+    )
+
+    desglose = dict.fromkeys(_CATEGORIAS, 0.0)
+    for numero, objeto in objetos.items():
+        if numero in imagenes:
+            categoria = "imagenes"
+        elif numero in fuentes:
+            categoria = "fuentes"
+        elif numero in contenido:
+            categoria = "contenido"
+        else:
+            categoria = "estructura"
+        desglose[categoria] += objeto.tamano
+    desglose = {categoria: round(valor) for categoria, valor in desglose.items()}
+    # Lo que queda fuera de los objetos (cabecera, xref, trailer) es estructura
+    desglose["estructura"] += len(datos) - sum(desglose.values())
+    desglose["total"] = len(datos)
+    desglose["estimado"] = round(estimado)
+    return desglose
+
+
+def formatear_desglose(desglose: dict) -> list[str]:
+    """Líneas legibles del desglose ("fuentes: 120.4 KB (35%)")."""
+    total = desglose.get("total") or 1
+    lineas = [
+        f"{categoria}: {desglose[categoria] / 1024:.1f} KB ({desglose[categoria] / total:.0%})"
+        for categoria in _CATEGORIAS
+    ]
+    if desglose.get("estimado"):
+        lineas.append(f"aproximado: {desglose['estimado'] / 1024:.1f} KB están en object streams "
+                      f"comprimidos y se reparten según su tamaño sin comprimir")
+    return lineas
+
+
+def main():
+    """Muestra el desglose de tamaño de los PDF indicados."""
+    rutas = sys.argv[1:]
+    if not rutas:
+        print("Uso: python tools/pdf_optimizacion.py documento.pdf [...]")
+        return False
+    for ruta in rutas:
+        desglose = desglose_pdf(ruta)
+        print(f"{ruta}: {desglose['total']} bytes")
+        for linea in formatear_desglose(desglose):
+            print(f"   • {linea}")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,837 @@
+#!/usr/bin/env python3
+# proyecto_crewai/tools/pdf_render.py
+
+"""
+Núcleo de la conversión Markdown → PDF con WeasyPrint: hoja de estilos, renderizador
+compartido y piezas del documento (portada, HTML). No depende de CrewAI, así que los
+procesos de tools/pdf_workers.py pueden importarlo sin cargar el framework de agentes.
+tools/pdf_tool.py lo reexporta y define la herramienta para los agentes.
+"""
+
+import os
+import re
+import sys
+import time
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Añadir el directorio padre al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Detectar separador de sistema operativo y función para rutas multiplataforma
+from pathlib import Path
+
+from tools.pdf_optimizacion import opciones_preset
+from utils.pdf_cache import obtener_cache_pdf, cache_pdf_desactivada
+from utils.workspace import DIRECTORIO_VISTAS_PREVIAS
+
+# ==================== HOJA DE ESTILOS ====================
+
+# Se compila una sola vez en RenderizadorPDF. 'Liberation Sans' es la fuente que instala la
+# imagen de Docker: así fontconfig la encuentra sin recorrer todo el fallback de 'Segoe UI'.
+# Cada sección ('## ') empieza en una página nueva, salvo la que sigue al título: así el
+# renderizado completo y el incremental (un fragmento por sección) dan las mismas páginas.
+ESTILOS_PDF = """
+@page {
+    margin: 2.5cm;
+    size: A4;
+    @bottom-center {
+        content: counter(page);
+        font-family: Arial, sans-serif;
+        font-size: 10pt;
+        color: #666;
+    }
+}
+
+body {
+    font-family: 'Segoe UI', 'Liberation Sans', Tahoma, Geneva, Verdana, sans-serif;
+    line-height: 1.6;
+    color: #333;
+    font-size: 11pt;
+}
+
+h1 {
+    color: #2c3e50;
+    border-bottom: 3px solid #3498db;
+    padding-bottom: 10px;
+    margin-top: 30px;
+    font-size: 24pt;
+    page-break-before: always;
+}
+
+h1:first-of-type {
+    page-break-before: avoid;
+}
+
+h2 {
+    color: #34495e;
+    border-bottom: 2px solid #95a5a6;
+    padding-bottom: 5px;
+    margin-top: 25px;
+    font-size: 18pt;
+    page-break-before: always;
+}
+
+h1 + h2 {
+    page-break-before: avoid;
+}
+
+h3 {
+    color: #7f8c8d;
+    margin-top: 20px;
+    font-size: 14pt;
+}
+
+p {
+    margin-bottom: 12px;
+    text-align: justify;
+}
+
+ul, ol {
+    margin-bottom: 15px;
+    padding-left: 25px;
+}
+
+li {
+    margin-bottom: 5px;
+}
+
+code {
+    background-color: #f8f9fa;
+    padding: 2px 5px;
+    border-radius: 3px;
+    font-family: 'Courier New', monospace;
+    font-size: 10pt;
+}
+
+pre {
+    background-color: #f8f9fa;
+    padding: 15px;
+    border-radius: 5px;
+    border-left: 4px solid #3498db;
+    overflow-x: auto;
+    margin: 15px 0;
+}
+
+blockquote {
+    border-left: 4px solid #3498db;
+    margin: 15px 0;
+    padding: 10px 20px;
+    background-color: #f8f9fa;
+    font-style: italic;
+}
+
+table {
+    width: 100%;
+    border-collapse: collapse;
+    margin: 15px 0;
+}
+
+table th, table td {
+    border: 1px solid #ddd;
+    padding: 8px;
+    text-align: left;
+}
+
+table th {
+    background-color: #f2f2f2;
+    font-weight: bold;
+}
+
+.portada {
+    text-align: center;
+    page-break-after: always;
+    padding-top: 50px;
+    padding-bottom: 50px;
+    min-height: 80vh;
+    display: flex;
+    flex-direction: column;
+    justify-content: center;
+    align-items: center;
+}
+
+.portada img {
+    max-width: 500px;
+    max-height: 400px;
+    height: auto;
+    width: auto;
+    margin-bottom: 40px;
+    border-radius: 15px;
+    box-shadow: 0 8px 16px rgba(0,0,0,0.2);
+}
+
+.portada h1 {
+    font-size: 32pt;
+    margin-top: 20px;
+    margin-bottom: 20px;
+    border: none;
+    page-break-before: avoid;
+    color: #2c3e50;
+    text-shadow: 2px 2px 4px rgba(0,0,0,0.1);
+}
+
+.portada .fecha {
+    font-size: 14pt;
+    color: #7f8c8d;
+    margin-top: 30px;
+    font-style: italic;
+}
+"""
+
+
+# Hoja de estilos del modo borrador: sin portada con flexbox, sombras, bordes redondeados ni
+# texto justificado, y una sola familia de fuentes. Pensada para revisar el texto, no para publicar.
+ESTILOS_BORRADOR = """
+@page {
+    margin: 2cm;
+    size: A4;
+    @bottom-center {
+        content: counter(page);
+        font-size: 9pt;
+    }
+}
+
+body {
+    font-family: 'Liberation Sans', sans-serif;
+    font-size: 11pt;
+    line-height: 1.4;
+}
+
+h1 { font-size: 20pt; }
+h2 { font-size: 15pt; margin-top: 18px; }
+h3 { font-size: 12pt; }
+
+pre, code {
+    font-family: 'Liberation Mono', monospace;
+    font-size: 9pt;
+}
+
+pre { white-space: pre-wrap; }
+
+table { border-collapse: collapse; }
+table th, table td { border: 1px solid #999; padding: 3px; }
+
+.portada { page-break-after: always; }
+"""
+
+
+# ==================== MARKDOWN → HTML ====================
+
+EXTENSIONES_MARKDOWN = ['tables', 'toc', 'fenced_code', 'codehilite']
+
+# Definiciones de enlaces por referencia ("[id]: url") y de notas al pie ("[^1]: texto"): se
+# pueden usar desde cualquier sección, así que con ellas no se convierte sección a sección
+_PATRON_DEFINICION_REFERENCIA = re.compile(r"^ {0,3}\[[^\]]+\]:", re.MULTILINE)
+
+
+def necesita_documento_completo(markdown_content: str) -> bool:
+    """True si el markdown tiene definiciones de referencias o notas y hay que convertirlo entero."""
+    return _PATRON_DEFINICION_REFERENCIA.search(markdown_content) is not None
+
+
+def _dividir_secciones(markdown_content: str) -> list[str]:
+    """Parte el markdown antes de cada cabecera '## ' (ignorando las que estén dentro de bloques de código)."""
+    partes, actual, en_bloque = [], [], False
+    for linea in markdown_content.splitlines(keepends=True):
+        if linea.lstrip().startswith(("```", "~~~")):
+            en_bloque = not en_bloque
+        if not en_bloque and linea.startswith("## ") and actual:
+            partes.append("".join(actual))
+            actual = []
+        actual.append(linea)
+    if actual:
+        partes.append("".join(actual))
+    return partes
+
+
+class ConversorMarkdown:
+    """
+    Markdown → HTML por secciones con caché por hash de contenido.
+
+    Reutiliza una única instancia de markdown.Markdown (reset() entre conversiones) y guarda
+    el HTML de cada sección '## ' en una caché LRU en memoria, así que al regenerar un PDF
+    solo se convierten (y pasan por Pygments) las secciones que han cambiado. Los ids de la
+    extensión toc llevan el prefijo "s<n>-" de la sección para que no se repitan entre
+    secciones. Si hay definiciones de referencias o notas al pie, el documento se convierte
+    entero, como una sola sección sin prefijo.
+    """
+
+    def __init__(self, max_secciones: int = 512, extensiones: list = None):
+        import markdown
+        from markdown.extensions.toc import slugify
+        self._slugify = slugify
+        self._prefijo_ids = ""
+        self._md = markdown.Markdown(
+            extensions=extensiones or EXTENSIONES_MARKDOWN,
+            extension_configs={'toc': {'slugify': self._slug_con_prefijo}},
+        )
+        self.max_secciones = max_secciones
+        self._cache: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def _slug_con_prefijo(self, valor: str, separador: str) -> str:
+        # Solo se llama dentro de _convertir_seccion, con el lock tomado
+        return self._prefijo_ids + self._slugify(valor, separador)
+
+    def _convertir_seccion(self, seccion: str, prefijo_ids: str = "") -> str:
+        clave = hashlib.sha256(f"{prefijo_ids}\n{seccion}".encode("utf-8")).hexdigest()
+        with self._lock:
+            html = self._cache.get(clave)
+            if html is not None:
+                self._cache.move_to_end(clave)
+                self.aciertos += 1
+                return html
+            self.fallos += 1
+            self._prefijo_ids = prefijo_ids
+            html = self._md.reset().convert(seccion)
+            self._cache[clave] = html
+            if len(self._cache) > self.max_secciones:
+                self._cache.popitem(last=False)
+            return html
+
+    def convertir(self, markdown_content: str, primera_seccion: int = 0) -> str:
+        """
+        primera_seccion: posición en el documento de la primera sección de markdown_content
+        (para los prefijos de los ids cuando se convierte un fragmento suelto).
+        """
+        if necesita_documento_completo(markdown_content):
+            return self._convertir_seccion(markdown_content)
+        return "\n".join(
+            self._convertir_seccion(seccion, f"s{primera_seccion + n}-")
+            for n, seccion in enumerate(_dividir_secciones(markdown_content))
+        )
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {"aciertos": self.aciertos, "fallos": self.fallos, "secciones": len(self._cache)}
+
+
+_conversor_global: ConversorMarkdown = None
+_lock_conversor = threading.Lock()
+
+
+def obtener_conversor_markdown() -> ConversorMarkdown:
+    """Devuelve el conversor Markdown → HTML del proceso."""
+    global _conversor_global
+    with _lock_conversor:
+        if _conversor_global is None:
+            _conversor_global = ConversorMarkdown(
+                max_secciones=int(os.getenv("PDF_CACHE_HTML_SECCIONES", "512"))
+            )
+        return _conversor_global
+
+
+# ==================== RENDERIZADOR ====================
+
+class RenderizadorPDF:
+    """
+    Convierte HTML en PDF con WeasyPrint reutilizando entre documentos la hoja de estilos
+    ya compilada (CSS) y la configuración de fuentes (FontConfiguration), en lugar de
+    volver a parsear el CSS y repetir el descubrimiento de fuentes en cada PDF.
+    """
+
+    def __init__(self, estilos: str = ESTILOS_PDF, conversor: ConversorMarkdown = None,
+                 opciones_pdf: dict = None):
+        from weasyprint import HTML, CSS
+        from weasyprint.text.fonts import FontConfiguration
+
+        self._HTML = HTML
+        self._conversor = conversor or obtener_conversor_markdown()
+        self.opciones_pdf = opciones_pdf or {}
+        self.font_config = FontConfiguration()
+        self.hoja_estilos = CSS(string=estilos, font_config=self.font_config)
+        # Pango/fontconfig no son seguros entre hilos y hay varios trabajos en paralelo
+        self._lock = threading.Lock()
+
+    def markdown_a_html(self, markdown_content: str, primera_seccion: int = 0) -> str:
+        return self._conversor.convertir(markdown_content, primera_seccion)
+
+    def _opciones_escritura(self, preset: str = None) -> dict:
+        # Las opciones propias del renderizador (p. ej. las del borrador) prevalecen sobre el preset
+        return {**opciones_preset(preset), **self.opciones_pdf}
+
+    def escribir_pdf(self, html: str, output_pdf_path: str, base_url: str = None, preset: str = None):
+        """Maqueta el HTML con la hoja de estilos compartida y escribe el PDF."""
+        with self._lock:
+            self._HTML(string=html, base_url=base_url).write_pdf(
+                output_pdf_path,
+                stylesheets=[self.hoja_estilos],
+                font_config=self.font_config,
+                **self._opciones_escritura(preset),
+            )
+
+    def renderizar(self, html: str, base_url: str = None, estilos_extra: str = "", preset: str = None):
+        """
+        Maqueta el HTML sin escribirlo y devuelve el Document de WeasyPrint (un fragmento).
+        WeasyPrint prepara las imágenes al maquetar, así que las opciones de imagen del preset
+        (optimize_images, jpeg_quality, dpi) se aplican aquí y no al escribir.
+        """
+        from weasyprint import CSS
+        with self._lock:
+            hojas = [self.hoja_estilos]
+            if estilos_extra:
+                hojas.append(CSS(string=estilos_extra, font_config=self.font_config))
+            return self._HTML(string=html, base_url=base_url).render(
+                stylesheets=hojas, font_config=self.font_config, **self._opciones_escritura(preset)
+            )
+
+    def escribir_documentos(self, documentos: list, output_pdf_path: str, preset: str = None):
+        """
+        Une las páginas de varios fragmentos ya maquetados en un único PDF. Los fragmentos
+        deben venir de renderizar() con el mismo preset.
+        """
+        paginas = [pagina for documento in documentos for pagina in documento.pages]
+        with self._lock:
+            documentos[0].copy(paginas).write_pdf(output_pdf_path, **self._opciones_escritura(preset))
+
+
+_renderizador_global: RenderizadorPDF = None
+_lock_global = threading.Lock()
+
+
+def obtener_renderizador() -> RenderizadorPDF:
+    """Devuelve el renderizador del proceso, creándolo (y compilando el CSS) la primera vez."""
+    global _renderizador_global
+    with _lock_global:
+        if _renderizador_global is None:
+            _renderizador_global = RenderizadorPDF()
+        return _renderizador_global
+
+
+# ==================== PIEZAS DEL DOCUMENTO ====================
+
+def _normpath(p):
+    """Normalizar rutas multiplataforma."""
+    if p:
+        return str(Path(p).expanduser().resolve())
+    return p
+
+
+def _resolver_imagen_portada(imagen_portada: str = None, directorio_trabajo: str = "temp",
+                             avisar: bool = True) -> str:
+    """Devuelve la imagen de portada a usar, buscando una temp_image.* si no se indica ninguna."""
+    imagen_portada = _normpath(imagen_portada) if imagen_portada else None
+    if imagen_portada and os.path.exists(imagen_portada):
+        if avisar:
+            print(f"Usando imagen de portada: {imagen_portada}")
+        return imagen_portada
+
+    # Buscar imagen de portada en ubicaciones comunes
+    imagenes_posibles = [
+        os.path.join(directorio_trabajo, "temp_image.jpg"),
+        os.path.join(directorio_trabajo, "temp_image.png"),
+        os.path.join(directorio_trabajo, "temp_image.jpeg"),
+        "portada.jpg",
+        "portada.png"
+    ]
+    for img_path in imagenes_posibles:
+        img_path = _normpath(img_path)
+        if os.path.exists(img_path):
+            if avisar:
+                print(f"Usando imagen de portada encontrada: {img_path}")
+            return img_path
+
+    if avisar:
+        print("No se encontró imagen de portada, generando PDF sin imagen")
+    return None
+
+
+def _titulo_markdown(markdown_content: str) -> str:
+    """Título del documento: primera línea que empiece con '# '."""
+    for line in markdown_content.split('\n'):
+        line = line.strip()
+        if line.startswith('# '):
+            return line[2:].strip()
+    return "Documento"
+
+
+# Tamaño máximo de la imagen en la portada (.portada img en ESTILOS_PDF), en px CSS (1/96 in)
+PORTADA_MAX_PX_CSS = (500, 400)
+# Resolución de impresión a la que se prepara la imagen
+PORTADA_DPI = 300
+PORTADA_CALIDAD_JPEG = 85
+
+# Firmas (magic bytes) de los formatos que se pueden recibir como portada
+_FIRMAS_IMAGEN = (
+    (b"\xff\xd8\xff", "JPEG"),
+    (b"\x89PNG\r\n\x1a\n", "PNG"),
+    (b"GIF87a", "GIF"),
+    (b"GIF89a", "GIF"),
+    (b"RIFF", "WEBP"),
+    (b"BM", "BMP"),
+)
+
+
+def _formato_imagen(ruta: str) -> str:
+    """Formato real de la imagen según sus primeros bytes (la extensión descargada puede mentir)."""
+    with open(ruta, "rb") as f:
+        cabecera = f.read(16)
+    for firma, formato in _FIRMAS_IMAGEN:
+        if cabecera.startswith(firma) and (formato != "WEBP" or cabecera[8:12] == b"WEBP"):
+            return formato
+    return ""
+
+
+def _preparar_imagen_portada(imagen_portada: str, directorio_trabajo: str = "temp") -> str:
+    """
+    Reduce la imagen de portada al tamaño al que se imprime (PORTADA_MAX_PX_CSS a PORTADA_DPI)
+    y la recodifica como JPEG, o como PNG si tiene transparencia. Devuelve la ruta de la
+    imagen preparada, o la original si no se puede procesar.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        print("Pillow no está instalado, se usa la imagen de portada original")
+        return imagen_portada
+
+    try:
+        formato = _formato_imagen(imagen_portada)
+        if not formato:
+            print(f"⚠️ Formato de imagen no reconocido: {imagen_portada}")
+            return imagen_portada
+
+        max_px = tuple(round(lado * PORTADA_DPI / 96) for lado in PORTADA_MAX_PX_CSS)
+        with Image.open(imagen_portada) as img:
+            original = img.size
+            # Con JPEG, draft() decodifica directamente a una escala reducida (menos memoria)
+            img.draft("RGB", max_px)
+            img.seek(0)  # GIF/WEBP animados: solo el primer fotograma
+            transparente = img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info
+            img = img.convert("RGBA" if transparente else "RGB")
+            img.thumbnail(max_px, Image.LANCZOS)
+
+            extension = "png" if transparente else "jpg"
+            destino = os.path.join(directorio_trabajo, f"portada_preparada.{extension}")
+            os.makedirs(directorio_trabajo, exist_ok=True)
+            if transparente:
+                img.save(destino, "PNG", optimize=True)
+            else:
+                img.save(destino, "JPEG", quality=PORTADA_CALIDAD_JPEG, optimize=True)
+
+        print(f"Imagen de portada preparada: {formato} {original[0]}x{original[1]} "
+              f"({os.path.getsize(imagen_portada)} bytes) -> {extension.upper()} {img.size[0]}x{img.size[1]} "
+              f"({os.path.getsize(destino)} bytes)")
+        return _normpath(destino)
+    except Exception as e:
+        print(f"⚠️ Error preparando la imagen de portada, se usa la original: {e}")
+        return imagen_portada
+
+
+def _fecha_portada() -> str:
+    """Fecha que se imprime en la portada (mes y año). Forma parte de la clave de la caché."""
+    from datetime import datetime
+    return datetime.now().strftime("%B %Y")
+
+
+def _html_portada(markdown_content: str, imagen_portada: str = None) -> str:
+    """
+    HTML de la portada (título, fecha y, si hay, la imagen). La imagen se referencia por su
+    nombre de fichero: hay que maquetar con base_url=_base_url_imagen(imagen_portada).
+    """
+    from urllib.parse import quote
+    titulo = _titulo_markdown(markdown_content)
+    fecha_actual = _fecha_portada()
+
+    if imagen_portada and os.path.exists(imagen_portada):
+        print(f"Portada creada con título: '{titulo}'")
+        return f"""
+        <div class="portada">
+            <img src="{quote(os.path.basename(imagen_portada))}" alt="Portada del documento">
+            <h1>{titulo}</h1>
+            <div class="fecha">{fecha_actual}</div>
+        </div>
+        """
+
+    # No hay imagen: portada simple
+    print(f"Portada creada sin imagen con título: '{titulo}'")
+    return f"""
+    <div class="portada">
+        <h1>{titulo}</h1>
+        <div class="fecha">{fecha_actual}</div>
+    </div>
+    """
+
+
+def _base_url_imagen(imagen_portada: str = None) -> str:
+    """Directorio desde el que WeasyPrint resuelve la imagen de portada (None si no hay imagen)."""
+    if imagen_portada and os.path.exists(imagen_portada):
+        return os.path.dirname(imagen_portada) + os.sep
+    return None
+
+
+def _html_documento(cuerpo_html: str, estilos: str = "") -> str:
+    """
+    Envuelve el cuerpo en un documento HTML completo. Para el PDF los estilos los pone el
+    renderizador; la vista previa los incluye en línea.
+    """
+    estilos_html = f"<style>{estilos}</style>" if estilos else ""
+    return f"""
+    <!DOCTYPE html>
+    <html lang="es">
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <title>Documento PDF</title>
+        {estilos_html}
+    </head>
+    <body>
+        {cuerpo_html}
+    </body>
+    </html>
+    """
+
+
+def _preparar_directorio_salida(output_pdf_path: str):
+    """Crear directorio de salida si no existe."""
+    output_dir = os.path.dirname(output_pdf_path)
+    if output_dir and not os.path.exists(output_dir):
+        print(f"📁 Creando directorio: {output_dir}")
+        os.makedirs(output_dir, exist_ok=True)
+
+
+def _verificar_pdf(pdf_path: str) -> str:
+    """Devuelve la ruta si el PDF existe y tiene un tamaño razonable, o cadena vacía."""
+    if os.path.exists(pdf_path):
+        file_size = os.path.getsize(pdf_path)
+        print(f"📊 Archivo generado: {pdf_path} ({file_size} bytes)")
+        if file_size > 1000:
+            return pdf_path
+        print(f"Archivo muy pequeño: {file_size} bytes")
+        return ""
+    print(f"El archivo no existe: {pdf_path}")
+    return ""
+
+
+# ==================== VISTA PREVIA HTML ====================
+
+# En el navegador no hay páginas: la vista previa no fuerza saltos de página
+_ESTILOS_VISTA_PREVIA = """
+body { max-width: 50em; margin: 0 auto; padding: 1em; }
+h1, h2 { page-break-before: auto; }
+.vista-previa-estado { color: #666; font-style: italic; border-top: 1px dashed #ccc; padding-top: 0.5em; }
+"""
+
+
+def ruta_vista_previa(run_id: str) -> str:
+    """Ruta de la vista previa HTML de una ejecución."""
+    return os.path.join(DIRECTORIO_VISTAS_PREVIAS, f"{run_id}.html")
+
+
+def escribir_vista_previa(markdown_content: str, ruta: str, estado: str = "") -> str:
+    """
+    Escribe una vista previa HTML del Markdown con la misma conversión (ConversorMarkdown, con
+    su caché por sección) y la misma hoja de estilos que el PDF. No necesita WeasyPrint.
+    estado: texto que se añade al final (p. ej. "3/8 secciones redactadas").
+    """
+    cuerpo = obtener_conversor_markdown().convertir(markdown_content)
+    if estado:
+        cuerpo += f'\n<p class="vista-previa-estado">{estado}</p>'
+    html = _html_documento(cuerpo, estilos=ESTILOS_PDF + _ESTILOS_VISTA_PREVIA)
+    directorio = os.path.dirname(ruta)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    # Escritura atómica: la UI la lee mientras el flujo la reescribe
+    temporal = f"{ruta}.{threading.get_ident()}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        f.write(html)
+    os.replace(temporal, ruta)
+    return ruta
+
+
+# ==================== BACKENDS ====================
+
+class BackendPDF:
+    """Interfaz de los backends de generación: markdown (+ portada) → fichero PDF."""
+
+    nombre = ""
+
+    def generar(self, markdown_content: str, imagen_portada: str, output_pdf_path: str,
+                directorio_trabajo: str, preset: str = None) -> str:
+        """Escribe el PDF y devuelve su ruta, o "" si no se generó. preset: ver PRESETS_PDF."""
+        raise NotImplementedError
+
+
+class BackendAltaCalidad(BackendPDF):
+    """WeasyPrint con la hoja de estilos completa, portada con imagen y resaltado de código."""
+
+    nombre = "alta_calidad"
+
+    def __init__(self):
+        # Renderizador compartido (importa WeasyPrint y compila el CSS solo la primera vez)
+        self.renderizador = obtener_renderizador()
+
+    def generar(self, markdown_content, imagen_portada, output_pdf_path, directorio_trabajo, preset=None):
+        imagen_portada = _resolver_imagen_portada(imagen_portada, directorio_trabajo)
+        if imagen_portada:
+            imagen_portada = _preparar_imagen_portada(imagen_portada, directorio_trabajo)
+        output_pdf_path = _normpath(output_pdf_path)
+
+        # Convertir markdown a HTML
+        print("Convirtiendo markdown a HTML...")
+        html_content = self.renderizador.markdown_a_html(markdown_content)
+        portada_html = _html_portada(markdown_content, imagen_portada)
+
+        # Construir HTML completo
+        full_html = _html_documento(f"{portada_html}\n{html_content}")
+        _preparar_directorio_salida(output_pdf_path)
+
+        # Generar PDF
+        print(f"Generando PDF en: {output_pdf_path}")
+        print(f"Escribiendo PDF...")
+        self.renderizador.escribir_pdf(
+            full_html, output_pdf_path, base_url=_base_url_imagen(imagen_portada), preset=preset
+        )
+        print(f"PDF escrito")
+
+        # Verificar que se generó correctamente
+        return _verificar_pdf(output_pdf_path)
+
+
+class BackendBorrador(BackendPDF):
+    """
+    WeasyPrint con una hoja de estilos mínima: portada solo con el título, sin imagen ni
+    resaltado de código (sin Pygments) y fuentes embebidas enteras (sin subsetting).
+    """
+
+    nombre = "borrador"
+
+    def __init__(self):
+        self.renderizador = RenderizadorPDF(
+            estilos=ESTILOS_BORRADOR,
+            conversor=ConversorMarkdown(extensiones=['tables', 'fenced_code']),
+            opciones_pdf={"full_fonts": True},
+        )
+
+    def generar(self, markdown_content, imagen_portada, output_pdf_path, directorio_trabajo, preset=None):
+        output_pdf_path = _normpath(output_pdf_path)
+        titulo = _titulo_markdown(markdown_content)
+        html_content = self.renderizador.markdown_a_html(markdown_content)
+        full_html = _html_documento(f'<div class="portada"><h1>{titulo}</h1><p>Borrador</p></div>\n{html_content}')
+        _preparar_directorio_salida(output_pdf_path)
+        print(f"Escribiendo PDF borrador en: {output_pdf_path}")
+        self.renderizador.escribir_pdf(full_html, output_pdf_path, preset=preset)
+        return _verificar_pdf(output_pdf_path)
+
+
+BACKEND_POR_DEFECTO = BackendAltaCalidad.nombre
+BACKENDS_PDF = {backend.nombre: backend for backend in (BackendAltaCalidad, BackendBorrador)}
+
+_backends: dict[str, BackendPDF] = {}
+_lock_backends = threading.Lock()
+
+
+def obtener_backend_pdf(nombre: str = BACKEND_POR_DEFECTO) -> BackendPDF:
+    """Devuelve (creándolo la primera vez) el backend indicado."""
+    if nombre not in BACKENDS_PDF:
+        print(f"[WARNING] Backend de PDF '{nombre}' desconocido, se usa '{BACKEND_POR_DEFECTO}'")
+        nombre = BACKEND_POR_DEFECTO
+    with _lock_backends:
+        if nombre not in _backends:
+            _backends[nombre] = BACKENDS_PDF[nombre]()
+        return _backends[nombre]
+
+
+# ==================== CACHÉ DE PDFs ====================
+
+# Subir al cambiar cómo se construye el HTML (portada, plantilla) sin tocar las hojas de estilos
+VERSION_RENDER = 2
+
+
+def _version_estilos() -> str:
+    """Huella de las hojas de estilos, las extensiones de Markdown y la versión de WeasyPrint."""
+    try:
+        from importlib.metadata import version
+        version_weasyprint = version("weasyprint")
+    except Exception:
+        version_weasyprint = "?"
+    datos = "\n".join([str(VERSION_RENDER), version_weasyprint, ESTILOS_PDF, ESTILOS_BORRADOR,
+                        ",".join(EXTENSIONES_MARKDOWN)])
+    return hashlib.sha256(datos.encode("utf-8")).hexdigest()[:16]
+
+
+def _hash_fichero(ruta: str) -> str:
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def clave_pdf(markdown_content: str, imagen_portada: str = None, directorio_trabajo: str = "temp",
+              backend: str = BACKEND_POR_DEFECTO, preset: str = None, incremental: bool = False) -> str:
+    """
+    Clave de contenido del PDF: Markdown, portada (imagen y fecha impresa), estilos, backend,
+    opciones de escritura y maquetación (las páginas coinciden, pero la unión incremental
+    escribe otro fichero). Con la fecha, un PDF de otro mes no se sirve con la portada antigua.
+    """
+    imagen_portada = _resolver_imagen_portada(imagen_portada, directorio_trabajo, avisar=False)
+    datos = {
+        "markdown": hashlib.sha256(markdown_content.encode("utf-8")).hexdigest(),
+        "portada": _hash_fichero(imagen_portada) if imagen_portada else None,
+        "fecha_portada": _fecha_portada(),
+        "estilos": _version_estilos(),
+        "backend": backend if backend in BACKENDS_PDF else BACKEND_POR_DEFECTO,
+        "opciones": opciones_preset(preset),
+        "maquetacion": "incremental" if incremental else "completa",
+    }
+    return hashlib.sha256(json.dumps(datos, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def pdf_desde_cache(clave: str, output_pdf_path: str) -> str:
+    """Copia el PDF cacheado a output_pdf_path. Devuelve la ruta, o "" si no está (o hay bypass)."""
+    if cache_pdf_desactivada():
+        return ""
+    try:
+        output_pdf_path = _normpath(output_pdf_path)
+        if obtener_cache_pdf().obtener(clave, output_pdf_path):
+            return _verificar_pdf(output_pdf_path)
+    except Exception as e:
+        print(f"[WARNING] No se pudo leer la caché de PDFs: {e}")
+    return ""
+
+
+def guardar_pdf_en_cache(clave: str, pdf_path: str, segundos: float):
+    """Guarda el PDF generado (y lo que costó generarlo) en la caché."""
+    if cache_pdf_desactivada() or not pdf_path:
+        return
+    try:
+        obtener_cache_pdf().guardar(clave, pdf_path, segundos)
+    except Exception as e:
+        print(f"[WARNING] No se pudo guardar el PDF en la caché: {e}")
+
+
+# ==================== FUNCIÓN BASE (para testing) ====================
+
+def _generar_pdf_base(markdown_content: str, imagen_portada: str = None, output_pdf_path: str = os.path.join("temp", "final_documento.pdf"), directorio_trabajo: str = "temp", backend: str = BACKEND_POR_DEFECTO, preset: str = None, consultar_cache: bool = True) -> str:
+    """Función base para generar PDF (sin decorador @tool).
+    Si no se indica portada, se busca una temp_image.* en directorio_trabajo.
+    backend: "alta_calidad" (por defecto) o "borrador".
+    preset: opciones de tamaño de tools/pdf_optimizacion.py (por defecto PDF_PRESET).
+    Un documento idéntico ya generado se copia desde la caché de PDFs; con
+    consultar_cache=False (quien llama ya la consultó) solo se guarda el resultado."""
+    try:
+        clave = clave_pdf(markdown_content, imagen_portada, directorio_trabajo, backend, preset)
+        if consultar_cache:
+            pdf_cacheado = pdf_desde_cache(clave, output_pdf_path)
+            if pdf_cacheado:
+                return pdf_cacheado
+
+        try:
+            backend_pdf = obtener_backend_pdf(backend)
+        except ImportError as e:
+            print(f"Error: Falta instalar dependencias: {e}")
+            print("Instala con: pip install weasyprint markdown")
+            return ""
+        inicio = time.perf_counter()
+        pdf_path = backend_pdf.generar(markdown_content, imagen_portada, output_pdf_path, directorio_trabajo, preset)
+        guardar_pdf_en_cache(clave, pdf_path, time.perf_counter() - inicio)
+        return pdf_path
+    except Exception as e:
+        print(f"Error generando PDF: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return ""
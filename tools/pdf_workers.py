@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# proyecto_crewai/tools/pdf_workers.py
+
+"""
+Pool de procesos para generar PDFs.
+
+Cada proceso importa WeasyPrint, compila la hoja de estilos, carga las fuentes y hace una
+primera maquetación al arrancar (initializer), así que el coste de arranque se paga una vez
+por proceso y no en cada PDF. La maquetación ya no compite por el GIL con el proceso que
+sirve Streamlit y varios PDFs simultáneos usan varios núcleos. Cada proceso se recicla tras
+PDF_TRABAJOS_POR_WORKER documentos para acotar la memoria.
+
+Si el pool no está disponible (PDF_WORKERS=0 o un proceso muere), el PDF se genera en el
+propio proceso con _generar_pdf_base.
+
+El renderizado incremental (tools/pdf_incremental.py) no pasa por aquí: los fragmentos se
+maquetan en un hilo del proceso del flujo. El flujo solo calienta el pool cuando el PDF se va
+a generar entero (borrador, pdf_incremental=False o si el incremental no se puede usar).
+
+Variables de entorno:
+    PDF_WORKERS               procesos de renderizado (por defecto 2; 0 desactiva el pool)
+    PDF_TRABAJOS_POR_WORKER   PDFs que genera un proceso antes de reciclarse (por defecto 20)
+"""
+
+import os
+import sys
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.pdf_render import _generar_pdf_base
+
+
+# ==================== FUNCIONES DEL PROCESO WORKER ====================
+
+def _inicializar_worker():
+    """Precarga WeasyPrint, CSS y fuentes y hace una maquetación de calentamiento."""
+    try:
+        from tools.pdf_render import obtener_renderizador, _html_documento
+        inicio = time.perf_counter()
+        renderizador = obtener_renderizador()
+        renderizador.renderizar(_html_documento(
+            renderizador.markdown_a_html("# Calentamiento\n\n## Sección\n\nTexto con `código`.")
+        ))
+        print(f"[pdf-worker {os.getpid()}] listo en {time.perf_counter() - inicio:.2f}s")
+    except Exception as e:
+        # El fallo se repetirá (y se informará) al generar el PDF; no romper el pool aquí
+        print(f"[pdf-worker {os.getpid()}] no se pudo precargar WeasyPrint: {e}")
+
+
+def _generar_pdf_en_worker(markdown_content: str, imagen_portada: str, output_pdf_path: str,
+                           directorio_trabajo: str, opciones: dict) -> str:
+    return _generar_pdf_base(markdown_content, imagen_portada, output_pdf_path, directorio_trabajo, **opciones)
+
+
+def _nada() -> int:
+    return os.getpid()
+
+
+# ==================== SERVICIO ====================
+
+class ServicioPDF:
+    """Reparte la generación de PDFs entre procesos ya calentados."""
+
+    def __init__(self, workers: int = 2, trabajos_por_worker: int = 20):
+        self.workers = workers
+        self.trabajos_por_worker = trabajos_por_worker
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def _obtener_pool(self):
+        with self._lock:
+            if self._pool is None and self.workers > 0:
+                # spawn: los workers no heredan los hilos ni el estado de Streamlit/CrewAI
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_inicializar_worker,
+                    max_tasks_per_child=self.trabajos_por_worker,
+                )
+            return self._pool
+
+    def _descartar_pool(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def calentar(self):
+        """Arranca los procesos en segundo plano (p. ej. mientras trabajan los agentes)."""
+        pool = self._obtener_pool()
+        if pool is not None:
+            for _ in range(self.workers):
+                pool.submit(_nada)
+
+    def generar_pdf(self, markdown_content: str, imagen_portada: str = None,
+                    output_pdf_path: str = os.path.join("temp", "final_documento.pdf"),
+                    directorio_trabajo: str = "temp", **opciones) -> str:
+        """Igual que _generar_pdf_base, pero en un proceso del pool. Devuelve la ruta o ""."""
+        pool = self._obtener_pool()
+        if pool is None:
+            return _generar_pdf_base(markdown_content, imagen_portada, output_pdf_path, directorio_trabajo, **opciones)
+
+        # Rutas absolutas: el worker no tiene por qué compartir el directorio actual
+        imagen_portada = os.path.abspath(imagen_portada) if imagen_portada else imagen_portada
+        try:
+            futuro = pool.submit(
+                _generar_pdf_en_worker, markdown_content, imagen_portada,
+                os.path.abspath(output_pdf_path), os.path.abspath(directorio_trabajo), opciones,
+            )
+            return futuro.result()
+        except BrokenProcessPool as e:
+            print(f"El pool de PDF dejó de funcionar ({e}); se genera en este proceso.")
+            self._descartar_pool()
+            return _generar_pdf_base(markdown_content, imagen_portada, output_pdf_path, directorio_trabajo, **opciones)
+
+    def cerrar(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+
+
+# ==================== INSTANCIA GLOBAL ====================
+
+_servicio_global: ServicioPDF = None
+_lock_global = threading.Lock()
+
+
+def obtener_servicio_pdf() -> ServicioPDF:
+    """Devuelve el servicio de PDF del proceso (compartido por todos los flujos)."""
+    global _servicio_global
+    with _lock_global:
+        if _servicio_global is None:
+            _servicio_global = ServicioPDF(
+                workers=int(os.getenv("PDF_WORKERS", "2")),
+                trabajos_por_worker=int(os.getenv("PDF_TRABAJOS_POR_WORKER", "20")),
+            )
+        return _servicio_global
+
+
+def main():
+    """Genera varios PDFs a la vez con el pool y los compara con hacerlo en este proceso."""
+    markdown_ejemplo = "# Prueba del pool\n\n" + "\n".join(
+        f"## Sección {i}\n\n" + "Texto de ejemplo con **formato** y `código`. " * 60 for i in range(1, 9)
+    )
+    directorio = os.path.join("temp", "pdf_workers")
+    os.makedirs(directorio, exist_ok=True)
+    n = 4
+
+    servicio = obtener_servicio_pdf()
+    inicio = time.perf_counter()
+    servicio.calentar()
+    servicio.generar_pdf("# Calentamiento", None, os.path.join(directorio, "calentamiento.pdf"), directorio)
+    print(f"Pool calentado en {time.perf_counter() - inicio:.2f}s")
+
+    inicio = time.perf_counter()
+    hilos = [
+        threading.Thread(target=servicio.generar_pdf, args=(
+            markdown_ejemplo, None, os.path.join(directorio, f"pool_{i}.pdf"), directorio
+        ))
+        for i in range(n)
+    ]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    print(f"{n} PDFs con el pool ({servicio.workers} procesos): {time.perf_counter() - inicio:.2f}s")
+
+    inicio = time.perf_counter()
+    for i in range(n):
+        _generar_pdf_base(markdown_ejemplo, None, os.path.join(directorio, f"local_{i}.pdf"), directorio)
+    print(f"{n} PDFs en este proceso: {time.perf_counter() - inicio:.2f}s")
+
+    servicio.cerrar()
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
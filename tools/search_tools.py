@@ -28,19 +28,83 @@ else:
 # Añadir el directorio padre al path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from utils.search_cache import obtener_cache_busquedas, cache_desactivada
+
+# Código de país y de idioma para España (resultados en español)
+SERPER_GL = "es"
+SERPER_HL = "es"
+
+
+def _url_serper(endpoint: str) -> str:
+    """URL de un endpoint de Serper (SERPER_BASE_URL permite apuntar a un servidor local)."""
+    base = os.getenv("SERPER_BASE_URL", "https://google.serper.dev").rstrip("/")
+    return f"{base}/{endpoint}"
+
+# ==================== CACHÉ Y FORMATO DE RESULTADOS ====================
+
+def _obtener_cache(usar_cache: bool = True):
+    """Devuelve la caché de búsquedas, o None si está desactivada o no se puede abrir."""
+    if not usar_cache or cache_desactivada():
+        return None
+    try:
+        return obtener_cache_busquedas()
+    except Exception as e:
+        print(f"[WARNING] No se pudo abrir la caché de búsquedas: {e}")
+        return None
+
+
+def _formatear_resultados_busqueda(query: str, search_results: dict) -> str:
+    """Convierte la respuesta JSON de Serper en el texto que recibe el agente."""
+    formatted_results = f"Resultados de la búsqueda para '{query}':\\n\\n"
+    
+    if 'knowledgeGraph' in search_results:
+        kg = search_results['knowledgeGraph']
+        formatted_results += f"**Información Destacada ({kg.get('title', '')}):**\\n"
+        if 'description' in kg:
+            formatted_results += f"{kg['description']}\\n"
+        if 'attributes' in kg:
+            for attr, value in kg['attributes'].items():
+                formatted_results += f"- {attr.capitalize()}: {value}\\n"
+        formatted_results += "\\n"
+
+    if 'organic' in search_results:
+        for item in search_results['organic'][:5]: # Limitar a los primeros 5 resultados
+            formatted_results += f"**Título:** {item.get('title', 'N/A')}\\n"
+            formatted_results += f"**Enlace:** {item.get('link', 'N/A')}\\n"
+            formatted_results += f"**Snippet:** {item.get('snippet', 'N/A')}\\n\\n" # Corrected this line
+    
+    if not formatted_results.strip() or formatted_results == f"Resultados de la búsqueda para '{query}':\\n\\n":
+        return "No se encontraron resultados relevantes."
+        
+    return formatted_results
+
 # ==================== FUNCIÓN BASE (para testing) ====================
 
-def _buscar_web_base(query: str) -> str:
-    """Función base para buscar en la web (sin decorador @tool)"""
+def _buscar_web_base(query: str, usar_cache: bool = True) -> str:
+    """Función base para buscar en la web (sin decorador @tool).
+    Con usar_cache=False se ignora la caché persistente de resultados."""
     try:
         # Importar dependencias necesarias
         try:
             import requests
+            from utils.http_client import obtener_cliente_http
         except ImportError as e:
             print(f"Error: Falta instalar dependencias: {e}")
             print("Instala con: pip install requests")
             return ""
         
+        # Consultar primero la caché persistente
+        cache = _obtener_cache(usar_cache)
+        if cache:
+            try:
+                search_results = cache.obtener(query, SERPER_GL, SERPER_HL)
+            except Exception as e:
+                print(f"[WARNING] Error leyendo la caché de búsquedas: {e}")
+                search_results = None
+            if search_results is not None:
+                print(f"Resultados de búsqueda servidos desde caché para: {query}")
+                return _formatear_resultados_busqueda(query, search_results)
+
         # API Key de Serper (obtenida de variable de entorno)
         SERPER_API_KEY = os.getenv("SERPER_API_KEY")
         
@@ -51,11 +115,11 @@ def _buscar_web_base(query: str) -> str:
                 st.error("Configuración incompleta: SERPER_API_KEY no encontrada. Revisa tu archivo .env y reinicia la aplicación.")
             return error_message # Devuelve el error para que CrewAI lo maneje
             
-        url = "https://google.serper.dev/search"
+        url = _url_serper("search")
         payload = {
             "q": query,
-            "gl": "es", # Código de país para España (resultados en español)
-            "hl": "es"  # Código de idioma para español
+            "gl": SERPER_GL,
+            "hl": SERPER_HL
         }
         headers = {
             'X-API-KEY': SERPER_API_KEY,
@@ -63,35 +127,19 @@ def _buscar_web_base(query: str) -> str:
         }
         
         print(f"Realizando búsqueda web para: {query}")
-        response = requests.post(url, headers=headers, json=payload, timeout=10)
+        response = obtener_cliente_http().post(url, headers=headers, json=payload, timeout=10)
         response.raise_for_status() # Lanza excepción para errores HTTP
         
         search_results = response.json()
         print(f"Resultados de búsqueda recibidos (estado: {response.status_code})")
+
+        if cache:
+            try:
+                cache.guardar(query, search_results, SERPER_GL, SERPER_HL)
+            except Exception as e:
+                print(f"[WARNING] Error guardando en la caché de búsquedas: {e}")
         
-        # Procesar y formatear resultados
-        formatted_results = f"Resultados de la búsqueda para '{query}':\\n\\n"
-        
-        if 'knowledgeGraph' in search_results:
-            kg = search_results['knowledgeGraph']
-            formatted_results += f"**Información Destacada ({kg.get('title', '')}):**\\n"
-            if 'description' in kg:
-                formatted_results += f"{kg['description']}\\n"
-            if 'attributes' in kg:
-                for attr, value in kg['attributes'].items():
-                    formatted_results += f"- {attr.capitalize()}: {value}\\n"
-            formatted_results += "\\n"
-
-        if 'organic' in search_results:
-            for item in search_results['organic'][:5]: # Limitar a los primeros 5 resultados
-                formatted_results += f"**Título:** {item.get('title', 'N/A')}\\n"
-                formatted_results += f"**Enlace:** {item.get('link', 'N/A')}\\n"
-                formatted_results += f"**Snippet:** {item.get('snippet', 'N/A')}\\n\\n" # Corrected this line
-        
-        if not formatted_results.strip() or formatted_results == f"Resultados de la búsqueda para '{query}':\\n\\n":
-            return "No se encontraron resultados relevantes."
-            
-        return formatted_results
+        return _formatear_resultados_busqueda(query, search_results)
 
     except requests.exceptions.HTTPError as http_err:
         # Intentar obtener más detalles del error desde la respuesta
@@ -107,6 +155,83 @@ def _buscar_web_base(query: str) -> str:
         traceback.print_exc()
         return f"Error inesperado al buscar: {str(e)}"
 
+# ==================== BÚSQUEDA EN LOTE (prefetch) ====================
+
+# Serper acepta hasta 100 consultas por petición en lote
+MAX_CONSULTAS_POR_LOTE = 100
+
+
+def _buscar_web_lote_base(queries: list[str], usar_cache: bool = True) -> dict[str, str]:
+    """
+    Busca varias consultas a la vez. Las que no están en caché se envían a Serper en una
+    única petición con un array de consultas, y cada respuesta se guarda en la caché para
+    que las llamadas posteriores a buscar_web con la misma consulta se sirvan en local.
+
+    Returns:
+        dict consulta -> resultados formateados (las consultas que fallan no aparecen).
+    """
+    resultados: dict[str, str] = {}
+    pendientes: list[str] = []
+    cache = _obtener_cache(usar_cache)
+
+    for query in dict.fromkeys(queries):  # sin duplicados, conservando el orden
+        search_results = None
+        if cache:
+            try:
+                search_results = cache.obtener(query, SERPER_GL, SERPER_HL)
+            except Exception as e:
+                print(f"[WARNING] Error leyendo la caché de búsquedas: {e}")
+        if search_results is not None:
+            resultados[query] = _formatear_resultados_busqueda(query, search_results)
+        else:
+            pendientes.append(query)
+
+    if not pendientes:
+        print(f"Prefetch: {len(resultados)} consultas servidas desde caché")
+        return resultados
+
+    try:
+        import requests
+        from utils.http_client import obtener_cliente_http
+    except ImportError as e:
+        print(f"Error: Falta instalar dependencias: {e}")
+        return resultados
+
+    SERPER_API_KEY = os.getenv("SERPER_API_KEY")
+    if not SERPER_API_KEY:
+        print("Error: La variable de entorno SERPER_API_KEY no está configurada, se omite el prefetch.")
+        return resultados
+
+    url = _url_serper("search")
+    headers = {
+        'X-API-KEY': SERPER_API_KEY,
+        'Content-Type': 'application/json'
+    }
+    for inicio in range(0, len(pendientes), MAX_CONSULTAS_POR_LOTE):
+        lote = pendientes[inicio:inicio + MAX_CONSULTAS_POR_LOTE]
+        payload = [{"q": query, "gl": SERPER_GL, "hl": SERPER_HL} for query in lote]
+        try:
+            print(f"Realizando búsqueda en lote de {len(lote)} consultas")
+            response = obtener_cliente_http().post(url, headers=headers, json=payload, timeout=30)
+            response.raise_for_status()
+            respuestas = response.json()
+        except Exception as e:
+            print(f"Error en la búsqueda en lote: {e}")
+            continue
+
+        if isinstance(respuestas, dict):
+            respuestas = [respuestas]
+        for query, search_results in zip(lote, respuestas):
+            if cache:
+                try:
+                    cache.guardar(query, search_results, SERPER_GL, SERPER_HL)
+                except Exception as e:
+                    print(f"[WARNING] Error guardando en la caché de búsquedas: {e}")
+            resultados[query] = _formatear_resultados_busqueda(query, search_results)
+
+    print(f"Prefetch: {len(resultados)}/{len(queries)} consultas con resultados")
+    return resultados
+
 # ==================== HERRAMIENTA PARA AGENTES ====================
 
 @tool("buscar_web")
@@ -123,12 +248,13 @@ def buscar_web(query: str) -> str:
 
 # ==================== FUNCIÓN BASE IMAGEN (para testing) ====================
 
-def _buscar_imagen_base(topic: str) -> str:
-    """Función base para buscar y descargar imagen (sin decorador @tool)"""
+def _buscar_imagen_base(topic: str, directorio: str = "temp") -> str:
+    """Función base para buscar y descargar imagen en `directorio` (sin decorador @tool)"""
     try:
         # Importar dependencias necesarias
         try:
             import requests
+            from utils.http_client import obtener_cliente_http
         except ImportError as e:
             print(f"Error: Falta instalar dependencias: {e}")
             print("Instala con: pip install requests")
@@ -144,7 +270,7 @@ def _buscar_imagen_base(topic: str) -> str:
                 st.error("Configuración incompleta: SERPER_API_KEY no encontrada para búsqueda de imágenes. Revisa tu archivo .env y reinicia.")
             return error_message # Devuelve el error para que CrewAI lo maneje
 
-        url = "https://google.serper.dev/images"
+        url = _url_serper("images")
         payload = {
             "q": f"{topic} high quality",
             "gl": "es",
@@ -156,7 +282,7 @@ def _buscar_imagen_base(topic: str) -> str:
         }
         
         print(f"Buscando imagen para: {topic}")
-        response = requests.post(url, headers=headers, json=payload, timeout=15)
+        response = obtener_cliente_http().post(url, headers=headers, json=payload, timeout=15)
         response.raise_for_status()
         
         image_results = response.json()
@@ -171,7 +297,7 @@ def _buscar_imagen_base(topic: str) -> str:
                 
                 try:
                     print(f"Descargando imagen desde: {image_url}")
-                    img_response = requests.get(image_url, timeout=10, stream=True)
+                    img_response = obtener_cliente_http().get(image_url, timeout=10, stream=True)
                     img_response.raise_for_status()
                     
                     # Determinar extensión y nombre de archivo
@@ -192,16 +318,16 @@ def _buscar_imagen_base(topic: str) -> str:
                             ext = '.jpg' # Por defecto
                             print(f"No se pudo determinar la extensión de la imagen desde Content-Type o URL, usando {ext}")
                     
-                    # Crear directorio temp si no existe
-                    if not os.path.exists("temp"):
-                        os.makedirs("temp")
-                        print("Directorio 'temp' creado.")
+                    # Crear directorio de trabajo si no existe
+                    if not os.path.exists(directorio):
+                        os.makedirs(directorio)
+                        print(f"Directorio '{directorio}' creado.")
                     
-                    image_path = os.path.join("temp", f"temp_image{ext}")
+                    image_path = os.path.join(directorio, f"temp_image{ext}")
                     
                     # Eliminar imagen anterior si existe con otra extensión
                     for old_ext in ['.jpg', '.png', '.jpeg', '.gif']:
-                        old_file = os.path.join("temp", f"temp_image{old_ext}")
+                        old_file = os.path.join(directorio, f"temp_image{old_ext}")
                         if os.path.exists(old_file) and old_file != image_path:
                             try:
                                 os.remove(old_file)
@@ -5,54 +5,177 @@ import os
 import codecs
 import re
 
-def fix_markdown_encoding():
+# ==================== REPARACIÓN DE CARACTERES ====================
+
+# Caracteres habituales en el texto generado. Su UTF-8 leído como cp1252 (o latin-1) da una
+# secuencia de dos o tres caracteres ('Ã©', 'Â«', 'â€™'...) que no aparece en texto correcto.
+_CARACTERES_FRECUENTES = [chr(c) for c in range(0xA0, 0x100)] + list("–—‘’‚“”„†‡•…‰‹›€™�")
+
+
+def _leer_como_cp1252(datos: bytes) -> str:
+    """Lectura byte a byte como cp1252; los bytes que cp1252 no define, como latin-1."""
+    caracteres = []
+    for byte in datos:
+        try:
+            caracteres.append(bytes([byte]).decode('cp1252'))
+        except UnicodeDecodeError:
+            caracteres.append(chr(byte))
+    return "".join(caracteres)
+
+
+# Secuencias de UTF-8 leído como latin-1/cp1252 (mojibake) y su carácter correcto. Solo
+# secuencias de varios caracteres: se aplican siempre, también al texto ya bien codificado.
+REEMPLAZOS_MOJIBAKE = {_leer_como_cp1252(c.encode('utf-8')): c for c in _CARACTERES_FRECUENTES}
+# Restos de '”' cuando el último byte se perdió por el camino
+REEMPLAZOS_MOJIBAKE['â€'] = '"'
+
+# Caracteres sueltos de la tabla original. 'â', 'Â' y '�' también son texto correcto
+# ("château", "Câmara"), así que solo se tocan si el texto entero resulta ser UTF-8 mal leído.
+REEMPLAZOS_AMBIGUOS = {'â': '"', 'Â': '', '�': ''}
+_REEMPLAZOS_TODOS = {**REEMPLAZOS_MOJIBAKE, **REEMPLAZOS_AMBIGUOS}
+
+
+def _alternativas(secuencias) -> str:
+    """Alternancia agrupada por el primer carácter, con las secuencias más largas primero."""
+    por_inicial = {}
+    for secuencia in sorted(secuencias, key=len, reverse=True):
+        por_inicial.setdefault(secuencia[0], []).append(re.escape(secuencia[1:]))
+    return "|".join(
+        f"{re.escape(inicial)}(?:{'|'.join(restos)})" for inicial, restos in por_inicial.items()
+    )
+
+
+# Una sola expresión con todas las secuencias ('â€™' antes que 'â€' y 'â'). El grupo hace que
+# split() devuelva las secuencias encontradas en las posiciones impares.
+_PATRON_MOJIBAKE = re.compile(f"({_alternativas(REEMPLAZOS_MOJIBAKE)})")
+_PATRON_TODOS = re.compile(f"({_alternativas(_REEMPLAZOS_TODOS)})")
+# Finales de fragmento que pueden ser el comienzo de una secuencia partida entre dos fragmentos
+_PREFIJOS_MOJIBAKE = {s[:i] for s in _REEMPLAZOS_TODOS for i in range(1, len(s))}
+_LONGITUD_MAXIMA = max(len(s) for s in _REEMPLAZOS_TODOS)
+# Todas las secuencias empiezan por uno de estos caracteres: si no aparece ninguno, no hay nada que hacer
+_PATRON_INICIO = re.compile("[" + re.escape("".join({s[0] for s in _REEMPLAZOS_TODOS})) + "]")
+
+
+# Al volver a codificar como cp1252, los caracteres de control que cp1252 no define
+# (U+0081, U+009D...) recuperan su byte original
+def _respaldo_c1(error):
+    fragmento = error.object[error.start:error.end]
+    if all(ord(c) < 0x100 for c in fragmento):
+        return fragmento.encode('latin-1'), error.end
+    raise error
+
+
+codecs.register_error('respaldo_c1', _respaldo_c1)
+
+
+def _mal_decodificado(texto: str) -> bool:
+    """True si el texto es UTF-8 leído como cp1252: deshacer esa lectura da UTF-8 válido y distinto."""
+    try:
+        return texto.encode('cp1252', errors='respaldo_c1').decode('utf-8') != texto
+    except UnicodeError:
+        return False
+
+
+def reparar_texto(texto: str) -> str:
+    """
+    Corrige el mojibake de un texto completo en una sola pasada. Los caracteres sueltos
+    ambiguos ('â', 'Â', '�') solo se corrigen si todo el texto está mal decodificado.
+    """
+    if not _PATRON_INICIO.search(texto):
+        return texto
+    if _mal_decodificado(texto):
+        patron, tabla = _PATRON_TODOS, _REEMPLAZOS_TODOS
+    else:
+        patron, tabla = _PATRON_MOJIBAKE, REEMPLAZOS_MOJIBAKE
+    partes = patron.split(texto)
+    partes[1::2] = map(tabla.__getitem__, partes[1::2])
+    return "".join(partes)
+
+
+class ReparadorCodificacion:
+    """
+    Corrige el mojibake de un texto que llega por fragmentos. Si un fragmento termina con el
+    principio de una secuencia (p. ej. 'â€'), esos caracteres se guardan hasta el siguiente
+    fragmento para no cortar la secuencia por la mitad.
+    """
+
+    def __init__(self):
+        self._pendiente = ""
+
+    def procesar(self, fragmento: str) -> str:
+        """Devuelve el texto corregido que ya es definitivo."""
+        texto = self._pendiente + fragmento
+        corte = len(texto)
+        for n in range(min(_LONGITUD_MAXIMA - 1, len(texto)), 0, -1):
+            if texto[-n:] in _PREFIJOS_MOJIBAKE:
+                corte = len(texto) - n
+                break
+        self._pendiente = texto[corte:]
+        return reparar_texto(texto[:corte])
+
+    def finalizar(self) -> str:
+        """Devuelve lo que quedaba pendiente al terminar la entrada."""
+        texto, self._pendiente = self._pendiente, ""
+        return reparar_texto(texto)
+
+
+# Los bytes que no son UTF-8 válido se leen como latin-1 en lugar de perderse
+def _respaldo_latin1(error):
+    return error.object[error.start:error.end].decode('latin-1'), error.end
+
+
+codecs.register_error('respaldo_latin1', _respaldo_latin1)
+
+
+# ==================== LIMPIEZA DEL MARKDOWN ====================
+
+_PATRON_COMENTARIOS_HTML = re.compile(r'<!--.*?-->\s*', flags=re.DOTALL)
+_PATRON_RESIDUOS_FINAL = re.compile(r'[”"}]+\s*$', flags=re.MULTILINE)
+_PATRON_LINEAS_VACIAS = re.compile(r'\n{3,}')
+
+TAMANO_FRAGMENTO = 1 << 20
+
+
+def fix_markdown_encoding(file_path: str = "temp/temp_markdown.md"):
     """Corrige la codificación y limpia el archivo markdown"""
-    file_path = "temp/temp_markdown.md"
-    
+
     if not os.path.exists(file_path):
         return "Archivo no encontrado"
-    
-    # Leer el archivo como bytes
+
+    # Leer por fragmentos, decodificar como UTF-8 (latin-1 si un byte no es válido) y corregir
+    # el mojibake de cada fragmento al vuelo. Los caracteres bien codificados no se tocan.
+    decodificador = codecs.getincrementaldecoder('utf-8-sig')(errors='respaldo_latin1')
+    reparador = ReparadorCodificacion()
+    partes = []
     with open(file_path, 'rb') as f:
-        content_bytes = f.read()
-    
-    # Decodificar como latin-1
-    content = content_bytes.decode('latin-1')
-    
-    # Reemplazos de caracteres mal codificados
-    replacements = {
-        'Ã¡': 'á', 'Ã©': 'é', 'Ã­': 'í', 'Ã³': 'ó', 'Ãº': 'ú',
-        'Ã±': 'ñ', 'Ã': 'Á', 'Ã‰': 'É', 'Ã': 'Í', 'Ã“': 'Ó',
-        'Ãš': 'Ú', 'Ã‘': 'Ñ', 'Ã¼': 'ü', 'Ã§': 'ç',
-        'â€™': '’', 'â€œ': '“', 'â€': '”', 'â€“': '–', 'â€”': '—',
-        'â€˜': '‘', 'â€¢': '•', 'â€¦': '…', 'â€': '"', 'â': '"',
-        'Âº': 'º', 'Â': '', '�': ''
-    }
-    for wrong, correct in replacements.items():
-        content = content.replace(wrong, correct)
-    
+        for bloque in iter(lambda: f.read(TAMANO_FRAGMENTO), b''):
+            partes.append(reparador.procesar(decodificador.decode(bloque)))
+    partes.append(reparador.procesar(decodificador.decode(b'', final=True)))
+    partes.append(reparador.finalizar())
+    content = "".join(partes)
+
     # Eliminar comentarios HTML tipo <!-- ... -->
-    content = re.sub(r'<!--.*?-->\s*', '', content, flags=re.DOTALL)
-    
+    content = _PATRON_COMENTARIOS_HTML.sub('', content)
+
     # Eliminar residuos como ”} o "} al final de línea o párrafo
-    content = re.sub(r'[”"}]+\s*$', '', content, flags=re.MULTILINE)
-    
+    content = _PATRON_RESIDUOS_FINAL.sub('', content)
+
     # Eliminar líneas vacías múltiples
-    content = re.sub(r'\n{3,}', '\n\n', content)
-    
+    content = _PATRON_LINEAS_VACIAS.sub('\n\n', content)
+
     # Strip general
     content = content.strip() + '\n'
-    
+
     # Backup
     backup_path = f"{file_path}.backup"
-    os.rename(file_path, backup_path)
-    
+    os.replace(file_path, backup_path)
+
     # Guardar limpio en UTF-8
     with codecs.open(file_path, 'w', encoding='utf-8-sig') as f:
         f.write(content)
-    
+
     return f"✅ Archivo corregido, limpio y guardado en UTF-8. Backup en {backup_path}"
 
 if __name__ == "__main__":
     result = fix_markdown_encoding()
-    print(result)
\ No newline at end of file
+    print(result)
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# proyecto_crewai/utils/http_client.py
+
+"""
+Cliente HTTP compartido para las herramientas de búsqueda.
+
+Una única requests.Session con pool de conexiones por host (keep-alive), así que las
+llamadas sucesivas a Serper o a un mismo servidor de imágenes reutilizan la conexión TCP/TLS.
+Reintenta con backoff exponencial con jitter ante errores de red, 429 y 5xx, y guarda la
+latencia y los bytes de cada petición por host para calcular p50/p95. Cada intento se suma
+además a la etapa activa de utils/metrics.py (peticiones, bytes, reintentos y tiempo).
+
+Variables de entorno:
+    HTTP_POOL_HOSTS        número de hosts con pool propio (por defecto 10)
+    HTTP_POOL_SIZE         conexiones por host (por defecto 10)
+    HTTP_MAX_REINTENTOS    reintentos ante 429/5xx/errores de red (por defecto 3)
+"""
+
+import os
+import sys
+import time
+import random
+import threading
+from collections import defaultdict, deque
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.metrics import registrar
+
+CODIGOS_REINTENTABLES = {429, 500, 502, 503, 504}
+MUESTRAS_LATENCIA_POR_HOST = 1000
+
+
+def _percentil(valores: list[float], p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[indice]
+
+
+class ClienteHTTP:
+    """Sesión HTTP con pool de conexiones, reintentos con backoff y métricas de latencia."""
+
+    def __init__(self, pool_hosts: int = 10, pool_size: int = 10, max_reintentos: int = 3,
+                 backoff_base: float = 0.5, backoff_max: float = 8.0):
+        self.max_reintentos = max_reintentos
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._session = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_size, max_retries=0)
+        self._session.mount("http://", adaptador)
+        self._session.mount("https://", adaptador)
+        self._lock = threading.Lock()
+        self._latencias = defaultdict(lambda: deque(maxlen=MUESTRAS_LATENCIA_POR_HOST))
+        self._peticiones = defaultdict(int)
+        self._reintentos = defaultdict(int)
+        self._errores = defaultdict(int)
+        self._bytes = defaultdict(int)
+
+    def _espera_backoff(self, intento: int, respuesta=None) -> float:
+        """Backoff exponencial con jitter completo; respeta Retry-After si viene en la respuesta."""
+        if respuesta is not None:
+            retry_after = respuesta.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                return min(self.backoff_max, float(retry_after))
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** intento))
+
+    @staticmethod
+    def _bytes_transferidos(respuesta: requests.Response, stream: bool) -> int:
+        """Cuerpo enviado más cuerpo recibido. En streaming el cuerpo aún no se ha leído: Content-Length."""
+        cuerpo = respuesta.request.body if respuesta.request is not None else None
+        enviados = len(cuerpo) if isinstance(cuerpo, (bytes, str)) else 0
+        if stream:
+            longitud = respuesta.headers.get("Content-Length", "")
+            return enviados + (int(longitud) if longitud.isdigit() else 0)
+        return enviados + len(respuesta.content)
+
+    def _registrar(self, host: str, segundos: float, error: bool = False, reintento: bool = False,
+                   num_bytes: int = 0):
+        with self._lock:
+            self._latencias[host].append(segundos)
+            self._peticiones[host] += 1
+            self._bytes[host] += num_bytes
+            if error:
+                self._errores[host] += 1
+            if reintento:
+                self._reintentos[host] += 1
+        registrar(peticiones_http=1, bytes_http=num_bytes, segundos_http=segundos,
+                  reintentos_http=1 if reintento else 0)
+
+    def request(self, metodo: str, url: str, **kwargs) -> requests.Response:
+        """Igual que requests.request, con pool de conexiones y reintentos."""
+        kwargs.setdefault("timeout", 10)
+        host = urlparse(url).netloc
+        for intento in range(self.max_reintentos + 1):
+            ultimo = intento == self.max_reintentos
+            inicio = time.perf_counter()
+            try:
+                respuesta = self._session.request(metodo, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                self._registrar(host, time.perf_counter() - inicio, error=True, reintento=not ultimo)
+                if ultimo:
+                    raise
+                time.sleep(self._espera_backoff(intento))
+                continue
+
+            reintentable = respuesta.status_code in CODIGOS_REINTENTABLES
+            self._registrar(host, time.perf_counter() - inicio, error=reintentable,
+                            reintento=reintentable and not ultimo,
+                            num_bytes=self._bytes_transferidos(respuesta, kwargs.get("stream", False)))
+            if reintentable and not ultimo:
+                espera = self._espera_backoff(intento, respuesta)
+                print(f"[WARNING] {host} respondió {respuesta.status_code}, reintentando en {espera:.1f}s")
+                respuesta.close()
+                time.sleep(espera)
+                continue
+            return respuesta
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def metricas(self) -> dict:
+        """Latencias p50/p95 (ms), peticiones, bytes, reintentos y errores por host."""
+        with self._lock:
+            return {
+                host: {
+                    "peticiones": self._peticiones[host],
+                    "reintentos": self._reintentos[host],
+                    "errores": self._errores[host],
+                    "bytes": self._bytes[host],
+                    "p50_ms": round(_percentil(list(latencias), 50) * 1000, 2),
+                    "p95_ms": round(_percentil(list(latencias), 95) * 1000, 2),
+                }
+                for host, latencias in self._latencias.items()
+            }
+
+
+# ==================== INSTANCIA GLOBAL ====================
+
+_cliente_global: ClienteHTTP = None
+_lock_global = threading.Lock()
+
+
+def obtener_cliente_http() -> ClienteHTTP:
+    """Devuelve el cliente HTTP compartido por todo el proceso."""
+    global _cliente_global
+    with _lock_global:
+        if _cliente_global is None:
+            _cliente_global = ClienteHTTP(
+                pool_hosts=int(os.getenv("HTTP_POOL_HOSTS", "10")),
+                pool_size=int(os.getenv("HTTP_POOL_SIZE", "10")),
+                max_reintentos=int(os.getenv("HTTP_MAX_REINTENTOS", "3")),
+            )
+        return _cliente_global
+
+
+def main():
+    """
+    Compara requests.get sin pool con ClienteHTTP contra un servidor local con keep-alive.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class _Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            cuerpo = b'{"ok": true}'
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{servidor.server_address[1]}/"
+    n = 300
+
+    latencias_sin_pool = []
+    for _ in range(n):
+        inicio = time.perf_counter()
+        requests.get(url, timeout=5).json()
+        latencias_sin_pool.append(time.perf_counter() - inicio)
+
+    cliente = ClienteHTTP()
+    for _ in range(n):
+        cliente.get(url).json()
+    con_pool = next(iter(cliente.metricas().values()))
+
+    print(f"Sin pool: p50={_percentil(latencias_sin_pool, 50) * 1000:.2f} ms "
+          f"p95={_percentil(latencias_sin_pool, 95) * 1000:.2f} ms")
+    print(f"Con pool: p50={con_pool['p50_ms']:.2f} ms p95={con_pool['p95_ms']:.2f} ms")
+    servidor.shutdown()
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# proyecto_crewai/utils/jobs.py
+
+"""
+Ejecución de generaciones en segundo plano.
+
+La interfaz de Streamlit encola un trabajo y recibe un id; un pool de hilos ejecuta el flujo
+y el estado de cada trabajo se guarda en jobs/<id>.json. Así la UI no bloquea su hilo durante
+la generación, se pueden procesar varios temas a la vez y, tras recargar el navegador, basta
+con el id para volver a consultar el trabajo.
+
+Variables de entorno:
+    MAX_TRABAJOS_PARALELO  generaciones simultáneas (por defecto 2)
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.pdf_render import ruta_vista_previa
+
+DIRECTORIO_TRABAJOS = "jobs"
+
+ESTADO_EN_COLA = "en_cola"
+ESTADO_EN_EJECUCION = "en_ejecucion"
+ESTADO_COMPLETADO = "completado"
+ESTADO_ERROR = "error"
+ESTADO_INTERRUMPIDO = "interrumpido"
+ESTADOS_ACTIVOS = (ESTADO_EN_COLA, ESTADO_EN_EJECUCION)
+
+
+class GestorTrabajos:
+    """Pool de hilos que ejecuta DocumentoFlowCompleto y persiste el estado de cada trabajo."""
+
+    def __init__(self, directorio: str = DIRECTORIO_TRABAJOS, max_paralelo: int = 2):
+        self.directorio = directorio
+        os.makedirs(directorio, exist_ok=True)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_paralelo, thread_name_prefix="trabajo")
+        self._marcar_interrumpidos()
+
+    # ---------- Persistencia ----------
+
+    def _ruta(self, trabajo_id: str) -> str:
+        return os.path.join(self.directorio, f"{trabajo_id}.json")
+
+    def _guardar(self, trabajo: dict):
+        """Escritura atómica del estado de un trabajo."""
+        ruta = self._ruta(trabajo["id"])
+        temporal = f"{ruta}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(trabajo, f, ensure_ascii=False, indent=2)
+        os.replace(temporal, ruta)
+
+    def _actualizar(self, trabajo_id: str, **cambios) -> dict:
+        with self._lock:
+            trabajo = self.estado(trabajo_id) or {"id": trabajo_id}
+            trabajo.update(cambios)
+            self._guardar(trabajo)
+            return trabajo
+
+    def _marcar_interrumpidos(self):
+        """Los trabajos activos de un proceso anterior ya no se están ejecutando."""
+        for trabajo in self.listar(limite=None):
+            if trabajo.get("estado") in ESTADOS_ACTIVOS:
+                trabajo["estado"] = ESTADO_INTERRUMPIDO
+                trabajo["error"] = "El servidor se reinició mientras el trabajo estaba en curso."
+                self._guardar(trabajo)
+
+    # ---------- API pública ----------
+
+    def enviar(self, topic: str, gemini_api_key: str = "", max_rpm: int = 10,
+               max_secciones_paralelo: int = 1, backend_pdf: str = "alta_calidad",
+               generar_pdf: bool = True) -> str:
+        """Encola la generación de un documento y devuelve el id del trabajo."""
+        trabajo_id = uuid.uuid4().hex[:12]
+        # La API key no se persiste: solo viaja en memoria hasta el hilo que ejecuta el flujo
+        self._actualizar(
+            trabajo_id,
+            topic=topic,
+            max_rpm=max_rpm,
+            max_secciones_paralelo=max_secciones_paralelo,
+            backend_pdf=backend_pdf,
+            generar_pdf=generar_pdf,
+            estado=ESTADO_EN_COLA,
+            creado=time.time(),
+            iniciado=None,
+            finalizado=None,
+            pdf="",
+            # El flujo la reescribe tras cada sección; la UI la muestra mientras tanto
+            vista_previa=ruta_vista_previa(trabajo_id),
+            error="",
+            secciones_fallidas=[],
+        )
+        self._executor.submit(
+            self._ejecutar, trabajo_id, topic, gemini_api_key, max_rpm, max_secciones_paralelo, backend_pdf,
+            generar_pdf
+        )
+        return trabajo_id
+
+    def estado(self, trabajo_id: str) -> dict:
+        """Estado persistido de un trabajo, o {} si no existe."""
+        try:
+            with open(self._ruta(trabajo_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def listar(self, limite: int = 20) -> list[dict]:
+        """Trabajos conocidos, del más reciente al más antiguo."""
+        trabajos = []
+        for nombre in os.listdir(self.directorio):
+            if nombre.endswith(".json"):
+                trabajo = self.estado(nombre[:-5])
+                if trabajo:
+                    trabajos.append(trabajo)
+        trabajos.sort(key=lambda t: t.get("creado") or 0, reverse=True)
+        return trabajos if limite is None else trabajos[:limite]
+
+    # ---------- Ejecución ----------
+
+    def _ejecutar(self, trabajo_id: str, topic: str, gemini_api_key: str, max_rpm: int,
+                  max_secciones_paralelo: int, backend_pdf: str, generar_pdf: bool):
+        from flows.documento_flow import DocumentoFlowCompleto
+
+        self._actualizar(trabajo_id, estado=ESTADO_EN_EJECUCION, iniciado=time.time())
+        try:
+            inputs = {
+                "topic": topic,
+                "gemini_api_key": gemini_api_key,
+                "max_rpm": max_rpm,
+                "max_secciones_paralelo": max_secciones_paralelo,
+                "backend_pdf": backend_pdf,
+                "generar_pdf": generar_pdf,
+                "run_id": trabajo_id,
+            }
+            flow = DocumentoFlowCompleto()
+            flow.kickoff(inputs=inputs)
+
+            # El documento se entrega igualmente, pero la UI avisa de las secciones incompletas
+            if flow.state.secciones_fallidas:
+                self._actualizar(trabajo_id, secciones_fallidas=list(flow.state.secciones_fallidas))
+            pdf = flow.state.pdf_final
+            if pdf and os.path.exists(pdf):
+                self._actualizar(trabajo_id, estado=ESTADO_COMPLETADO, pdf=pdf, finalizado=time.time())
+            elif not generar_pdf and os.path.exists(flow.state.vista_previa):
+                self._actualizar(trabajo_id, estado=ESTADO_COMPLETADO, finalizado=time.time())
+            else:
+                self._actualizar(trabajo_id, estado=ESTADO_ERROR, finalizado=time.time(),
+                                 error="El flujo terminó sin generar el PDF.")
+        except Exception as e:
+            traceback.print_exc()
+            self._actualizar(trabajo_id, estado=ESTADO_ERROR, finalizado=time.time(),
+                             error=f"Error ejecutando el flujo: {e}")
+
+
+# ==================== INSTANCIA GLOBAL ====================
+
+_gestor_global: GestorTrabajos = None
+_lock_global = threading.Lock()
+
+
+def obtener_gestor_trabajos() -> GestorTrabajos:
+    """Devuelve el gestor de trabajos del proceso (compartido por todas las sesiones)."""
+    global _gestor_global
+    with _lock_global:
+        if _gestor_global is None:
+            _gestor_global = GestorTrabajos(
+                max_paralelo=int(os.getenv("MAX_TRABAJOS_PARALELO", "2"))
+            )
+        return _gestor_global
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# proyecto_crewai/utils/llm_cache.py
+
+"""
+Caché de respuestas exactas del LLM.
+
+La clave es el hash de (modelo, mensajes, parámetros de generación). En modo lectura, al
+repetir un tema (p. ej. tras un fallo al generar el PDF) las llamadas de estructurador,
+buscador y escritor se sirven desde disco. Las herramientas se siguen ejecutando, porque lo
+que se guarda es el texto del LLM (incluidas sus "Action:"), no el efecto de las herramientas.
+
+Modos (LLM_CACHE_MODE):
+    "desactivado"  no usa la caché (por defecto)
+    "grabacion"    llama siempre al LLM y guarda la respuesta
+    "lectura"      lee de la caché y guarda lo que falte
+
+La lectura hay que pedirla: con ella, volver a generar el mismo tema con los mismos prompts
+devuelve el mismo documento sin llamar al LLM, y quien regenera suele esperar uno nuevo.
+
+Otras variables de entorno:
+    LLM_CACHE_DB      ruta del fichero SQLite (por defecto cache/llm.sqlite3)
+    LLM_CACHE_MAX_MB  tamaño máximo de las respuestas guardadas (por defecto 200)
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODO_LECTURA = "lectura"
+MODO_GRABACION = "grabacion"
+MODO_DESACTIVADO = "desactivado"
+MODOS_VALIDOS = (MODO_LECTURA, MODO_GRABACION, MODO_DESACTIVADO)
+
+# Atributos del LLM que cambian la respuesta y forman parte de la clave
+PARAMETROS_CLAVE = ("model", "temperature", "top_p", "max_tokens", "max_completion_tokens", "stop", "seed")
+
+
+def clave_llamada(modelo_y_parametros: dict, messages, tools=None, response_model=None) -> str:
+    """Hash estable de una llamada al LLM."""
+    datos = {
+        "parametros": modelo_y_parametros,
+        "messages": messages,
+        "tools": tools,
+        "response_model": getattr(response_model, "__name__", response_model),
+    }
+    serializado = json.dumps(datos, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(serializado.encode("utf-8")).hexdigest()
+
+
+class CacheLLM:
+    """Caché SQLite de respuestas del LLM con expulsión LRU por tamaño total."""
+
+    def __init__(self, ruta_db: str, max_bytes: int):
+        self.ruta_db = ruta_db
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        directorio = os.path.dirname(ruta_db)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        with self._conectar() as conexion:
+            conexion.execute(
+                "CREATE TABLE IF NOT EXISTS respuestas ("
+                "clave TEXT PRIMARY KEY, modelo TEXT, respuesta TEXT, bytes INTEGER, "
+                "creado REAL, accedido REAL)"
+            )
+            conexion.execute("CREATE INDEX IF NOT EXISTS idx_accedido ON respuestas (accedido)")
+
+    @contextmanager
+    def _conectar(self):
+        conexion = sqlite3.connect(self.ruta_db, timeout=30)
+        try:
+            with conexion:
+                yield conexion
+        finally:
+            conexion.close()
+
+    def obtener(self, clave: str):
+        """Devuelve la respuesta guardada o None."""
+        with self._conectar() as conexion:
+            fila = conexion.execute("SELECT respuesta FROM respuestas WHERE clave = ?", (clave,)).fetchone()
+            if fila:
+                conexion.execute("UPDATE respuestas SET accedido = ? WHERE clave = ?", (time.time(), clave))
+        with self._lock:
+            if fila:
+                self.aciertos += 1
+            else:
+                self.fallos += 1
+        return fila[0] if fila else None
+
+    def guardar(self, clave: str, modelo: str, respuesta: str):
+        """Guarda una respuesta y expulsa las menos usadas si se supera max_bytes."""
+        ahora = time.time()
+        tamano = len(respuesta.encode("utf-8"))
+        with self._conectar() as conexion:
+            conexion.execute(
+                "INSERT OR REPLACE INTO respuestas (clave, modelo, respuesta, bytes, creado, accedido) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (clave, modelo, respuesta, tamano, ahora, ahora),
+            )
+            total = conexion.execute("SELECT COALESCE(SUM(bytes), 0) FROM respuestas").fetchone()[0]
+            if total > self.max_bytes:
+                sobrante = total - self.max_bytes
+                for clave_vieja, bytes_viejos in conexion.execute(
+                    "SELECT clave, bytes FROM respuestas ORDER BY accedido ASC"
+                ).fetchall():
+                    if sobrante <= 0:
+                        break
+                    conexion.execute("DELETE FROM respuestas WHERE clave = ?", (clave_vieja,))
+                    sobrante -= bytes_viejos
+
+    def estadisticas(self) -> dict:
+        """Aciertos, fallos, entradas y bytes ocupados."""
+        with self._conectar() as conexion:
+            entradas, total_bytes = conexion.execute(
+                "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM respuestas"
+            ).fetchone()
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "tasa_aciertos": round(self.aciertos / consultas, 3) if consultas else 0.0,
+                "entradas": entradas,
+                "bytes": total_bytes,
+            }
+
+
+# ==================== INSTANCIA GLOBAL ====================
+
+_cache_global: CacheLLM = None
+_lock_global = threading.Lock()
+
+
+def modo_cache_llm() -> str:
+    """Modo configurado en LLM_CACHE_MODE (por defecto desactivado)."""
+    modo = os.getenv("LLM_CACHE_MODE", MODO_DESACTIVADO).lower()
+    if modo not in MODOS_VALIDOS:
+        print(f"[WARNING] LLM_CACHE_MODE='{modo}' no es válido, se usa '{MODO_DESACTIVADO}'")
+        return MODO_DESACTIVADO
+    return modo
+
+
+def obtener_cache_llm() -> CacheLLM:
+    """Devuelve la caché de respuestas del LLM del proceso, creándola si hace falta."""
+    global _cache_global
+    with _lock_global:
+        if _cache_global is None:
+            _cache_global = CacheLLM(
+                ruta_db=os.getenv("LLM_CACHE_DB", os.path.join("cache", "llm.sqlite3")),
+                max_bytes=int(float(os.getenv("LLM_CACHE_MAX_MB", "200")) * 1024 * 1024),
+            )
+        return _cache_global
@@ -3,13 +3,133 @@
 
 import sys
 import os
+import time
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from .llm_selector import seleccionar_llm
+from .metrics import registrar
+from .rate_limiter import LimitadorPeticiones, obtener_limitador, es_error_limite
+from .llm_cache import (
+    obtener_cache_llm, modo_cache_llm, clave_llamada, PARAMETROS_CLAVE,
+    MODO_LECTURA, MODO_DESACTIVADO
+)
 from crewai import LLM
-def crear_llm_crewai(gemini_api_key=None):
+
+# Reintentos ante 429/RESOURCE_EXHAUSTED (la pausa la decide el limitador compartido)
+MAX_REINTENTOS_LIMITE = 5
+
+
+def _llamada_con_limite(llamada, llm=None, limitador_ejecucion: LimitadorPeticiones = None):
+    """
+    Envuelve llm.call para que cada petición pase por el limitador de peticiones del proceso,
+    compartido por todos los Crews y flujos en ejecución. Si se indica limitador_ejecucion
+    (el max_rpm de una ejecución), la petición espera también su turno en él.
+    """
+    def call(*args, **kwargs):
+        limitador = obtener_limitador()
+        for intento in range(MAX_REINTENTOS_LIMITE + 1):
+            # Primero el tope de la ejecución: mientras espera no ocupa cola en el global
+            if limitador_ejecucion is not None:
+                limitador_ejecucion.adquirir()
+            limitador.adquirir()
+            try:
+                respuesta = llamada(*args, **kwargs)
+            except Exception as e:
+                if not es_error_limite(e) or intento == MAX_REINTENTOS_LIMITE:
+                    raise
+                pausa = limitador.notificar_limite()
+                registrar(reintentos_llm=1)
+                print(f"[WARNING] Límite de peticiones alcanzado, reintentando tras {pausa:.1f}s "
+                      f"(intento {intento + 1}/{MAX_REINTENTOS_LIMITE})")
+                continue
+            limitador.notificar_exito()
+            return respuesta
+    return call
+
+
+def _tokens_usados(llm) -> tuple[int, int]:
+    """Tokens de entrada y salida acumulados por la instancia (los cuenta CrewAI en cada llamada)."""
+    try:
+        uso = llm.get_token_usage_summary()
+        return uso.prompt_tokens, uso.completion_tokens
+    except Exception:
+        return 0, 0
+
+
+def _llamada_con_metricas(llamada, llm):
+    """
+    Envuelve llm.call para sumar a la etapa activa (utils/metrics.py) la llamada, su duración
+    y sus tokens. Cada agente tiene su propia instancia de LLM y hace una llamada cada vez,
+    así que la diferencia de los contadores de la instancia es la de esta llamada.
+    """
+    def call(*args, **kwargs):
+        entrada_antes, salida_antes = _tokens_usados(llm)
+        inicio = time.perf_counter()
+        try:
+            return llamada(*args, **kwargs)
+        finally:
+            entrada, salida = _tokens_usados(llm)
+            registrar(
+                llamadas_llm=1, segundos_llm=time.perf_counter() - inicio,
+                tokens_entrada=entrada - entrada_antes, tokens_salida=salida - salida_antes,
+            )
+    return call
+
+
+def _llamada_con_cache(llamada, llm, modo: str = MODO_LECTURA):
     """
-    Crea LLM optimizado para respuestas largas sin truncamiento usando Gemini API
+    Envuelve llm.call con la caché de respuestas exactas (clave: modelo, mensajes y parámetros).
+    En modo lectura un acierto no consume cuota del limitador.
+    """
+    parametros = {nombre: getattr(llm, nombre, None) for nombre in PARAMETROS_CLAVE}
+
+    def call(messages, *args, **kwargs):
+        # Con available_functions el LLM ejecuta las herramientas dentro de la llamada:
+        # servir la respuesta desde caché se saltaría ese efecto, así que no se cachea
+        if kwargs.get("available_functions"):
+            return llamada(messages, *args, **kwargs)
+
+        try:
+            cache = obtener_cache_llm()
+            clave = clave_llamada(
+                {**parametros, "stop": getattr(llm, "stop", None)},
+                messages,
+                kwargs.get("tools", args[0] if args else None),
+                kwargs.get("response_model"),
+            )
+        except Exception as e:
+            print(f"[WARNING] Caché del LLM no disponible: {e}")
+            return llamada(messages, *args, **kwargs)
+
+        if modo == MODO_LECTURA:
+            respuesta = cache.obtener(clave)
+            if respuesta is not None:
+                return respuesta
+
+        respuesta = llamada(messages, *args, **kwargs)
+        if isinstance(respuesta, str) and respuesta:
+            try:
+                cache.guardar(clave, str(parametros.get("model")), respuesta)
+            except Exception as e:
+                print(f"[WARNING] No se pudo guardar la respuesta en la caché del LLM: {e}")
+        return respuesta
+    return call
+
+
+def _envolver_call(llm, envoltorio, **opciones):
+    """
+    Sustituye llm.call solo en esta instancia. No se usa una subclase de LLM porque
+    LLM(...) puede devolver directamente la clase nativa del proveedor (p. ej. Gemini).
+    """
+    object.__setattr__(llm, "call", envoltorio(llm.call, llm, **opciones))
+
+
+def crear_llm_crewai(gemini_api_key=None, max_rpm=None, modo_cache=None, limitador=None):
+    """
+    Crea LLM optimizado para respuestas largas sin truncamiento usando Gemini API.
+    limitador es el tope de rpm de la ejecución, compartido por todos sus LLM; si solo se
+    indica max_rpm, el tope es propio de este LLM. El techo global (LLM_MAX_RPM) no cambia.
+    modo_cache ("lectura", "grabacion" o "desactivado") sustituye a LLM_CACHE_MODE.
     """
     import os
     
@@ -19,11 +139,27 @@ def crear_llm_crewai(gemini_api_key=None):
     if not api_key:
         raise ValueError("No se encontró GEMINI_API_KEY. Proporciona una API key o configúrala en el archivo .env")
     
+    if limitador is None and max_rpm:
+        limitador = LimitadorPeticiones(max_rpm)
+
+    # LLM_MODEL / LLM_BASE_URL permiten usar otro modelo o un servidor compatible (p. ej. benchmarks)
+    opciones_llm = {}
+    if os.getenv("LLM_BASE_URL"):
+        opciones_llm["base_url"] = os.getenv("LLM_BASE_URL")
+
     llm = LLM(
-        model=f"gemini/gemini-2.0-flash",
+        model=os.getenv("LLM_MODEL", "gemini/gemini-2.0-flash"),
         temperature=0.3,
-        api_key=api_key
+        api_key=api_key,
+        **opciones_llm
     )
+    # Las métricas van por dentro del limitador: miden la llamada al proveedor, no la espera
+    _envolver_call(llm, _llamada_con_metricas)
+    _envolver_call(llm, _llamada_con_limite, limitador_ejecucion=limitador)
+    # La caché va por fuera del limitador: un acierto no espera turno
+    modo_cache = modo_cache or modo_cache_llm()
+    if modo_cache != MODO_DESACTIVADO:
+        _envolver_call(llm, _llamada_con_cache, modo=modo_cache)
     return llm
 
     #CÓDIGO LEGACY PORQUE USABA MODELOS LOCALES CON OLLAMA PERO FUNCIONABAN MUY MAL, MEJOR GEMINI CON MAX_RPM
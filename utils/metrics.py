@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+# proyecto_crewai/utils/metrics.py
+
+"""
+Métricas por etapa y por sección de una ejecución del flujo.
+
+Cada ejecución tiene un MetricasEjecucion. El flujo abre una etapa (estructurador, buscador,
+escritor, portada, pdf...) con metricas.etapa(...) o, para un Crew con varias tareas, con
+metricas.secuencia(...) como task_callback del Crew. La etapa activa viaja en una ContextVar,
+que CrewAI copia a los hilos donde ejecuta las tareas. Así, el envoltorio de llm.call
+(utils/llm_provider.py) y el cliente HTTP (utils/http_client.py) solo tienen que llamar a
+registrar(...) para que sus llamadas, tokens, reintentos y bytes se sumen a la etapa y la
+sección correctas.
+
+Al terminar se guarda un informe JSON por ejecución (<run_id>.json, con todo el detalle por
+sección) y los totales por etapa se suman a unos contadores acumulados (acumulado.sqlite3,
+compartido por todos los trabajos y procesos). Con ellos se reescribe documento.prom, en
+formato de texto de Prometheus para el textfile collector de node_exporter: contadores
+monótonos etiquetados solo por etapa, así que el número de series no crece con las ejecuciones.
+
+Variables de entorno:
+    METRICS_DIR   directorio de los informes (por defecto output/metrics)
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Contadores que se suman por etapa y sección
+CONTADORES = (
+    "segundos", "llamadas_llm", "segundos_llm", "tokens_entrada", "tokens_salida", "reintentos_llm",
+    "peticiones_http", "bytes_http", "reintentos_http", "segundos_http",
+)
+
+# Nombre en Prometheus (contadores acumulados por etapa) y descripción de cada contador
+_METRICAS_PROMETHEUS = {
+    "segundos": ("documento_etapa_segundos_total", "Tiempo de reloj de la etapa"),
+    "llamadas_llm": ("documento_llm_llamadas_total", "Llamadas al proveedor del LLM"),
+    "segundos_llm": ("documento_llm_segundos_total", "Tiempo esperando respuestas del LLM"),
+    "tokens_entrada": ("documento_llm_tokens_entrada_total", "Tokens de entrada del LLM"),
+    "tokens_salida": ("documento_llm_tokens_salida_total", "Tokens de salida del LLM"),
+    "reintentos_llm": ("documento_llm_reintentos_total", "Reintentos del LLM por límite de peticiones"),
+    "peticiones_http": ("documento_http_peticiones_total", "Peticiones HTTP (Serper, imágenes)"),
+    "bytes_http": ("documento_http_bytes_total", "Bytes HTTP enviados y recibidos"),
+    "reintentos_http": ("documento_http_reintentos_total", "Reintentos HTTP ante 429/5xx/errores de red"),
+    "segundos_http": ("documento_http_segundos_total", "Tiempo esperando respuestas HTTP"),
+}
+
+_ambito_actual: ContextVar = ContextVar("ambito_metricas", default=None)
+
+
+class _Ambito:
+    """Etapa y sección a las que se suman las métricas registradas en este contexto."""
+
+    def __init__(self, metricas, etapa: str, seccion: int = None):
+        self.metricas = metricas
+        self.etapa = etapa
+        self.seccion = seccion
+
+    def sumar(self, **valores):
+        self.metricas.sumar(self.etapa, self.seccion, **valores)
+
+
+class MetricasEjecucion:
+    """Contadores por (etapa, sección) de una ejecución, con exportación a JSON y Prometheus."""
+
+    def __init__(self, run_id: str, tema: str = ""):
+        self.run_id = run_id
+        self.tema = tema
+        self.inicio = time.time()
+        self._inicio_reloj = time.perf_counter()
+        self._lock = threading.Lock()
+        self._contadores: dict[tuple, dict] = {}
+        self._titulos: dict[int, str] = {}
+
+    def sumar(self, etapa: str, seccion: int = None, **valores):
+        """Suma valores a los contadores de la etapa (y sección) indicada."""
+        with self._lock:
+            contadores = self._contadores.setdefault((etapa, seccion), dict.fromkeys(CONTADORES, 0))
+            for nombre, valor in valores.items():
+                contadores[nombre] = contadores.get(nombre, 0) + valor
+
+    def titular_seccion(self, seccion: int, titulo: str):
+        """Asocia el título a un índice de sección (solo aparece en el informe JSON)."""
+        with self._lock:
+            self._titulos[seccion] = titulo
+
+    @contextmanager
+    def etapa(self, nombre: str, seccion: int = None):
+        """Mide el tiempo de la etapa y le atribuye lo registrado dentro del bloque."""
+        token = _ambito_actual.set(_Ambito(self, nombre, seccion))
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.sumar(nombre, seccion, segundos=time.perf_counter() - inicio)
+            _ambito_actual.reset(token)
+
+    def secuencia(self, etapas: list[tuple]) -> "SecuenciaEtapas":
+        """Etapas (nombre, sección) que se ejecutan una tras otra, p. ej. las tareas de un Crew."""
+        return SecuenciaEtapas(self, etapas)
+
+    # ---------- Exportación ----------
+
+    def informe(self) -> dict:
+        """Informe de la ejecución: totales y contadores por etapa y sección."""
+        with self._lock:
+            filas = [
+                {
+                    "etapa": etapa,
+                    "seccion": seccion,
+                    "titulo": self._titulos.get(seccion, "") if seccion is not None else "",
+                    **{nombre: round(valor, 3) if isinstance(valor, float) else valor
+                       for nombre, valor in contadores.items()},
+                }
+                for (etapa, seccion), contadores in self._contadores.items()
+            ]
+        # Primero las etapas globales y luego cada sección, en el orden en que empezaron
+        filas.sort(key=lambda fila: -1 if fila["seccion"] is None else fila["seccion"])
+        totales = dict.fromkeys(CONTADORES, 0)
+        for fila in filas:
+            for nombre in CONTADORES:
+                totales[nombre] += fila.get(nombre, 0)
+        # Las etapas se solapan (portada, secciones en paralelo): el total de segundos es el de reloj
+        totales["segundos"] = time.perf_counter() - self._inicio_reloj
+        return {
+            "run_id": self.run_id,
+            "tema": self.tema,
+            "inicio": self.inicio,
+            "totales": {nombre: round(valor, 3) for nombre, valor in totales.items()},
+            "etapas": filas,
+            "prompts": tamano_prompts(filas),
+        }
+
+    def guardar(self, directorio: str = None) -> dict:
+        """
+        Escribe <run_id>.json, suma la ejecución a los contadores acumulados y reescribe
+        documento.prom en el directorio de métricas. Devuelve las rutas escritas.
+        """
+        directorio = directorio or directorio_metricas()
+        os.makedirs(directorio, exist_ok=True)
+        informe = self.informe()
+        rutas = {
+            "json": os.path.join(directorio, f"{self.run_id}.json"),
+            "prometheus": os.path.join(directorio, "documento.prom"),
+        }
+        _escribir_atomico(rutas["json"], json.dumps(informe, ensure_ascii=False, indent=2))
+        acumular_informe(informe, directorio, rutas["prometheus"])
+        return rutas
+
+
+class SecuenciaEtapas:
+    """
+    Etapas consecutivas dentro de un mismo bloque. siguiente() cierra la etapa en curso y abre
+    la próxima; se usa como task_callback de un Crew secuencial para saber qué tarea (y de qué
+    sección) está en marcha.
+    """
+
+    def __init__(self, metricas: MetricasEjecucion, etapas: list[tuple]):
+        self._metricas = metricas
+        self._etapas = list(etapas)
+        self._posicion = 0
+        self._ambito = None
+        self._token = None
+        self._inicio = 0.0
+
+    def __enter__(self):
+        if not self._etapas:
+            return self
+        etapa, seccion = self._etapas[0]
+        # El mismo objeto se ve desde los contextos que CrewAI copia para cada tarea
+        self._ambito = _Ambito(self._metricas, etapa, seccion)
+        self._token = _ambito_actual.set(self._ambito)
+        self._inicio = time.perf_counter()
+        return self
+
+    def _cerrar_actual(self):
+        ahora = time.perf_counter()
+        self._ambito.sumar(segundos=ahora - self._inicio)
+        self._inicio = ahora
+
+    def siguiente(self, _salida=None):
+        """Callback de tarea: la tarea en curso ha terminado."""
+        if self._posicion >= len(self._etapas):
+            return
+        self._cerrar_actual()
+        self._posicion += 1
+        if self._posicion < len(self._etapas):
+            self._ambito.etapa, self._ambito.seccion = self._etapas[self._posicion]
+
+    def __exit__(self, *exc):
+        # Si el Crew falla a mitad, el tiempo hasta el fallo va a la etapa en curso
+        if self._posicion < len(self._etapas):
+            self._cerrar_actual()
+            self._posicion = len(self._etapas)
+        if self._token is not None:
+            _ambito_actual.reset(self._token)
+        return False
+
+
+def _escribir_atomico(ruta: str, texto: str):
+    temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        f.write(texto)
+    os.replace(temporal, ruta)
+
+
+def acumular_informe(informe: dict, directorio: str, ruta_prometheus: str):
+    """
+    Suma los contadores del informe, por etapa, a los acumulados en acumulado.sqlite3 y
+    reescribe ruta_prometheus con los totales. Todo ocurre dentro de una transacción de
+    escritura, así que dos ejecuciones que terminan a la vez no se pisan el fichero.
+    """
+    por_etapa = {}
+    for fila in informe["etapas"]:
+        for contador in CONTADORES:
+            clave = (fila["etapa"], contador)
+            por_etapa[clave] = por_etapa.get(clave, 0) + fila.get(contador, 0)
+
+    conexion = sqlite3.connect(os.path.join(directorio, "acumulado.sqlite3"), timeout=30, isolation_level=None)
+    try:
+        conexion.execute(
+            "CREATE TABLE IF NOT EXISTS contadores ("
+            "etapa TEXT, contador TEXT, valor REAL, PRIMARY KEY (etapa, contador))"
+        )
+        conexion.execute("CREATE TABLE IF NOT EXISTS ultima (nombre TEXT PRIMARY KEY, valor REAL)")
+        conexion.execute("BEGIN IMMEDIATE")
+        try:
+            conexion.executemany(
+                "INSERT INTO contadores (etapa, contador, valor) VALUES (?, ?, ?) "
+                "ON CONFLICT(etapa, contador) DO UPDATE SET valor = valor + excluded.valor",
+                [(etapa, contador, valor) for (etapa, contador), valor in por_etapa.items()]
+                + [("", "ejecuciones", 1)],
+            )
+            conexion.executemany(
+                "INSERT OR REPLACE INTO ultima (nombre, valor) VALUES (?, ?)",
+                [("inicio", informe["inicio"]), ("segundos", informe["totales"]["segundos"])],
+            )
+            contadores = conexion.execute(
+                "SELECT etapa, contador, valor FROM contadores ORDER BY etapa"
+            ).fetchall()
+            ultima = dict(conexion.execute("SELECT nombre, valor FROM ultima").fetchall())
+            _escribir_atomico(ruta_prometheus, _texto_prometheus(contadores, ultima))
+            conexion.execute("COMMIT")
+        except Exception:
+            conexion.execute("ROLLBACK")
+            raise
+    finally:
+        conexion.close()
+
+
+def _numero(valor: float) -> str:
+    return str(int(valor)) if float(valor).is_integer() else f"{valor:.3f}"
+
+
+def _texto_prometheus(contadores: list[tuple], ultima: dict) -> str:
+    """Contadores acumulados y datos de la última ejecución en formato de texto de Prometheus."""
+    valores = {(etapa, contador): valor for etapa, contador, valor in contadores}
+    lineas = [
+        "# HELP documento_ejecuciones_total Ejecuciones del flujo terminadas",
+        "# TYPE documento_ejecuciones_total counter",
+        f"documento_ejecuciones_total {_numero(valores.get(('', 'ejecuciones'), 0))}",
+        "# HELP documento_ultima_ejecucion_timestamp_seconds Inicio de la última ejecución terminada",
+        "# TYPE documento_ultima_ejecucion_timestamp_seconds gauge",
+        f"documento_ultima_ejecucion_timestamp_seconds {ultima.get('inicio', 0):.3f}",
+        "# HELP documento_ultima_ejecucion_segundos Duración de la última ejecución terminada",
+        "# TYPE documento_ultima_ejecucion_segundos gauge",
+        f"documento_ultima_ejecucion_segundos {_numero(ultima.get('segundos', 0))}",
+    ]
+    etapas = sorted({etapa for etapa, _ in valores if etapa})
+    for contador, (nombre, descripcion) in _METRICAS_PROMETHEUS.items():
+        lineas.append(f"# HELP {nombre} {descripcion}")
+        lineas.append(f"# TYPE {nombre} counter")
+        for etapa in etapas:
+            lineas.append(f'{nombre}{{etapa="{etapa}"}} {_numero(valores.get((etapa, contador), 0))}')
+    return "\n".join(lineas) + "\n"
+
+
+def directorio_metricas() -> str:
+    """Directorio de los informes (METRICS_DIR, por defecto output/metrics)."""
+    return os.getenv("METRICS_DIR", os.path.join("output", "metrics"))
+
+
+def registrar(**valores):
+    """Suma valores a la etapa activa en este contexto; sin etapa activa no hace nada."""
+    ambito = _ambito_actual.get()
+    if ambito is not None:
+        ambito.sumar(**valores)
+
+
+def tamano_prompts(filas: list[dict]) -> dict:
+    """
+    Tokens de entrada por llamada LLM en cada sección, agrupados por etapa: primera y última
+    sección, máximo, media y crecimiento (última / primera). Si el contexto de cada tarea está
+    acotado, el crecimiento se queda cerca de 1 aunque el documento tenga muchas secciones.
+    """
+    por_etapa = {}
+    for fila in filas:
+        if fila["seccion"] is not None and fila.get("llamadas_llm"):
+            por_etapa.setdefault(fila["etapa"], []).append(
+                (fila["seccion"], fila["tokens_entrada"] / fila["llamadas_llm"])
+            )
+    resumen = {}
+    for etapa, valores in por_etapa.items():
+        tamanos = [tamano for _, tamano in sorted(valores)]
+        resumen[etapa] = {
+            "secciones": len(tamanos),
+            "primera": round(tamanos[0]),
+            "ultima": round(tamanos[-1]),
+            "maximo": round(max(tamanos)),
+            "media": round(sum(tamanos) / len(tamanos)),
+            "crecimiento": round(tamanos[-1] / tamanos[0], 2) if tamanos[0] else 0.0,
+        }
+    return resumen
+
+
+def formatear_prompts(informe: dict) -> list[str]:
+    """Líneas legibles del tamaño de los prompts por sección, una por etapa."""
+    return [
+        f"{etapa}: {datos['primera']} → {datos['ultima']} tokens de entrada por llamada "
+        f"en {datos['secciones']} secciones (máximo {datos['maximo']}, media {datos['media']}, "
+        f"crecimiento x{datos['crecimiento']})"
+        for etapa, datos in informe.get("prompts", {}).items()
+    ]
+
+
+def formatear_informe(informe: dict) -> list[str]:
+    """Líneas legibles del informe, una por etapa."""
+    lineas = []
+    for fila in informe["etapas"]:
+        nombre = fila["etapa"] if fila["seccion"] is None else f"{fila['etapa']} {fila['seccion'] + 1}"
+        detalle = f"{nombre}: {fila['segundos']:.1f}s"
+        if fila["llamadas_llm"]:
+            detalle += (f", {fila['llamadas_llm']} llamadas LLM "
+                        f"({fila['tokens_entrada']} tokens entrada / {fila['tokens_salida']} salida)")
+        if fila["peticiones_http"]:
+            detalle += f", {fila['peticiones_http']} peticiones HTTP ({fila['bytes_http'] / 1024:.1f} KB)"
+        reintentos = fila["reintentos_llm"] + fila["reintentos_http"]
+        if reintentos:
+            detalle += f", {reintentos} reintentos"
+        lineas.append(detalle)
+    return lineas
+
+
+def main():
+    """Simula una ejecución con dos secciones, muestra el informe y acumula dos ejecuciones en Prometheus."""
+    metricas = MetricasEjecucion("prueba", "Tema de prueba")
+    with metricas.etapa("estructurador"):
+        registrar(llamadas_llm=1, tokens_entrada=120, tokens_salida=300)
+
+    def seccion(idx: int):
+        metricas.titular_seccion(idx, f"Sección {idx + 1}")
+        with metricas.secuencia([("buscador", idx), ("escritor", idx)]) as secuencia:
+            registrar(llamadas_llm=2, tokens_entrada=500, tokens_salida=80, peticiones_http=1, bytes_http=2048)
+            secuencia.siguiente()
+            registrar(llamadas_llm=3, tokens_entrada=900, tokens_salida=1200, reintentos_llm=1)
+            secuencia.siguiente()
+
+    hilos = [threading.Thread(target=seccion, args=(idx,)) for idx in range(2)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    registrar(llamadas_llm=99)  # fuera de cualquier etapa: se ignora
+
+    informe = metricas.informe()
+    for linea in formatear_informe(informe) + formatear_prompts(informe):
+        print(f"   • {linea}")
+
+    # Dos ejecuciones guardadas: los contadores de Prometheus se acumulan, sin etiqueta run_id
+    import tempfile
+    directorio = tempfile.mkdtemp(prefix="metricas_")
+    metricas.guardar(directorio)
+    rutas = MetricasEjecucion("prueba2", "Tema de prueba").guardar(directorio)
+    with open(rutas["prometheus"], "r", encoding="utf-8") as f:
+        texto = f.read()
+    print(texto)
+    return (informe["totales"]["llamadas_llm"] == 11 and informe["totales"]["reintentos_llm"] == 2
+            and informe["prompts"]["escritor"]["crecimiento"] == 1.0
+            and 'documento_llm_llamadas_total{etapa="escritor"} 6\n' in texto
+            and "documento_ejecuciones_total 2\n" in texto and "run_id" not in texto)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# proyecto_crewai/utils/pdf_cache.py
+
+"""
+Caché de PDFs finales direccionada por contenido.
+
+La clave (ver clave_pdf en tools/pdf_render.py) resume todo lo que determina el PDF: el
+Markdown, la imagen de portada, la fecha de la portada, la versión de la hoja de estilos,
+el backend, las opciones de escritura y el modo de maquetación (incremental o completa).
+Si se reintenta una ejecución o se regenera el mismo documento, el PDF se copia desde
+cache/pdf/ en lugar de maquetarlo de nuevo.
+
+Los PDFs se guardan como ficheros <clave>.pdf y un índice SQLite lleva su tamaño, su último
+uso y lo que costó generarlos; si se supera el tamaño máximo se expulsan los menos usados.
+Los contadores de aciertos y segundos ahorrados también van en el índice, porque los PDFs se
+generan en los procesos de tools/pdf_workers.py y no en el que muestra las estadísticas.
+
+Variables de entorno:
+    PDF_CACHE_DIR      directorio de la caché (por defecto cache/pdf)
+    PDF_CACHE_MAX_MB   tamaño máximo de los PDFs guardados (por defecto 500)
+    PDF_CACHE_BYPASS   "1" para no leer ni escribir la caché
+"""
+
+import os
+import sys
+import time
+import shutil
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class CachePDF:
+    """PDFs en disco con índice SQLite, expulsión LRU por tamaño y contadores persistentes."""
+
+    def __init__(self, directorio: str, max_bytes: int):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self.ruta_db = os.path.join(directorio, "indice.sqlite3")
+        os.makedirs(directorio, exist_ok=True)
+        with self._conectar() as conexion:
+            conexion.execute(
+                "CREATE TABLE IF NOT EXISTS pdfs ("
+                "clave TEXT PRIMARY KEY, bytes INTEGER, segundos REAL, creado REAL, accedido REAL)"
+            )
+            conexion.execute("CREATE INDEX IF NOT EXISTS idx_accedido ON pdfs (accedido)")
+            conexion.execute(
+                "CREATE TABLE IF NOT EXISTS contadores (nombre TEXT PRIMARY KEY, valor REAL)"
+            )
+
+    @contextmanager
+    def _conectar(self):
+        conexion = sqlite3.connect(self.ruta_db, timeout=30)
+        try:
+            with conexion:
+                yield conexion
+        finally:
+            conexion.close()
+
+    def _ruta(self, clave: str) -> str:
+        return os.path.join(self.directorio, f"{clave}.pdf")
+
+    @staticmethod
+    def _sumar(conexion, nombre: str, valor: float):
+        conexion.execute(
+            "INSERT INTO contadores (nombre, valor) VALUES (?, ?) "
+            "ON CONFLICT(nombre) DO UPDATE SET valor = valor + excluded.valor",
+            (nombre, valor),
+        )
+
+    def obtener(self, clave: str, destino: str) -> bool:
+        """Copia el PDF guardado con esa clave a destino. Devuelve False si no está."""
+        ruta = self._ruta(clave)
+        with self._conectar() as conexion:
+            fila = conexion.execute("SELECT segundos FROM pdfs WHERE clave = ?", (clave,)).fetchone()
+            if fila and os.path.exists(ruta):
+                directorio_destino = os.path.dirname(destino)
+                if directorio_destino:
+                    os.makedirs(directorio_destino, exist_ok=True)
+                shutil.copyfile(ruta, destino)
+                conexion.execute("UPDATE pdfs SET accedido = ? WHERE clave = ?", (time.time(), clave))
+                self._sumar(conexion, "aciertos", 1)
+                self._sumar(conexion, "segundos_ahorrados", fila[0])
+                print(f"PDF servido desde la caché ({fila[0]:.2f}s de renderizado ahorrados)")
+                return True
+            if fila:
+                # El fichero se borró a mano: la entrada ya no sirve
+                conexion.execute("DELETE FROM pdfs WHERE clave = ?", (clave,))
+            self._sumar(conexion, "fallos", 1)
+        return False
+
+    def guardar(self, clave: str, pdf_path: str, segundos: float):
+        """Guarda una copia del PDF y expulsa los menos usados si se supera max_bytes."""
+        ruta = self._ruta(clave)
+        # Copia a un temporal y rename: otro proceso nunca ve un PDF a medio escribir
+        temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        shutil.copyfile(pdf_path, temporal)
+        os.replace(temporal, ruta)
+        ahora = time.time()
+        with self._conectar() as conexion:
+            conexion.execute(
+                "INSERT OR REPLACE INTO pdfs (clave, bytes, segundos, creado, accedido) VALUES (?, ?, ?, ?, ?)",
+                (clave, os.path.getsize(ruta), segundos, ahora, ahora),
+            )
+            total = conexion.execute("SELECT COALESCE(SUM(bytes), 0) FROM pdfs").fetchone()[0]
+            if total > self.max_bytes:
+                sobrante = total - self.max_bytes
+                for clave_vieja, bytes_viejos in conexion.execute(
+                    "SELECT clave, bytes FROM pdfs WHERE clave != ? ORDER BY accedido ASC", (clave,)
+                ).fetchall():
+                    if sobrante <= 0:
+                        break
+                    conexion.execute("DELETE FROM pdfs WHERE clave = ?", (clave_vieja,))
+                    try:
+                        os.remove(self._ruta(clave_vieja))
+                    except OSError:
+                        pass
+                    sobrante -= bytes_viejos
+
+    def estadisticas(self) -> dict:
+        """Aciertos, fallos, tasa de aciertos, segundos ahorrados, entradas y bytes ocupados."""
+        with self._conectar() as conexion:
+            entradas, total_bytes = conexion.execute(
+                "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM pdfs"
+            ).fetchone()
+            contadores = dict(conexion.execute("SELECT nombre, valor FROM contadores").fetchall())
+        aciertos = int(contadores.get("aciertos", 0))
+        fallos = int(contadores.get("fallos", 0))
+        consultas = aciertos + fallos
+        return {
+            "aciertos": aciertos,
+            "fallos": fallos,
+            "tasa_aciertos": round(aciertos / consultas, 3) if consultas else 0.0,
+            "segundos_ahorrados": round(contadores.get("segundos_ahorrados", 0.0), 2),
+            "entradas": entradas,
+            "bytes": total_bytes,
+        }
+
+
+# ==================== INSTANCIA GLOBAL ====================
+
+_cache_global: CachePDF = None
+_lock_global = threading.Lock()
+
+
+def cache_pdf_desactivada() -> bool:
+    """Indica si la caché se ha desactivado con PDF_CACHE_BYPASS."""
+    return os.getenv("PDF_CACHE_BYPASS", "").lower() in ("1", "true", "si", "sí")
+
+
+def obtener_cache_pdf() -> CachePDF:
+    """Devuelve la caché de PDFs del proceso, creándola si hace falta."""
+    global _cache_global
+    with _lock_global:
+        if _cache_global is None:
+            _cache_global = CachePDF(
+                directorio=os.getenv("PDF_CACHE_DIR", os.path.join("cache", "pdf")),
+                max_bytes=int(float(os.getenv("PDF_CACHE_MAX_MB", "500")) * 1024 * 1024),
+            )
+        return _cache_global
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# proyecto_crewai/utils/rate_limiter.py
+
+"""
+Limitador de peticiones (token bucket) compartido por todos los LLM del proceso.
+
+Todas las llamadas de los LLM creados con crear_llm_crewai pasan por el mismo cubo,
+así que varios Crews y varias sesiones de Streamlit se reparten la cuota de Gemini
+en lugar de suponer cada uno que la tienen entera. El techo del cubo es la cuota del
+proveedor y solo se fija con LLM_MAX_RPM; el max_rpm de cada ejecución es un tope propio
+de esa ejecución (otro LimitadorPeticiones en memoria) que se aplica además del global.
+
+Backends:
+    - "memoria" (por defecto): estado en el propio proceso, protegido por un lock.
+    - "sqlite": estado en un fichero SQLite con transacciones IMMEDIATE, para compartir
+      la cuota entre varios procesos de la misma máquina.
+
+Variables de entorno:
+    LLM_RATE_LIMIT_BACKEND  "memoria" | "sqlite"
+    LLM_RATE_LIMIT_DB       ruta del fichero SQLite (por defecto cache/rate_limiter.sqlite3)
+    LLM_MAX_RPM             techo de rpm compartido por todo el proceso (por defecto 10)
+"""
+
+import os
+import sys
+import time
+import random
+import sqlite3
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Parámetros de la backoff adaptativa (AIMD: subida aditiva, bajada multiplicativa)
+FACTOR_REDUCCION_429 = 0.5
+INCREMENTO_RPM_EXITO = 0.5
+RPM_MINIMO = 1.0
+BACKOFF_BASE_SEGUNDOS = 2.0
+BACKOFF_MAXIMO_SEGUNDOS = 60.0
+
+
+def es_error_limite(error: Exception) -> bool:
+    """Indica si una excepción corresponde a un 429 / RESOURCE_EXHAUSTED del proveedor."""
+    if type(error).__name__ == "RateLimitError":
+        return True
+    texto = str(error).lower()
+    return "429" in texto or "resource_exhausted" in texto or "rate limit" in texto
+
+
+# ==================== BACKENDS ====================
+
+class _BackendMemoria:
+    """Estado del cubo en memoria del proceso."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._estado: dict = {}
+
+    def operar(self, funcion):
+        """Ejecuta funcion(estado) de forma atómica y devuelve su resultado."""
+        with self._lock:
+            return funcion(self._estado)
+
+
+class _BackendSQLite:
+    """Estado del cubo en un fichero SQLite compartido entre procesos."""
+
+    _COLUMNAS = ("tokens", "actualizado", "rpm_max", "rpm_efectivo", "bloqueado_hasta", "errores_seguidos")
+
+    def __init__(self, ruta_db: str, nombre: str = "llm"):
+        self.ruta_db = ruta_db
+        self.nombre = nombre
+        directorio = os.path.dirname(ruta_db)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        with self._conectar() as conexion:
+            conexion.execute(
+                "CREATE TABLE IF NOT EXISTS cubo ("
+                "nombre TEXT PRIMARY KEY, tokens REAL, actualizado REAL, rpm_max REAL, "
+                "rpm_efectivo REAL, bloqueado_hasta REAL, errores_seguidos INTEGER)"
+            )
+
+    def _conectar(self):
+        return sqlite3.connect(self.ruta_db, timeout=30, isolation_level=None)
+
+    def operar(self, funcion):
+        """Ejecuta funcion(estado) dentro de una transacción exclusiva de escritura."""
+        conexion = self._conectar()
+        try:
+            conexion.execute("BEGIN IMMEDIATE")
+            fila = conexion.execute(
+                f"SELECT {', '.join(self._COLUMNAS)} FROM cubo WHERE nombre = ?", (self.nombre,)
+            ).fetchone()
+            estado = dict(zip(self._COLUMNAS, fila)) if fila else {}
+            resultado = funcion(estado)
+            if estado:
+                conexion.execute(
+                    f"INSERT OR REPLACE INTO cubo (nombre, {', '.join(self._COLUMNAS)}) "
+                    f"VALUES (?, {', '.join('?' for _ in self._COLUMNAS)})",
+                    (self.nombre, *(estado[c] for c in self._COLUMNAS)),
+                )
+            conexion.execute("COMMIT")
+            return resultado
+        except Exception:
+            conexion.execute("ROLLBACK")
+            raise
+        finally:
+            conexion.close()
+
+
+# ==================== LIMITADOR ====================
+
+class LimitadorPeticiones:
+    """Token bucket con backoff adaptativa ante 429 y métricas de cola."""
+
+    def __init__(self, rpm: float, backend=None, rafaga: int = None):
+        self._backend = backend or _BackendMemoria()
+        self._rpm_inicial = float(rpm)
+        self._rafaga = rafaga
+        self._lock_metricas = threading.Lock()
+        self._en_cola = 0
+        self._max_en_cola = 0
+        self._adquisiciones = 0
+        self._segundos_esperando = 0.0
+        self._errores_limite = 0
+
+    # ---------- Operaciones atómicas sobre el estado compartido ----------
+
+    def _inicializar(self, estado: dict, ahora: float):
+        if not estado:
+            estado.update(
+                tokens=1.0, actualizado=ahora, rpm_max=self._rpm_inicial,
+                rpm_efectivo=self._rpm_inicial, bloqueado_hasta=0.0, errores_seguidos=0,
+            )
+
+    def _capacidad(self, estado: dict) -> float:
+        if self._rafaga:
+            return float(self._rafaga)
+        return max(1.0, estado["rpm_max"] // 4)
+
+    def _tomar_token(self, estado: dict) -> float:
+        """Consume un token si hay; si no, devuelve los segundos que hay que esperar."""
+        ahora = time.time()
+        self._inicializar(estado, ahora)
+        if ahora < estado["bloqueado_hasta"]:
+            return estado["bloqueado_hasta"] - ahora
+        tasa = estado["rpm_efectivo"] / 60.0
+        estado["tokens"] = min(
+            self._capacidad(estado), estado["tokens"] + (ahora - estado["actualizado"]) * tasa
+        )
+        estado["actualizado"] = ahora
+        if estado["tokens"] >= 1.0:
+            estado["tokens"] -= 1.0
+            return 0.0
+        return (1.0 - estado["tokens"]) / tasa
+
+    # ---------- API pública ----------
+
+    def configurar(self, rpm: float):
+        """Fija el techo de rpm (la cuota del proveedor) para todos los usuarios del cubo."""
+        def _aplicar(estado):
+            self._inicializar(estado, time.time())
+            estado["rpm_max"] = float(rpm)
+            estado["rpm_efectivo"] = min(estado["rpm_efectivo"], float(rpm))
+        self._rpm_inicial = float(rpm)
+        self._backend.operar(_aplicar)
+
+    def adquirir(self) -> float:
+        """Bloquea hasta obtener permiso para una petición. Devuelve los segundos esperados."""
+        with self._lock_metricas:
+            self._en_cola += 1
+            self._max_en_cola = max(self._max_en_cola, self._en_cola)
+        inicio = time.monotonic()
+        try:
+            while True:
+                espera = self._backend.operar(self._tomar_token)
+                if espera <= 0:
+                    break
+                time.sleep(espera)
+        finally:
+            esperado = time.monotonic() - inicio
+            with self._lock_metricas:
+                self._en_cola -= 1
+                self._adquisiciones += 1
+                self._segundos_esperando += esperado
+        return esperado
+
+    def notificar_exito(self):
+        """Subida aditiva del ritmo tras una respuesta correcta."""
+        def _aplicar(estado):
+            self._inicializar(estado, time.time())
+            estado["errores_seguidos"] = 0
+            estado["rpm_efectivo"] = min(estado["rpm_max"], estado["rpm_efectivo"] + INCREMENTO_RPM_EXITO)
+        self._backend.operar(_aplicar)
+
+    def notificar_limite(self) -> float:
+        """
+        Bajada multiplicativa del ritmo y pausa global tras un 429/RESOURCE_EXHAUSTED.
+        Devuelve los segundos de pausa aplicados.
+        """
+        def _aplicar(estado):
+            ahora = time.time()
+            self._inicializar(estado, ahora)
+            estado["errores_seguidos"] += 1
+            estado["rpm_efectivo"] = max(RPM_MINIMO, estado["rpm_efectivo"] * FACTOR_REDUCCION_429)
+            pausa = min(BACKOFF_MAXIMO_SEGUNDOS, BACKOFF_BASE_SEGUNDOS * 2 ** (estado["errores_seguidos"] - 1))
+            pausa *= random.uniform(0.8, 1.2)
+            estado["bloqueado_hasta"] = max(estado["bloqueado_hasta"], ahora + pausa)
+            estado["tokens"] = 0.0
+            return pausa
+        with self._lock_metricas:
+            self._errores_limite += 1
+        return self._backend.operar(_aplicar)
+
+    def metricas(self) -> dict:
+        """Métricas del limitador: profundidad de cola, esperas y ritmo efectivo."""
+        def _leer(estado):
+            self._inicializar(estado, time.time())
+            return dict(estado)
+        estado = self._backend.operar(_leer)
+        with self._lock_metricas:
+            return {
+                "en_cola": self._en_cola,
+                "max_en_cola": self._max_en_cola,
+                "adquisiciones": self._adquisiciones,
+                "segundos_esperando": round(self._segundos_esperando, 3),
+                "errores_limite": self._errores_limite,
+                "rpm_max": estado["rpm_max"],
+                "rpm_efectivo": round(estado["rpm_efectivo"], 2),
+                "tokens_disponibles": round(estado["tokens"], 2),
+            }
+
+
+# ==================== INSTANCIA GLOBAL ====================
+
+_limitador_global: LimitadorPeticiones = None
+_lock_global = threading.Lock()
+
+
+def obtener_limitador() -> LimitadorPeticiones:
+    """
+    Devuelve el limitador compartido por todo el proceso, creándolo si hace falta con el
+    techo de LLM_MAX_RPM. Las ejecuciones no lo cambian: cada una lleva su propio tope.
+    """
+    global _limitador_global
+    with _lock_global:
+        if _limitador_global is None:
+            rpm_inicial = float(os.getenv("LLM_MAX_RPM", "10"))
+            if os.getenv("LLM_RATE_LIMIT_BACKEND", "memoria").lower() == "sqlite":
+                ruta_db = os.getenv("LLM_RATE_LIMIT_DB", os.path.join("cache", "rate_limiter.sqlite3"))
+                backend = _BackendSQLite(ruta_db)
+            else:
+                backend = _BackendMemoria()
+            _limitador_global = LimitadorPeticiones(rpm_inicial, backend)
+        return _limitador_global
+
+
+def main():
+    """Prueba rápida: 6 peticiones a 30 rpm desde 3 hilos."""
+    limitador = LimitadorPeticiones(rpm=30, rafaga=1)
+    inicio = time.monotonic()
+
+    def _peticion(i):
+        limitador.adquirir()
+        print(f"Petición {i} concedida a los {time.monotonic() - inicio:.2f}s")
+
+    hilos = [threading.Thread(target=_peticion, args=(i,)) for i in range(6)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    print(f"Métricas: {limitador.metricas()}")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# proyecto_crewai/utils/search_cache.py
+
+"""
+Caché persistente de resultados de Serper.
+
+Guarda la respuesta JSON de cada búsqueda en un fichero SQLite fuera de temp/ (que se limpia
+en cada ejecución), direccionada por el hash de (query, gl, hl). Las entradas caducan tras un
+TTL y, si se supera el número máximo de entradas, se expulsan las menos usadas recientemente.
+
+Variables de entorno:
+    SERPER_CACHE_DB            ruta del fichero (por defecto cache/serper.sqlite3)
+    SERPER_CACHE_TTL_HORAS     vida de una entrada (por defecto 72)
+    SERPER_CACHE_MAX_ENTRADAS  tamaño máximo antes de expulsar por LRU (por defecto 5000)
+    SERPER_CACHE_BYPASS        "1" para no leer ni escribir la caché
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _normalizar_query(query: str) -> str:
+    """Minúsculas y espacios colapsados: 'IA  en Medicina' y 'ia en medicina' comparten entrada."""
+    return " ".join(str(query).lower().split())
+
+
+def clave_busqueda(query: str, gl: str = "es", hl: str = "es") -> str:
+    """Clave de contenido de una búsqueda."""
+    datos = json.dumps({"q": _normalizar_query(query), "gl": gl, "hl": hl}, sort_keys=True)
+    return hashlib.sha256(datos.encode("utf-8")).hexdigest()
+
+
+class CacheBusquedas:
+    """Caché SQLite con TTL, expulsión LRU y contadores de aciertos/fallos."""
+
+    def __init__(self, ruta_db: str, ttl_segundos: float, max_entradas: int):
+        self.ruta_db = ruta_db
+        self.ttl_segundos = ttl_segundos
+        self.max_entradas = max_entradas
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        directorio = os.path.dirname(ruta_db)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        with self._conectar() as conexion:
+            conexion.execute(
+                "CREATE TABLE IF NOT EXISTS resultados ("
+                "clave TEXT PRIMARY KEY, query TEXT, respuesta TEXT, creado REAL, accedido REAL)"
+            )
+            conexion.execute("CREATE INDEX IF NOT EXISTS idx_accedido ON resultados (accedido)")
+
+    @contextmanager
+    def _conectar(self):
+        conexion = sqlite3.connect(self.ruta_db, timeout=30)
+        try:
+            with conexion:
+                yield conexion
+        finally:
+            conexion.close()
+
+    def obtener(self, query: str, gl: str = "es", hl: str = "es"):
+        """Devuelve la respuesta JSON guardada (dict) o None si no hay entrada válida."""
+        clave = clave_busqueda(query, gl, hl)
+        ahora = time.time()
+        with self._conectar() as conexion:
+            fila = conexion.execute(
+                "SELECT respuesta, creado FROM resultados WHERE clave = ?", (clave,)
+            ).fetchone()
+            if fila and ahora - fila[1] <= self.ttl_segundos:
+                conexion.execute("UPDATE resultados SET accedido = ? WHERE clave = ?", (ahora, clave))
+                with self._lock:
+                    self.aciertos += 1
+                return json.loads(fila[0])
+            if fila:
+                conexion.execute("DELETE FROM resultados WHERE clave = ?", (clave,))
+        with self._lock:
+            self.fallos += 1
+        return None
+
+    def guardar(self, query: str, respuesta: dict, gl: str = "es", hl: str = "es"):
+        """Guarda una respuesta y expulsa las entradas menos usadas si se supera el máximo."""
+        clave = clave_busqueda(query, gl, hl)
+        ahora = time.time()
+        with self._conectar() as conexion:
+            conexion.execute(
+                "INSERT OR REPLACE INTO resultados (clave, query, respuesta, creado, accedido) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (clave, query, json.dumps(respuesta, ensure_ascii=False), ahora, ahora),
+            )
+            total = conexion.execute("SELECT COUNT(*) FROM resultados").fetchone()[0]
+            if total > self.max_entradas:
+                conexion.execute(
+                    "DELETE FROM resultados WHERE clave IN ("
+                    "SELECT clave FROM resultados ORDER BY accedido ASC LIMIT ?)",
+                    (total - self.max_entradas,),
+                )
+
+    def estadisticas(self) -> dict:
+        """Aciertos, fallos, tasa de aciertos y número de entradas."""
+        with self._conectar() as conexion:
+            entradas = conexion.execute("SELECT COUNT(*) FROM resultados").fetchone()[0]
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "tasa_aciertos": round(self.aciertos / consultas, 3) if consultas else 0.0,
+                "entradas": entradas,
+            }
+
+
+# ==================== INSTANCIA GLOBAL ====================
+
+_cache_global: CacheBusquedas = None
+_lock_global = threading.Lock()
+
+
+def cache_desactivada() -> bool:
+    """Indica si la caché se ha desactivado con SERPER_CACHE_BYPASS."""
+    return os.getenv("SERPER_CACHE_BYPASS", "").lower() in ("1", "true", "si", "sí")
+
+
+def obtener_cache_busquedas() -> CacheBusquedas:
+    """Devuelve la caché de búsquedas del proceso, creándola si hace falta."""
+    global _cache_global
+    with _lock_global:
+        if _cache_global is None:
+            _cache_global = CacheBusquedas(
+                ruta_db=os.getenv("SERPER_CACHE_DB", os.path.join("cache", "serper.sqlite3")),
+                ttl_segundos=float(os.getenv("SERPER_CACHE_TTL_HORAS", "72")) * 3600,
+                max_entradas=int(os.getenv("SERPER_CACHE_MAX_ENTRADAS", "5000")),
+            )
+        return _cache_global
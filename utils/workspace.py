@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# proyecto_crewai/utils/workspace.py
+
+"""
+Espacios de trabajo aislados por ejecución.
+
+Cada ejecución del flujo trabaja en temp/<run_id>/ (markdown, secciones, imagen de portada
+y PDF intermedio), de modo que varias generaciones pueden convivir en la misma máquina sin
+pisarse los ficheros. El espacio se elimina al terminar la ejecución.
+
+La vista previa HTML (output/previews/<run_id>.html) sobrevive a la ejecución, porque la
+interfaz la muestra como resultado; se borra con los espacios abandonados pasado el plazo.
+"""
+
+import os
+import sys
+import time
+import shutil
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DIRECTORIO_BASE = "temp"
+DIRECTORIO_VISTAS_PREVIAS = os.path.join("output", "previews")
+# Espacios de ejecuciones interrumpidas que se consideran abandonados
+HORAS_ESPACIO_ABANDONADO = 24
+
+
+def nuevo_run_id() -> str:
+    """Genera un identificador corto y único para una ejecución."""
+    return uuid.uuid4().hex[:12]
+
+
+def ruta_espacio_trabajo(run_id: str) -> str:
+    """Ruta del espacio de trabajo de una ejecución."""
+    return os.path.join(DIRECTORIO_BASE, run_id)
+
+
+def crear_espacio_trabajo(run_id: str) -> str:
+    """Crea (vacío) el espacio de trabajo de la ejecución y devuelve su ruta."""
+    directorio = ruta_espacio_trabajo(run_id)
+    if os.path.exists(directorio):
+        shutil.rmtree(directorio, ignore_errors=True)
+    os.makedirs(directorio, exist_ok=True)
+    return directorio
+
+
+def liberar_espacio_trabajo(directorio: str) -> bool:
+    """Elimina el espacio de trabajo de una ejecución terminada."""
+    if not directorio or not os.path.isdir(directorio):
+        return False
+    try:
+        shutil.rmtree(directorio)
+        return True
+    except Exception as e:
+        print(f"Error eliminando espacio de trabajo '{directorio}': {e}")
+        return False
+
+
+def limpiar_espacios_abandonados(horas: float = HORAS_ESPACIO_ABANDONADO) -> int:
+    """
+    Elimina los espacios de trabajo que llevan más de `horas` sin modificarse
+    (ejecuciones que terminaron con error o se interrumpieron) y las vistas previas HTML
+    igual de antiguas. Devuelve cuántos se borraron.
+    """
+    limite = time.time() - horas * 3600
+    eliminados = 0
+    if os.path.isdir(DIRECTORIO_BASE):
+        for nombre in os.listdir(DIRECTORIO_BASE):
+            ruta = os.path.join(DIRECTORIO_BASE, nombre)
+            try:
+                if os.path.isdir(ruta) and os.path.getmtime(ruta) < limite:
+                    shutil.rmtree(ruta)
+                    eliminados += 1
+            except Exception as e:
+                print(f"Error eliminando espacio abandonado '{ruta}': {e}")
+    if os.path.isdir(DIRECTORIO_VISTAS_PREVIAS):
+        for nombre in os.listdir(DIRECTORIO_VISTAS_PREVIAS):
+            ruta = os.path.join(DIRECTORIO_VISTAS_PREVIAS, nombre)
+            try:
+                if nombre.endswith(".html") and os.path.getmtime(ruta) < limite:
+                    os.remove(ruta)
+                    eliminados += 1
+            except Exception as e:
+                print(f"Error eliminando vista previa antigua '{ruta}': {e}")
+    return eliminados